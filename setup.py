@@ -23,10 +23,11 @@ setup(
     url="https://github.com/TileDB-Inc/TileDB-CLI",
     py_modules=["tiledb_cli.root"],
     packages=["tiledb_cli"],
+    python_requires=">=3.9",
     install_requires=[
         "click",
         "setuptools",
-        "tiledb>=0.12.0",
+        "tiledb>=0.36.1",
         "pandas",
         "iso8601",
     ],
@@ -50,7 +51,7 @@ setup(
     },
     entry_points="""
         [console_scripts]
-        tiledb=tiledb_cli.root:root
+        tiledb=tiledb_cli.root:main
     """,
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -64,10 +65,9 @@ setup(
         "Operating System :: POSIX :: Linux",
         "Operating System :: MacOS :: MacOS X",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.5",
-        "Programming Language :: Python :: 3.6",
-        "Programming Language :: Python :: 3.7",
-        "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
+        "Programming Language :: Python :: 3.12",
     ],
 )
@@ -0,0 +1,259 @@
+import click
+import collections
+
+# per-group statistics kept for each aggregate function
+FUNCTIONS = {
+    "count": ["count"],
+    "sum": ["sum"],
+    "mean": ["sum", "count"],
+    "min": ["min"],
+    "max": ["max"],
+}
+
+# numpy dtype kinds each function applies to
+KINDS = {"sum": "biuf", "mean": "biuf", "min": "biufmM", "max": "biufmM"}
+
+
+class Aggregates(click.ParamType):
+    """
+    A comma separated list of aggregates such as "sum:a,max:b,count", parsed
+    into a list of (function, field) tuples. The field of count is optional.
+    """
+
+    name = "aggregates"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, list):
+            return value
+
+        aggregates = []
+        for item in value.split(","):
+            func, _, field = item.strip().partition(":")
+            if func not in FUNCTIONS:
+                self.fail(
+                    f"unknown aggregate function '{func}' in {value!r}, expected "
+                    f"one of {', '.join(FUNCTIONS)}",
+                    param,
+                    ctx,
+                )
+            if not field and func != "count":
+                self.fail(f"{func} needs a field, e.g. {func}:a", param, ctx)
+            aggregates.append((func, field or None))
+
+        return aggregates
+
+
+def check_aggregates(schema, aggregates, group_by=None):
+    """Check that the aggregated fields and the group-by dimension exist in
+    the array and have types the functions apply to.
+
+    Args:
+        schema (tiledb.ArraySchema): the schema of the array
+        aggregates (list): (function, field) tuples from Aggregates
+        group_by (str): dimension to group by
+
+    Returns:
+        tuple: the attributes and dimensions to read
+    """
+    import numpy as np
+
+    attrs, dims = [], []
+    if group_by is not None:
+        if not schema.domain.has_dim(group_by):
+            raise click.ClickException(f"no dimension '{group_by}' to group by")
+        dims.append(group_by)
+
+    for func, field in aggregates:
+        if field is None:
+            continue
+
+        if schema.has_attr(field):
+            dtype, names = schema.attr(field).dtype, attrs
+        elif schema.domain.has_dim(field):
+            dtype, names = schema.domain.dim(field).dtype, dims
+        else:
+            raise click.ClickException(f"no attribute or dimension '{field}'")
+
+        if func in KINDS and np.dtype(dtype).kind not in KINDS[func]:
+            raise click.ClickException(
+                f"cannot compute {func} of '{field}' of type {np.dtype(dtype)}"
+            )
+        if field not in names:
+            names.append(field)
+
+    # cells are counted from the coordinates of the first dimension
+    if not attrs and not dims:
+        dims.append(schema.domain.dim(0).name)
+
+    return attrs, dims
+
+
+def _valid(values):
+    """
+    Return the mask of the values that are not NaN or NaT, or None if all of
+    them are valid.
+    """
+    import numpy as np
+
+    if values.dtype.kind == "f":
+        return ~np.isnan(values)
+    elif values.dtype.kind in "mM":
+        return ~np.isnat(values)
+    return None
+
+
+def _drop_nulls(values, keys):
+    """
+    Return the values that are not null, NaN or NaT, with their keys. Values
+    of nullable attributes are given as a pyarrow ChunkedArray.
+    """
+    if hasattr(values, "null_count"):
+        valid = values.is_valid().to_numpy()
+        values, keys = values.drop_null().to_numpy(), keys[valid]
+
+    valid = _valid(values)
+    if valid is not None:
+        values, keys = values[valid], keys[valid]
+    return values, keys
+
+
+def _reduce(keys, columns):
+    """
+    Reduce each (ufunc, values) column over the cells that share a key, and
+    return the sorted unique keys with the reduced columns.
+    """
+    import numpy as np
+
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+
+    reduced = [ufunc.reduceat(values[order], starts) for ufunc, values in columns]
+    return keys[starts], reduced
+
+
+class Aggregator:
+    """
+    Compute aggregates over batches of cells as they are read, optionally
+    grouped by the values of a dimension. Only the per-group statistics are
+    kept between batches, so memory use does not grow with the number of
+    cells. Null, NaN and NaT values are skipped.
+    """
+
+    def __init__(self, aggregates, group_by=None):
+        self.aggregates = aggregates
+        self.group_by = group_by
+
+        # statistics needed for each field; count without a field counts cells
+        self.stats = collections.OrderedDict()
+        for func, field in aggregates:
+            stats = self.stats.setdefault(field, [])
+            stats.extend(s for s in FUNCTIONS[func] if s not in stats)
+
+        # sorted group keys and their statistics so far, by field
+        self.state = {}
+
+    def update(self, batch):
+        """Fold a batch of cells into the aggregates.
+
+        Args:
+            batch: dict of one-dimensional numpy arrays of cells by field
+                name, or a pyarrow.Table, which keeps the nulls of nullable
+                attributes
+        """
+        import numpy as np
+
+        if isinstance(batch, dict):
+            ncells = len(next(iter(batch.values())))
+        else:
+            ncells = batch.num_rows
+        if ncells == 0:
+            return
+
+        if self.group_by is None:
+            keys = np.zeros(ncells, dtype=np.int8)
+        else:
+            keys = np.asarray(batch[self.group_by])
+
+        ufuncs = {"count": np.add, "sum": np.add, "min": np.minimum, "max": np.maximum}
+
+        for field, stats in self.stats.items():
+            if field is None:
+                values, field_keys = np.ones(ncells, dtype=np.int64), keys
+            else:
+                values, field_keys = _drop_nulls(batch[field], keys)
+            if len(values) == 0:
+                continue
+
+            columns = {
+                stat: (
+                    np.ones(len(values), dtype=np.int64) if stat == "count" else values
+                )
+                for stat in stats
+            }
+
+            if field in self.state:
+                old_keys, old = self.state[field]
+                field_keys = np.concatenate([old_keys, field_keys])
+                columns = {
+                    stat: np.concatenate([old[stat], columns[stat]]) for stat in stats
+                }
+
+            field_keys, reduced = _reduce(
+                field_keys, [(ufuncs[stat], columns[stat]) for stat in stats]
+            )
+            self.state[field] = (field_keys, dict(zip(stats, reduced)))
+
+    def result(self):
+        """Return the aggregates of all cells seen.
+
+        Returns:
+            collections.OrderedDict: numpy arrays by column name, with one
+            element per group (or a single element without group_by) and
+            the groups first if grouped; columns are named like "sum(a)"
+            or "count"
+        """
+        import numpy as np
+
+        if self.group_by is None:
+            keys = np.zeros(1, dtype=np.int8)
+        elif self.state:
+            keys = np.unique(np.concatenate([k for k, _ in self.state.values()]))
+        else:
+            keys = np.array([])
+
+        def align(field, stat, fill):
+            if field not in self.state:
+                return np.full(len(keys), fill)
+
+            field_keys, stats = self.state[field]
+            index = np.searchsorted(field_keys, keys).clip(max=len(field_keys) - 1)
+            found = field_keys[index] == keys
+
+            values = stats[stat][index]
+            if found.all():
+                return values
+            if values.dtype.kind in "biu" and isinstance(fill, float):
+                values = values.astype(np.float64)
+            elif values.dtype.kind in "mM":
+                fill = np.array("NaT", dtype=values.dtype)
+            return np.where(found, values, fill)
+
+        result = collections.OrderedDict()
+        if self.group_by is not None:
+            result[self.group_by] = keys
+
+        for func, field in self.aggregates:
+            name = func if field is None else f"{func}({field})"
+            if func == "count":
+                result[name] = align(field, "count", 0)
+            elif func == "sum":
+                result[name] = align(field, "sum", 0)
+            elif func == "mean":
+                count = align(field, "count", 0)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result[name] = align(field, "sum", 0) / count
+            else:
+                result[name] = align(field, func, np.nan)
+
+        return result
@@ -0,0 +1,143 @@
+from .utils import get_ctx, get_state, invoke
+
+import click
+import concurrent.futures
+import contextlib
+import shlex
+import sys
+import time
+
+# commands that cannot run inside a batch
+EXCLUDED_COMMANDS = ("batch", "serve")
+
+
+def parse_commands(lines):
+    """
+    Split each line into command line arguments. Blank lines and comments
+    starting with # are skipped.
+
+    :param lines: An iterable of command lines without the leading "tiledb".
+    :return: A list of (line number, args) tuples.
+    """
+    commands = []
+
+    for lineno, line in enumerate(lines, start=1):
+        args = shlex.split(line, comments=True)
+
+        if not args:
+            continue
+
+        if args[0] == "tiledb":
+            args = args[1:]
+
+        if args and args[0] in EXCLUDED_COMMANDS:
+            raise click.UsageError(f"line {lineno}: {args[0]} cannot run in a batch")
+
+        commands.append((lineno, args))
+
+    return commands
+
+
+@click.command()
+@click.argument("file", type=click.File("r"))
+@click.option(
+    "--jobs",
+    "-j",
+    metavar="<int>",
+    help=(
+        "Number of commands to run concurrently. Output is still written in "
+        "the order the commands are given, but is held in memory until each "
+        "command ends, so binary formats need --output"
+    ),
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--fail-fast",
+    "-x",
+    help=(
+        "Stop at the first command that fails. With --jobs, the commands not "
+        "started yet are cancelled"
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--timings/--no-timings",
+    help=("Report the run time of each command to stderr"),
+    default=True,
+    show_default=True,
+)
+def batch(file, jobs, fail_fast, timings):
+    """
+    Run the tiledb commands listed in file (or - for stdin), one command per
+    line, in a single process that shares one TileDB context. The context is
+    configured by the root options given to `tiledb batch`.
+
+    The leading "tiledb" of each line is optional.
+
+    Example:
+        cat commands.txt
+        # consolidate and vacuum then check the result
+        consolidate fragments my_array
+        vacuum fragments my_array
+        dump nonempty-domain my_array
+
+        tiledb batch commands.txt
+    """
+    commands = parse_commands(file)
+    obj = {"config": get_state("config", {}), "ctx": get_ctx()}
+
+    # a single job writes straight to stdout and stderr, so that binary and
+    # streamed output is not held in memory
+    streams = (sys.stdout, sys.stderr) if jobs == 1 else (None, None)
+
+    def run(command):
+        start = time.perf_counter()
+        result = invoke(command[1], obj, *streams)
+        return result, time.perf_counter() - start
+
+    def run_all():
+        if jobs == 1:
+            yield from map(run, commands)
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(run, command) for command in commands]
+            try:
+                for future in futures:
+                    yield future.result()
+            finally:
+                # the commands not started yet are dropped when stopping early
+                for future in futures:
+                    future.cancel()
+
+    start = time.perf_counter()
+    results = []
+    failed = 0
+
+    with contextlib.closing(run_all()) as runs:
+        for (exit_code, stdout, stderr), elapsed in runs:
+            click.echo(stdout, nl=False)
+            click.echo(stderr, nl=False, err=True)
+            results.append((exit_code, elapsed))
+            failed += exit_code != 0
+
+            if fail_fast and failed:
+                break
+
+    total = time.perf_counter() - start
+
+    if timings:
+        for (lineno, args), (exit_code, elapsed) in zip(commands, results):
+            click.echo(
+                f"{elapsed:>10.3f}s  exit {exit_code:<3} "
+                f"line {lineno:<5} {' '.join(map(shlex.quote, args))}",
+                err=True,
+            )
+        click.echo(
+            f"{total:>10.3f}s  {len(results)} commands, {failed} failed", err=True
+        )
+
+    if failed:
+        sys.exit(1)
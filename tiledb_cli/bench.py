@@ -0,0 +1,350 @@
+from .utils import get_ctx, get_state, invoke
+
+import click
+import functools
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+
+
+@click.group()
+def bench():
+    """
+    Benchmark TileDB-CLI commands on synthetic arrays and output the results
+    as JSON that can be compared across TileDB versions.
+
+    The synthetic arrays are scaled up versions of the dense_25x12_mult and
+    sparse_25x12_mult test arrays: two float64 attributes a and b over a
+    rows x cols int64 domain, written as one or more full fragments.
+    """
+
+
+def bench_options(func):
+    """
+    Options shared by all benchmark commands.
+    """
+    options = [
+        click.option(
+            "--rows",
+            "-r",
+            metavar="<int>",
+            help=("Number of rows in the synthetic arrays"),
+            type=click.IntRange(min=1),
+            default=1000,
+            show_default=True,
+        ),
+        click.option(
+            "--cols",
+            "-c",
+            metavar="<int>",
+            help=("Number of columns in the synthetic arrays"),
+            type=click.IntRange(min=1),
+            default=1000,
+            show_default=True,
+        ),
+        click.option(
+            "--tile",
+            metavar="<int>",
+            help=("Tile extent of both dimensions"),
+            type=click.IntRange(min=1),
+            default=100,
+            show_default=True,
+        ),
+        click.option(
+            "--fragments",
+            "-f",
+            metavar="<int>",
+            help=("Number of fragments written to each synthetic array"),
+            type=click.IntRange(min=1),
+            default=4,
+            show_default=True,
+        ),
+        click.option(
+            "--kind",
+            "-k",
+            help=("Array type to benchmark. May be passed multiple times"),
+            type=click.Choice(["dense", "sparse"]),
+            multiple=True,
+            default=["dense", "sparse"],
+            show_default=True,
+        ),
+        click.option(
+            "--repeat",
+            "-n",
+            metavar="<int>",
+            help=("Number of timed runs of each benchmark"),
+            type=click.IntRange(min=1),
+            default=3,
+            show_default=True,
+        ),
+        click.option(
+            "--dir",
+            "dir_",
+            metavar="<path>",
+            help=(
+                "Directory to create the synthetic arrays in. By default a "
+                "temporary directory is used and removed afterwards"
+            ),
+            type=click.Path(file_okay=False),
+            default=None,
+        ),
+        click.option(
+            "--output",
+            "-o",
+            metavar="<path>",
+            help=("Write the JSON results to the given file instead of stdout"),
+            type=click.Path(dir_okay=False),
+            default=None,
+        ),
+    ]
+    return functools.reduce(lambda f, option: option(f), reversed(options), func)
+
+
+def create_array(uri, sparse, rows, cols, tile, fragments):
+    """
+    Create a synthetic array with float64 attributes a and b over a rows x cols
+    domain and write fragments full fragments of data to it.
+    """
+    import numpy as np
+    import tiledb
+
+    ctx = get_ctx()
+
+    dom = tiledb.Domain(
+        tiledb.Dim(name="row", domain=(0, rows), tile=min(tile, rows), dtype=np.int64),
+        tiledb.Dim(name="col", domain=(0, cols), tile=min(tile, cols), dtype=np.int64),
+        ctx=ctx,
+    )
+    attrs = [
+        tiledb.Attr(name="a", dtype=np.float64, ctx=ctx),
+        tiledb.Attr(name="b", dtype=np.float64, ctx=ctx),
+    ]
+    schema = tiledb.ArraySchema(
+        domain=dom,
+        attrs=attrs,
+        sparse=sparse,
+        capacity=tile * tile,
+        allows_duplicates=False,
+        ctx=ctx,
+    )
+    tiledb.Array.create(uri, schema, ctx=ctx)
+
+    data = np.arange(rows * cols, dtype=np.float64)
+
+    for ts in range(1, fragments + 1):
+        with tiledb.open(uri, mode="w", timestamp=ts, ctx=ctx) as A:
+            values = {"a": data * ts, "b": data / ts}
+            if sparse:
+                coords = np.indices((rows, cols)).reshape(2, -1)
+                A[coords[0], coords[1]] = values
+            else:
+                A[0:rows, 0:cols] = {
+                    k: v.reshape(rows, cols) for k, v in values.items()
+                }
+
+
+def write_csv(path, rows, cols):
+    """
+    Write the contents of a synthetic array as a CSV file with columns row,
+    col, a and b.
+    """
+    import numpy as np
+    import pandas as pd
+
+    coords = np.indices((rows, cols)).reshape(2, -1)
+    data = np.arange(rows * cols, dtype=np.float64)
+    pd.DataFrame({"row": coords[0], "col": coords[1], "a": data, "b": data}).to_csv(
+        path, index=False
+    )
+
+
+def run_command(args, obj):
+    """
+    Run a CLI command in this process and return its wall time in seconds.
+    """
+    start = time.perf_counter()
+    exit_code, _, stderr = invoke(args, obj)
+    elapsed = time.perf_counter() - start
+
+    if exit_code != 0:
+        raise click.ClickException(f"'tiledb {' '.join(args)}' failed: {stderr}")
+
+    return elapsed
+
+
+def summarize(name, kind, times, cells):
+    return {
+        "benchmark": name,
+        "kind": kind,
+        "cells": cells,
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "cells_per_second": cells / min(times) if min(times) > 0 else None,
+    }
+
+
+def bench_read(workdir, kind, params, obj):
+    """
+    Time `tiledb dump array` over the full synthetic array.
+    """
+    rows, cols = params["rows"], params["cols"]
+
+    uri = os.path.join(workdir, f"read_{kind}")
+    if not os.path.exists(uri):
+        create_array(uri, kind == "sparse", rows, cols, params["tile"], 1)
+
+    args = ["dump", "array", uri, f"0:{rows}", f"0:{cols}"]
+    times = [run_command(args, obj) for _ in range(params["repeat"])]
+
+    return [summarize("dump array", kind, times, rows * cols)]
+
+
+def bench_ingest(workdir, kind, params, obj):
+    """
+    Time `tiledb convert-from csv` of a CSV file with the synthetic array's
+    contents.
+    """
+    rows, cols = params["rows"], params["cols"]
+
+    csv_file = os.path.join(workdir, "ingest.csv")
+    if not os.path.exists(csv_file):
+        write_csv(csv_file, rows, cols)
+
+    times = []
+    for i in range(params["repeat"]):
+        uri = os.path.join(workdir, f"ingest_{kind}_{i}")
+        args = ["convert-from", "csv", csv_file, uri, "--sparse", str(kind == "sparse")]
+        if kind == "sparse":
+            args += ["--index-dims", "row,col"]
+        times.append(run_command(args, obj))
+        shutil.rmtree(uri)
+
+    return [summarize("convert-from csv", kind, times, rows * cols)]
+
+
+def bench_consolidate(workdir, kind, params, obj):
+    """
+    Time `tiledb consolidate fragments` and `tiledb vacuum fragments` on a
+    synthetic array with many fragments.
+    """
+    rows, cols = params["rows"], params["cols"]
+    cells = rows * cols * params["fragments"]
+
+    consolidate_times, vacuum_times = [], []
+    for i in range(params["repeat"]):
+        uri = os.path.join(workdir, f"consolidate_{kind}_{i}")
+        create_array(
+            uri, kind == "sparse", rows, cols, params["tile"], params["fragments"]
+        )
+
+        consolidate_times.append(run_command(["consolidate", "fragments", uri], obj))
+        vacuum_times.append(run_command(["vacuum", "fragments", uri], obj))
+        shutil.rmtree(uri)
+
+    return [
+        summarize("consolidate fragments", kind, consolidate_times, cells),
+        summarize("vacuum fragments", kind, vacuum_times, cells),
+    ]
+
+
+BENCHMARKS = {
+    "read": bench_read,
+    "ingest": bench_ingest,
+    "consolidate": bench_consolidate,
+}
+
+
+def run_benchmarks(names, rows, cols, tile, fragments, kind, repeat, dir_, output):
+    """
+    Run the named benchmarks for each array kind and output the JSON results.
+    """
+    import tiledb
+
+    params = {
+        "rows": rows,
+        "cols": cols,
+        "tile": tile,
+        "fragments": fragments,
+        "repeat": repeat,
+    }
+    obj = {"config": get_state("config", {}), "ctx": get_ctx()}
+
+    workdir = tempfile.mkdtemp() if dir_ is None else dir_
+    os.makedirs(workdir, exist_ok=True)
+
+    try:
+        results = []
+        for name in names:
+            for k in kind:
+                results += BENCHMARKS[name](workdir, k, params, obj)
+    finally:
+        if dir_ is None:
+            shutil.rmtree(workdir)
+
+    report = {
+        "versions": {
+            "tiledb": ".".join(map(str, tiledb.libtiledb.version())),
+            "tiledb-py": tiledb.version.version,
+            "python": platform.python_version(),
+        },
+        "platform": platform.platform(),
+        "config": obj["config"],
+        "params": params,
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output is None:
+        click.echo(text)
+    else:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+
+
+@click.command("read")
+@bench_options
+def bench_read_command(**kwargs):
+    """
+    Benchmark reading full synthetic arrays with `tiledb dump array`.
+    """
+    run_benchmarks(["read"], **kwargs)
+
+
+@click.command("ingest")
+@bench_options
+def bench_ingest_command(**kwargs):
+    """
+    Benchmark ingesting a CSV file with `tiledb convert-from csv`.
+    """
+    run_benchmarks(["ingest"], **kwargs)
+
+
+@click.command("consolidate")
+@bench_options
+def bench_consolidate_command(**kwargs):
+    """
+    Benchmark `tiledb consolidate fragments` and `tiledb vacuum fragments` on
+    synthetic arrays with --fragments fragments.
+    """
+    run_benchmarks(["consolidate"], **kwargs)
+
+
+@click.command("all")
+@bench_options
+def bench_all_command(**kwargs):
+    """
+    Run the read, ingest and consolidate benchmarks.
+    """
+    run_benchmarks(list(BENCHMARKS), **kwargs)
+
+
+bench.add_command(bench_all_command)
+bench.add_command(bench_consolidate_command)
+bench.add_command(bench_ingest_command)
+bench.add_command(bench_read_command)
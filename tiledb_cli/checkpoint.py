@@ -0,0 +1,166 @@
+from .query import tile_slabs
+
+import click
+import json
+import os
+
+# upper bound on the number of partitions an export is split into, so that
+# checkpointing stays cheap for arrays with many tiles
+MAX_PARTITIONS = 1024
+
+
+class Checkpoint:
+    """
+    Progress of an export, kept in a JSON file: the arguments it was started
+    with, the timestamp the array was read at, the number of partitions of
+    the selection written so far and the size of the output after them.
+    """
+
+    def __init__(self, path, args):
+        self.path = path
+        self.args = args
+        self.timestamp = None
+        self.done = 0
+        self.offset = 0
+
+        if not os.path.exists(path):
+            return
+
+        with open(path) as f:
+            state = json.load(f)
+
+        if state["args"] != args:
+            raise click.ClickException(
+                f"the checkpoint {path} was written by an export with different "
+                "arguments; remove it to start over"
+            )
+
+        self.timestamp = state["timestamp"]
+        self.done = state["done"]
+        self.offset = state["offset"]
+
+    @property
+    def resumed(self):
+        return self.timestamp is not None
+
+    def save(self):
+        """
+        Write the checkpoint atomically, so that an interrupted write leaves
+        the previous one in place.
+        """
+        state = {
+            "args": self.args,
+            "timestamp": self.timestamp,
+            "done": self.done,
+            "offset": self.offset,
+        }
+
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def commit(self, offset):
+        """Record that one more partition was written.
+
+        Args:
+            offset (int): size in bytes of the output once it is on disk
+        """
+        self.done += 1
+        self.offset = offset
+        self.save()
+
+
+def partitions(array, ranges):
+    """Split inclusive ranges into the partitions an export is checkpointed
+    by: slabs of whole tiles of the first dimension, at most MAX_PARTITIONS
+    of them. The partitions only depend on the array and the ranges, so they
+    are the same when the export is resumed.
+
+    Args:
+        array (tiledb.Array): the opened array
+        ranges (list): inclusive ranges from selection_ranges()
+
+    Returns:
+        list: the ranges of each partition, in the format of ranges
+    """
+    if ranges is None:
+        return []
+
+    ntiles = sum(len(tile_slabs(array, *r)) for r in ranges[0])
+    tiles = -(-ntiles // MAX_PARTITIONS)
+
+    return [
+        [[slab], *ranges[1:]]
+        for r in ranges[0]
+        for slab in tile_slabs(array, *r, tiles)
+    ]
+
+
+def open_checkpoint(path, args, timestamp):
+    """Open the checkpoint of an export, resuming it if the file exists.
+
+    Args:
+        path (str): the checkpoint file
+        args (dict): the arguments of the export, which must be the same as
+            those it was started with
+        timestamp: the timestamp given to the export
+
+    Returns:
+        tuple: the Checkpoint, and the timestamp to open the array at, which
+        is the one a resumed export read the array at
+    """
+    state = Checkpoint(path, args)
+    if state.resumed:
+        timestamp = state.timestamp
+        if isinstance(timestamp, list):
+            timestamp = tuple(timestamp)
+
+    return state, timestamp
+
+
+def remaining_partitions(array, ranges, state=None, timestamp=None):
+    """Return the partitions of an export left to write. A new export records
+    the timestamp the array was opened at, so that resuming it reads the
+    same version of the array.
+
+    Args:
+        array (tiledb.Array): the opened array
+        ranges (list): inclusive ranges from selection_ranges()
+        state (Checkpoint): the checkpoint of the export, or None to write
+            the ranges as a single partition
+        timestamp: the timestamp given to the export; for a range, the
+            range the array was opened at is recorded
+
+    Returns:
+        tuple: the partitions left, and the size in bytes of the output they
+        are appended to, or None without a checkpoint
+    """
+    if state is None:
+        return [ranges], None
+
+    if not state.resumed:
+        start, end = array.timestamp_range
+        state.timestamp = [start, end] if isinstance(timestamp, tuple) else end
+        state.save()
+
+    return partitions(array, ranges)[state.done :], state.offset
+
+
+def write_partitions(writer, parts, read, state=None):
+    """Write the batches of each partition, recording in the checkpoint of
+    the export once each of them is on disk.
+
+    Args:
+        writer: the writer from open_writer()
+        parts (list): the partitions from remaining_partitions()
+        read (callable): returns an iterable of the batches of a partition
+        state (Checkpoint): the checkpoint of the export, if any
+    """
+    for part in parts:
+        for batch in read(part):
+            writer.write(batch)
+        if state is not None:
+            state.commit(writer.sync())
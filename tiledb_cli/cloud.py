@@ -1,4 +1,3 @@
-import tiledb
 from .utils import to_unix_time
 
 import click
@@ -104,6 +103,8 @@ def login(credential, token, password, host, verify_ssl, no_session, threads):
     Login into TileDB cloud under a given credential using either a token or username.
     By default, credential is read from the environmental variable TILEDB_REST_TOKEN.
     """
+    import tiledb.cloud
+
     kwargs = locals()
 
     del kwargs["credential"]
@@ -254,6 +255,7 @@ def arrays(
     List array properties and their associated values for arrays in a TileDB
     user account.
     """
+    import tiledb.cloud
 
     kwargs = locals()
 
@@ -328,6 +330,8 @@ def orgs(name, property_):
     List organization properties and their associated values for each
     organization a TileDB user account is a part of.
     """
+    import tiledb.cloud
+
     if not name:
         all_orgs = tiledb.cloud.client.organizations()
     else:
@@ -387,6 +391,8 @@ def profile(property_):
     """
     Output the current logged in namespace's profile information.
     """
+    import tiledb.cloud
+
     whole_profile = tiledb.cloud.client.user_profile()
 
     if not property_:
@@ -415,6 +421,8 @@ def activity(uri, last):
     """
     Dump the array activity of an array located at a TileDB uri.
     """
+    import tiledb.cloud
+
     activity = tiledb.cloud.array_activity(uri)
 
     if activity is None:
@@ -537,6 +545,8 @@ def dump_task(property_, array, cost, duration, last, namespace, status, start,
     """
     List last task from TileDB cloud.
     """
+    import tiledb.cloud
+
     kwargs = locals()
 
     del kwargs["cost"]
@@ -581,6 +591,8 @@ def retry_task(id):
     """
     Retry running the task with the given id.
     """
+    import tiledb.cloud
+
     click.echo(tiledb.cloud.retry_task(id))
 
 
@@ -628,6 +640,8 @@ def register(uri, namespace, array_name, description, access_credentials_name):
     """
     Register an array located at uri to the TileDB cloud service.
     """
+    import tiledb.cloud
+
     click.echo(tiledb.cloud.register_array(uri, **locals()))
 
 
@@ -649,6 +663,8 @@ def deregister(uri):
     physically delete the array. It will remain in your bucket. All access to the
     array and could metadata will be removed.
     """
+    import tiledb.cloud
+
     click.echo(tiledb.cloud.deregister_array(uri))
 
 
@@ -666,6 +682,8 @@ def share(uri, namespace, read, write):
     Share the TileDB array located at uri to the user at a given namespace. At least
     one of the persmission flags must be supplied.
     """
+    import tiledb.cloud
+
     permissions = []
 
     if read:
@@ -687,6 +705,8 @@ def unshare(uri, namespace):
     """
     Revokes access to a TileDB array located at uri for the user at a given namespace.
     """
+    import tiledb.cloud
+
     tiledb.cloud.unshare_array(uri, namespace)
 
 
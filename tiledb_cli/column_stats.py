@@ -0,0 +1,338 @@
+from .query import chain_ordered, condition_fields, filter_batches, iter_batches
+
+import click
+import collections
+import json
+import math
+
+# array metadata key the statistics are saved under by `tiledb dump stats --save`
+METADATA_KEY = "tiledb_cli.stats"
+
+# bits of the hashes used to index the HyperLogLog registers; the standard
+# error of the distinct estimates is about 1.04 / sqrt(2 ** PRECISION)
+PRECISION = 14
+
+
+class HyperLogLog:
+    """
+    Estimate the number of distinct values in a stream in constant memory.
+    Values are hashed to 64 bits with pandas' vectorized hash_array; the
+    first PRECISION bits select a register, which keeps the largest number
+    of leading zeros seen in the remaining bits.
+    """
+
+    def __init__(self, precision=PRECISION):
+        import numpy as np
+
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        import numpy as np
+        import pandas as pd
+
+        if len(values) == 0:
+            return
+
+        hashes = pd.util.hash_array(values)
+        bits = 64 - self.precision
+        index = (hashes >> np.uint64(bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << bits) - 1)
+
+        # position of the highest set bit; log2 may round up below a power of
+        # two, which the shift corrects
+        nonzero = np.maximum(rest, np.uint64(1))
+        high = np.floor(np.log2(nonzero.astype(np.float64))).astype(np.uint64)
+        high -= (nonzero >> high) == 0
+        rank = np.where(rest == 0, bits + 1, bits - high.astype(np.int64))
+
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def estimate(self):
+        import numpy as np
+
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+
+        # linear counting is more accurate for small cardinalities
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class Histogram:
+    """
+    Histogram of a stream of numbers with a fixed number of bins of equal
+    width, the last one including its upper edge as with numpy.histogram.
+    The bins start over the values of the first batch, and whenever a batch
+    falls outside of them, their width is doubled by merging pairs of bins,
+    extending them to the left or right, until the batch fits.
+    """
+
+    def __init__(self, bins):
+        import numpy as np
+
+        self.bins = bins + bins % 2
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self.lower = None
+        self.width = None
+
+    def _double(self, left):
+        import numpy as np
+
+        merged = self.counts.reshape(-1, 2).sum(axis=1)
+        half = np.zeros(self.bins // 2, dtype=np.int64)
+        if left:
+            self.counts = np.concatenate([half, merged])
+            self.lower -= self.bins * self.width
+        else:
+            self.counts = np.concatenate([merged, half])
+        self.width *= 2
+
+    def update(self, values):
+        import numpy as np
+
+        if len(values) == 0:
+            return
+
+        values = values.astype(np.float64)
+        low, high = values.min(), values.max()
+        if self.lower is None:
+            self.lower = low
+            self.width = (high - low) / self.bins or 1.0
+
+        while low < self.lower:
+            self._double(left=True)
+        while high > self.lower + self.bins * self.width:
+            self._double(left=False)
+
+        index = ((values - self.lower) // self.width).astype(np.intp)
+        self.counts += np.bincount(index.clip(0, self.bins - 1), minlength=self.bins)
+
+    def result(self):
+        """Return the bin edges and counts, without the empty bins at either
+        end.
+
+        Returns:
+            tuple: the bins + 1 edges and the counts of the bins, as lists
+        """
+        import numpy as np
+
+        nonzero = np.flatnonzero(self.counts)
+        if len(nonzero) == 0:
+            return [], []
+
+        first, last = nonzero[0], nonzero[-1] + 1
+        edges = self.lower + self.width * np.arange(first, last + 1)
+        return edges.tolist(), self.counts[first:last].tolist()
+
+
+def _scalar(value, dtype):
+    """
+    Convert a value of the given numpy dtype to a JSON serializable scalar.
+    """
+    import numpy as np
+
+    if dtype.kind in "mM":
+        return str(np.array(value).astype(np.int64).astype(dtype))
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return value.item() if hasattr(value, "item") else value
+
+
+class ColumnStats:
+    """
+    Streaming statistics of the values of an attribute: the number of values
+    and of nulls (NaN, NaT or null values of nullable attributes), the
+    minimum and maximum, an estimate of the number of distinct values and,
+    for numbers and datetimes, a histogram.
+    """
+
+    def __init__(self, dtype, bins):
+        import numpy as np
+
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.distinct = HyperLogLog()
+        self.histogram = Histogram(bins) if self.dtype.kind in "biufmM" else None
+
+    def update(self, values):
+        """Fold a batch of values into the statistics.
+
+        Args:
+            values: one-dimensional numpy array of values, or a pyarrow
+                ChunkedArray for nullable attributes
+        """
+        import numpy as np
+
+        if hasattr(values, "null_count"):
+            self.nulls += values.null_count
+            values = values.drop_null().to_numpy()
+
+        if values.dtype.kind == "f":
+            valid = ~np.isnan(values)
+        elif values.dtype.kind in "mM":
+            valid = ~np.isnat(values)
+        else:
+            valid = None
+        if valid is not None:
+            self.nulls += int(len(values) - np.count_nonzero(valid))
+            values = values[valid]
+
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        low, high = np.min(values), np.max(values)
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.distinct.update(values)
+        if self.histogram is not None:
+            if values.dtype.kind in "mM":
+                values = values.astype(np.int64)
+            self.histogram.update(values)
+
+    def result(self):
+        """Return the statistics as JSON serializable values.
+
+        Returns:
+            collections.OrderedDict: the statistics by name; datetimes are
+            given as ISO 8601 strings
+        """
+        result = collections.OrderedDict()
+        result["count"] = self.count
+        result["nulls"] = self.nulls
+        result["min"] = None if self.min is None else _scalar(self.min, self.dtype)
+        result["max"] = None if self.max is None else _scalar(self.max, self.dtype)
+        result["distinct"] = self.distinct.estimate()
+
+        if self.histogram is not None:
+            edges, counts = self.histogram.result()
+            if self.dtype.kind in "mM":
+                edges = [_scalar(int(edge), self.dtype) for edge in edges]
+            result["histogram"] = collections.OrderedDict(
+                [("edges", edges), ("counts", counts)]
+            )
+        return result
+
+
+def _partition_batches(array, parts, attrs, buffer_size, parallel, cond, arrow):
+    """
+    Yield the batches of the partitions, each read with its own query by one
+    of parallel threads (an incomplete query for sparse arrays), in the
+    order of the partitions, so that the statistics, whose histograms depend
+    on the order of the values, do not depend on which thread reads first.
+    """
+
+    def read(part):
+        return iter_batches(array, part, attrs, [], buffer_size, arrow, cond=cond)
+
+    if parallel == 1:
+        for part in parts:
+            yield from read(part)
+        return
+
+    yield from chain_ordered(read, parts, parallel)
+
+
+def scan_stats(array, parts, attrs, bins=10, buffer_size=None, parallel=1, cond=None):
+    """Compute the statistics of attributes over a selection in one pass.
+
+    Args:
+        array (tiledb.Array): the opened array
+        parts (list): partitions of the selection, each in the format of the
+            ranges of selection_ranges(), e.g. from checkpoint.partitions()
+        attrs (list): attributes to compute the statistics of
+        bins (int): number of bins of the histograms
+        buffer_size (int): buffer budget in bytes of each batch
+        parallel (int): number of partitions read concurrently
+        cond (str): attribute predicate from parse_condition()
+
+    Returns:
+        collections.OrderedDict: the statistics of each attribute, see
+        ColumnStats.result()
+    """
+    # the cells of dense arrays that do not match cond hold the fill value,
+    # so they are read with the attributes of the predicate and filtered out
+    fields, masked = list(attrs), cond is not None and not array.schema.sparse
+    if masked:
+        fields += [
+            name
+            for name in condition_fields(cond)
+            if array.schema.has_attr(name) and name not in fields
+        ]
+
+    # numpy query results fill the null values of nullable attributes, which
+    # Arrow tables keep track of
+    arrow = any(array.attr(name).isnullable for name in fields)
+    if arrow:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise click.ClickException(
+                "pyarrow is required to count the nulls of nullable attributes"
+            )
+
+    stats = collections.OrderedDict(
+        (name, ColumnStats(array.attr(name).dtype, bins)) for name in attrs
+    )
+    batches = _partition_batches(
+        array, parts, fields, buffer_size, parallel, None if masked else cond, arrow
+    )
+    if masked:
+        batches = filter_batches(batches, cond)
+    for batch in batches:
+        for name, column in stats.items():
+            column.update(batch[name])
+
+    return collections.OrderedDict(
+        (name, column.result()) for name, column in stats.items()
+    )
+
+
+def fragments_key(array):
+    """
+    Return the URIs of the fragments of an array, which identify the
+    version of the array the statistics were computed from.
+    """
+    import tiledb
+
+    return sorted(tiledb.array_fragments(array.uri, ctx=array.ctx).uri)
+
+
+def save_stats(uri, stats, ctx=None):
+    """Save statistics in the metadata of an array, as JSON under
+    METADATA_KEY.
+
+    Args:
+        uri (str): the array URI
+        stats (dict): JSON serializable statistics
+        ctx (tiledb.Ctx): the context to open the array with
+    """
+    import tiledb
+
+    with tiledb.open(uri, mode="w", ctx=ctx) as array:
+        array.meta[METADATA_KEY] = json.dumps(stats)
+
+
+def load_stats(array):
+    """Load the statistics saved by save_stats().
+
+    Args:
+        array (tiledb.Array): the opened array
+
+    Returns:
+        dict: the statistics
+    """
+    if METADATA_KEY not in array.meta:
+        raise click.ClickException(
+            f"no statistics saved in {array.uri}; compute them with --save"
+        )
+    return json.loads(
+        array.meta[METADATA_KEY], object_pairs_hook=collections.OrderedDict
+    )
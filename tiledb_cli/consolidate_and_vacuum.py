@@ -1,4 +1,5 @@
-import tiledb
+from .stats import phase
+from .utils import get_config, get_ctx
 
 import click
 
@@ -110,7 +111,9 @@ def consolidate_fragments(
     """
     Consolidate the fragments in an array located at uri.
     """
-    config = tiledb.Config()
+    import tiledb
+
+    config = get_config()
     config["sm.consolidation.mode"] = "fragments"
     config["sm.consolidation.amplification"] = amplification
     config["sm.consolidation.buffer_size"] = buffer_size
@@ -118,15 +121,14 @@ def consolidate_fragments(
     config["sm.consolidation.step_min_frags"] = step_min_frags
     config["sm.consolidation.step_size_ratio"] = step_size_ratio
     config["sm.consolidation.steps"] = steps
-    ctx = tiledb.Ctx(config)
 
-    tiledb.consolidate(uri, ctx=ctx)
+    with phase("consolidate"):
+        tiledb.consolidate(uri, config=config, ctx=get_ctx())
 
-    print(vacuum)
     if vacuum:
-        config = tiledb.Config({"sm.vacuum.mode": "fragments"})
-        tiledb.vacuum(uri, ctx=tiledb.Ctx(config))
-        print("here?")
+        config = get_config({"sm.vacuum.mode": "fragments"})
+        with phase("vacuum"):
+            tiledb.vacuum(uri, config=config, ctx=get_ctx())
 
 
 @click.command("fragment-metadata")
@@ -141,15 +143,16 @@ def consolidate_fragment_metadata(uri, vacuum):
     """
     Consolidate the fragment metadata in an array located at uri.
     """
-    config = tiledb.Config()
-    config["sm.consolidation.mode"] = "fragment_meta"
-    ctx = tiledb.Ctx(config)
+    import tiledb
 
-    tiledb.consolidate(uri, ctx=ctx)
+    config = get_config({"sm.consolidation.mode": "fragment_meta"})
+    with phase("consolidate"):
+        tiledb.consolidate(uri, config=config, ctx=get_ctx())
 
     if vacuum:
-        config = tiledb.Config({"sm.vacuum.mode": "fragment_meta"})
-        tiledb.vacuum(uri, ctx=tiledb.Ctx(config))
+        config = get_config({"sm.vacuum.mode": "fragment_meta"})
+        with phase("vacuum"):
+            tiledb.vacuum(uri, config=config, ctx=get_ctx())
 
 
 @click.command("array-metadata")
@@ -164,15 +167,16 @@ def consolidate_array_metadata(uri, vacuum):
     """
     Consolidate the array metadata in an array located at uri.
     """
-    config = tiledb.Config()
-    config["sm.consolidation.mode"] = "array_meta"
-    ctx = tiledb.Ctx(config)
+    import tiledb
 
-    tiledb.consolidate(uri, ctx=ctx)
+    config = get_config({"sm.consolidation.mode": "array_meta"})
+    with phase("consolidate"):
+        tiledb.consolidate(uri, config=config, ctx=get_ctx())
 
     if vacuum:
-        config = tiledb.Config({"sm.vacuum.mode": "array_meta"})
-        tiledb.vacuum(uri, ctx=tiledb.Ctx(config))
+        config = get_config({"sm.vacuum.mode": "array_meta"})
+        with phase("vacuum"):
+            tiledb.vacuum(uri, config=config, ctx=get_ctx())
 
 
 @click.command("fragments")
@@ -181,8 +185,11 @@ def vacuum_fragments(uri):
     """
     Vacuum the already consolidated fragments in an array located at uri.
     """
-    config = tiledb.Config({"sm.vacuum.mode": "fragments"})
-    tiledb.vacuum(uri, ctx=tiledb.Ctx(config))
+    import tiledb
+
+    config = get_config({"sm.vacuum.mode": "fragments"})
+    with phase("vacuum"):
+        tiledb.vacuum(uri, config=config, ctx=get_ctx())
 
 
 @click.command("fragment-metadata")
@@ -191,8 +198,11 @@ def vacuum_fragment_metadata(uri):
     """
     Vacuum the already consolidated fragment metadata in an array located at uri.
     """
-    config = tiledb.Config({"sm.vacuum.mode": "fragment_meta"})
-    tiledb.vacuum(uri, ctx=tiledb.Ctx(config))
+    import tiledb
+
+    config = get_config({"sm.vacuum.mode": "fragment_meta"})
+    with phase("vacuum"):
+        tiledb.vacuum(uri, config=config, ctx=get_ctx())
 
 
 @click.command("array-metadata")
@@ -201,8 +211,11 @@ def vacuum_array_metadata(uri):
     """
     Vacuum the already consolidated array metadata in an array located at uri.
     """
-    config = tiledb.Config({"sm.vacuum.mode": "array_meta"})
-    tiledb.vacuum(uri, ctx=tiledb.Ctx(config))
+    import tiledb
+
+    config = get_config({"sm.vacuum.mode": "array_meta"})
+    with phase("vacuum"):
+        tiledb.vacuum(uri, config=config, ctx=get_ctx())
 
 
 consolidate.add_command(consolidate_fragments)
@@ -1,4 +1,5 @@
-import tiledb
+from .stats import phase
+from .utils import get_ctx
 
 import collections
 import click
@@ -52,6 +53,8 @@ class FilterList(click.ParamType):
             self.fail(f"Too many arguments provided", param, ctx)
 
     def _parse_single_attr(self, filter_and_options, param, ctx):
+        import tiledb
+
         filter_name_to_function = {
             "GzipFilter": tiledb.GzipFilter,
             "ZstdFilter": tiledb.ZstdFilter,
@@ -271,6 +274,8 @@ def csv(ctx, csv_file, uri, attr_filters, coords_filters, dim_filters):
 
         dictval ::= argval | list
     """
+    import tiledb
+
     kwargs = parse_kwargs(ctx.args)
 
     # there are options that require special parsing that cannot be generally
@@ -284,7 +289,8 @@ def csv(ctx, csv_file, uri, attr_filters, coords_filters, dim_filters):
     if dim_filters:
         kwargs["dim_filters"] = dim_filters
 
-    tiledb.from_csv(uri, csv_file, **kwargs)
+    with phase("ingest"):
+        tiledb.from_csv(uri, csv_file, ctx=get_ctx(), **kwargs)
 
 
 def parse_kwargs(args):
@@ -0,0 +1,357 @@
+from .query import (
+    _cell_size,
+    _extent,
+    _length,
+    _overlaps,
+    concat_batches,
+    map_ordered,
+    read_slab,
+    tile_slabs,
+)
+
+import click
+import collections
+
+
+def check_comparable(before, after, attrs):
+    """Check that two arrays can be compared cell by cell: they have the same
+    dimensions and the attributes compared exist in both with the same type.
+
+    Args:
+        before (tiledb.Array): the opened array compared from
+        after (tiledb.Array): the opened array compared to
+        attrs (list): attributes compared
+    """
+    import numpy as np
+
+    def dims(array):
+        return [
+            (array.domain.dim(i).name, np.dtype(array.domain.dim(i).dtype))
+            for i in range(array.domain.ndim)
+        ]
+
+    if dims(before) != dims(after):
+        raise click.ClickException("the arrays do not have the same dimensions")
+    if before.schema.sparse != after.schema.sparse:
+        raise click.ClickException("cannot compare a dense array to a sparse array")
+
+    for name in attrs:
+        for array in (before, after):
+            if not array.schema.has_attr(name):
+                raise click.ClickException(
+                    f"'{name}' is not an attribute of {array.uri}"
+                )
+        if before.attr(name).dtype != after.attr(name).dtype:
+            raise click.ClickException(f"the attribute '{name}' differs in type")
+
+
+def changed_fragments(uri, start, end=None, ctx=None):
+    """Return the non-empty domains of the fragments of an array written
+    after one timestamp and up to another, the only regions where the cells
+    of the array at the two timestamps can differ. Cells removed by delete
+    queries are not in fragments, so they are not covered.
+
+    Args:
+        uri (str): the array URI
+        start (int): the earlier timestamp
+        end (int): the later timestamp, the latest if None
+        ctx (tiledb.Ctx): the context to load the fragment info with
+
+    Returns:
+        list: the non-empty domain of each fragment, in the format of the
+        ranges of selection_ranges()
+    """
+    import tiledb
+
+    fragments = tiledb.array_fragments(uri, ctx=ctx)
+
+    domains = []
+    for (first, last), domain in zip(
+        fragments.timestamp_range, fragments.nonempty_domain
+    ):
+        if last <= start or (end is not None and first > end):
+            continue
+        # string coordinates are given as str, but read as bytes
+        domains.append(
+            [
+                [tuple(v.encode() if isinstance(v, str) else v for v in dim_range)]
+                for dim_range in domain
+            ]
+        )
+
+    return domains
+
+
+def _union(arrays):
+    """
+    Return the inclusive ranges covering the non-empty domains of arrays, or
+    None if they are all empty.
+    """
+    domains = [d for d in (array.nonempty_domain() for array in arrays) if d]
+    if not domains:
+        return None
+
+    return [
+        [(min(d[i][0] for d in domains), max(d[i][1] for d in domains))]
+        for i in range(len(domains[0]))
+    ]
+
+
+def _fragment_extents(array):
+    """
+    Return the extents along the first dimension and the number of cells of
+    the fragments of an array in the timestamp range it is opened at, by
+    fragment URI.
+    """
+    import tiledb
+
+    fragments = tiledb.array_fragments(array.uri, ctx=array.ctx)
+    start, end = array.timestamp_range
+
+    extents = {}
+    for uri, (first, last), domain, cells in zip(
+        fragments.uri,
+        fragments.timestamp_range,
+        fragments.nonempty_domain,
+        fragments.cell_num,
+    ):
+        if first > end or last < start:
+            continue
+        # string coordinates are given as str, but read as bytes
+        lo, hi = (v.encode() if isinstance(v, str) else v for v in domain[0])
+        extents[uri] = (lo, hi, cells)
+
+    return extents
+
+
+def _sparse_slabs(before, after, first, cell_size, buffer_size=None):
+    """
+    Split the range of the first dimension compared by diff_batches() for
+    sparse arrays into slabs covering the extents of the fragments of both
+    arrays, merged where they overlap. Ranges without fragments hold no
+    cells and are not read. With buffer_size, the merged extents of integer
+    and datetime dimensions are cut into slabs of whole tiles expected to
+    hold at most buffer_size bytes, assuming that the cells of the fragments
+    are spread evenly over their extents.
+    """
+    import numpy as np
+
+    extents = {**_fragment_extents(before), **_fragment_extents(after)}
+
+    merged = []
+    for lo, hi, cells in sorted(extents.values(), key=lambda e: e[:2]):
+        lo, hi = max(lo, first[0]), min(hi, first[1])
+        if lo > hi:
+            continue
+        if merged and lo <= merged[-1][1]:
+            start, end, count = merged[-1]
+            merged[-1] = (start, max(end, hi), count + cells)
+        else:
+            merged.append((lo, hi, cells))
+
+    dim = before.domain.dim(0)
+    dt = np.dtype(dim.dtype)
+    if not buffer_size or not (
+        np.issubdtype(dt, np.integer) or np.issubdtype(dt, np.datetime64)
+    ):
+        return [(lo, hi) for lo, hi, _ in merged]
+
+    slabs = []
+    for lo, hi, cells in merged:
+        rows = buffer_size * _length(lo, hi) // (max(cells, 1) * cell_size)
+        tiles = max(1, rows // _extent(dim))
+        slabs.extend(tile_slabs(before, lo, hi, tiles))
+    return slabs
+
+
+def _differs(x, y):
+    """
+    Compare two arrays of values element by element, with NaN and NaT equal
+    to themselves.
+    """
+    import numpy as np
+
+    if x.dtype.kind == "f":
+        return (x != y) & ~(np.isnan(x) & np.isnan(y))
+    if x.dtype.kind in "mM":
+        return (x != y) & ~(np.isnat(x) & np.isnat(y))
+    return np.asarray(x != y, dtype=bool)
+
+
+def _match(before, after, dims):
+    """
+    Return the positions of the cells of two sparse reads at the same
+    coordinates, and masks of the cells only in before and only in after.
+    """
+    import numpy as np
+    import pandas as pd
+
+    n, m = len(before[dims[0]]), len(after[dims[0]])
+    left = pd.DataFrame({name: before[name] for name in dims})
+    right = pd.DataFrame({name: after[name] for name in dims})
+    left["_before"], right["_after"] = np.arange(n), np.arange(m)
+
+    both = left.merge(right, on=list(dims))
+    i, j = both["_before"].to_numpy(), both["_after"].to_numpy()
+
+    removed, added = np.ones(n, dtype=bool), np.ones(m, dtype=bool)
+    removed[i], added[j] = False, False
+    return i, j, removed, added
+
+
+def _rows(cells, index, status, fields):
+    """
+    Take the rows of a diff from the cells of one side.
+    """
+    import numpy as np
+
+    rows = collections.OrderedDict()
+    rows["diff"] = np.full(len(index), status, dtype=object)
+    for name in fields:
+        rows[name] = cells[name][index]
+    return rows
+
+
+def diff_slab(before, after, subarray, attrs, dims, counts=None):
+    """Compare the cells of two arrays in a subarray.
+
+    Sparse cells are matched by their coordinates, so cells may be removed
+    or added. Dense arrays hold a value in every cell, so their cells can
+    only change, e.g. from the fill value once written.
+
+    Args:
+        before (tiledb.Array): the opened array compared from
+        after (tiledb.Array): the opened array compared to
+        subarray (list): inclusive ranges per dimension
+        attrs (list): attributes compared
+        dims (list): names of all the dimensions
+        counts (dict): if given, the number of "removed", "added" and
+            "changed" cells is added to it
+
+    Returns:
+        collections.OrderedDict: the differing cells as numpy arrays by field
+        name, with a "diff" field that is "removed" or "added", or "before"
+        and "after" for consecutive rows giving the values of a changed cell
+    """
+    import numpy as np
+
+    old = read_slab(before, subarray, attrs, dims)
+    new = read_slab(after, subarray, attrs, dims)
+
+    if before.schema.sparse:
+        i, j, removed, added = _match(old, new, dims)
+    else:
+        i = j = np.arange(len(old[dims[0]]))
+        removed = added = np.zeros(len(i), dtype=bool)
+
+    changed = np.zeros(len(i), dtype=bool)
+    for name in attrs:
+        changed |= _differs(old[name][i], new[name][j])
+    i, j = i[changed], j[changed]
+
+    fields = list(dims) + list(attrs)
+    # the values of each changed cell before and after, in consecutive rows
+    pairs = [_rows(old, i, "before", fields), _rows(new, j, "after", fields)]
+    order = np.arange(2 * len(i)).reshape(2, -1).T.ravel()
+    changed = collections.OrderedDict(
+        (name, np.concatenate([pair[name] for pair in pairs])[order])
+        for name in pairs[0]
+    )
+
+    rows = concat_batches(
+        [
+            _rows(old, np.flatnonzero(removed), "removed", fields),
+            changed,
+            _rows(new, np.flatnonzero(added), "added", fields),
+        ]
+    )
+
+    if counts is not None:
+        counts["removed"] += int(removed.sum())
+        counts["added"] += int(added.sum())
+        counts["changed"] += len(i)
+
+    return rows
+
+
+def diff_batches(
+    before,
+    after,
+    attrs,
+    buffer_size=None,
+    parallel=1,
+    fragments=None,
+    counts=None,
+):
+    """Compare two arrays, or one array at two timestamps, in batches of
+    whole tiles of the first dimension, covering the non-empty domains of
+    both.
+
+    The slabs are aligned to the tiles of before and sized to fit the buffer
+    budget. For sparse arrays, they only cover the extents of the fragments
+    along the first dimension and are sized from their number of cells, see
+    _sparse_slabs(). If fragments is given, slabs that none of them overlap
+    are skipped without reading them, which is how comparing an array at two
+    timestamps only reads the regions written in between.
+
+    Args:
+        before (tiledb.Array): the opened array compared from
+        after (tiledb.Array): the opened array compared to
+        attrs (list): attributes compared
+        buffer_size (int): buffer budget in bytes of each side of a slab
+        parallel (int): number of slabs compared concurrently
+        fragments (list): non-empty domains from changed_fragments()
+        counts (dict): if given, the number of "removed", "added" and
+            "changed" cells and of the "slabs" compared and "skipped" is
+            added to it
+
+    Yields:
+        collections.OrderedDict: the differing cells of each slab with any,
+        see diff_slab()
+    """
+    if counts is None:
+        counts = {}
+    for key in ["removed", "added", "changed", "slabs", "skipped"]:
+        counts.setdefault(key, 0)
+
+    ranges = _union([before, after])
+    if ranges is None:
+        return
+
+    dims = [before.domain.dim(i).name for i in range(before.domain.ndim)]
+    first, rest = ranges[0], ranges[1:]
+
+    cell_size = _cell_size(before, attrs + dims)
+    if before.schema.sparse:
+        first_slabs = _sparse_slabs(before, after, first[0], cell_size, buffer_size)
+    else:
+        tiles = 1
+        if buffer_size:
+            row_cells = 1
+            for [(lo, hi)] in rest:
+                row_cells *= _length(lo, hi)
+            step = buffer_size // (row_cells * cell_size)
+            tiles = max(1, step // _extent(before.domain.dim(0)))
+        first_slabs = [s for r in first for s in tile_slabs(before, *r, tiles)]
+
+    slabs = []
+    for slab in first_slabs:
+        subarray = [[slab], *rest]
+        if fragments is not None and not any(
+            _overlaps(subarray, domain) for domain in fragments
+        ):
+            counts["skipped"] += 1
+        else:
+            slabs.append(subarray)
+
+    def compare(subarray):
+        slab_counts = collections.Counter()
+        rows = diff_slab(before, after, subarray, attrs, dims, slab_counts)
+        return rows, slab_counts
+
+    for rows, slab_counts in map_ordered(compare, slabs, parallel):
+        for key, count in slab_counts.items():
+            counts[key] += count
+        counts["slabs"] += 1
+        if len(rows["diff"]):
+            yield rows
@@ -1,10 +1,44 @@
-import tiledb
-from .utils import to_unix_time
+from .aggregates import Aggregates, Aggregator, check_aggregates
+from .checkpoint import (
+    open_checkpoint,
+    partitions,
+    remaining_partitions,
+    write_partitions,
+)
+from .column_stats import fragments_key, load_stats, save_stats, scan_stats
+from .diff import changed_fragments, check_comparable, diff_batches
+from .planner import align_selection, plan_read
+from .points import load_points
+from .result_cache import ResultCache, cached, default_cache_dir
+from .query import (
+    batch_config,
+    concat_batches,
+    condition_fields,
+    estimate_cells,
+    filter_batches,
+    head,
+    iter_batches,
+    parse_condition,
+    parse_selection,
+    read_selection,
+    selection_ranges,
+)
+from .stats import mib, peak_rss, phase
+from .utils import (
+    ByteSize,
+    SampleSize,
+    TimestampRange,
+    get_ctx,
+    open_array,
+    to_tiledb_timestamp,
+)
+from .writers import WRITERS, open_writer
 
 import click
+import collections
+import contextlib
+import os
 import pprint
-import re
-import sys
 
 
 @click.group()
@@ -18,9 +52,154 @@ def dump():
 @click.command()
 def config():
     """
-    Output TileDB's default configuration parameters and values.
+    Output the TileDB configuration parameters and values in effect. These are
+    TileDB's defaults unless overridden with the root --config, --config-file
+    or --preset options.
     """
-    click.echo(tiledb.Config())
+    click.echo(get_ctx().config())
+
+
+@click.command()
+@click.argument("uri")
+@click.argument("other", required=False)
+@click.option(
+    "--from",
+    "from_",
+    metavar="<unix seconds | iso 8601 date>",
+    help=("Compare the array from its state at the given timestamp"),
+    type=TimestampRange(),
+    default=None,
+)
+@click.option(
+    "--to",
+    metavar="<unix seconds | iso 8601 date>",
+    help=(
+        "Compare the array, or the other array, to its state at the given "
+        "timestamp. By default, the latest state is compared to"
+    ),
+    type=TimestampRange(),
+    default=None,
+)
+@click.option(
+    "--attribute",
+    "-A",
+    metavar="<str>",
+    help=(
+        "Compare the given attribute. Multiple attributes may be provided by "
+        "passing the flag multiple times. By default, all attributes are "
+        "compared"
+    ),
+    multiple=True,
+    default=[],
+)
+@click.option(
+    "--format",
+    "-f",
+    "format_",
+    help=("Output format of the differing cells"),
+    type=click.Choice(["tsv", "csv", "ndjson", "parquet", "arrow"]),
+    default="tsv",
+    show_default=True,
+)
+@click.option(
+    "--output",
+    "-o",
+    metavar="<path>",
+    help=("Write the differing cells to the given file instead of stdout"),
+    type=click.Path(dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--summary",
+    help=(
+        "Output the number of removed, added and changed cells and of the "
+        "slabs compared and skipped instead of the cells"
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--parallel",
+    metavar="<int>",
+    help=("Compare the given number of slabs concurrently"),
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--buffer-size",
+    metavar="<bytes>",
+    help=("Buffer budget of each side of a slab, e.g. 256MiB"),
+    type=ByteSize(),
+    default="64MiB",
+    show_default=True,
+)
+def diff(
+    uri, other, from_, to, attribute, format_, output, summary, parallel, buffer_size
+):
+    """
+    Output the cells that differ between a TileDB array located at uri at two
+    timestamps, given with --from and --to, or between two arrays with the
+    same dimensions.
+
+    Both sides are read in slabs of whole tiles of the first dimension and
+    compared with vectorized operations. Each differing cell is output with a
+    diff field: "removed" or "added" for cells of sparse arrays only on one
+    side, or "before" and "after" for two consecutive rows holding the values
+    of a changed cell. When comparing an array at two timestamps, only the
+    slabs overlapping the fragments written in between are read.
+
+    Example:
+        tiledb dump diff my_array --from 1700000000
+        #
+        # Output the cells changed since the given UNIX timestamp.
+        # diff     rows  cols  a
+        # before   2     3     3
+        # after    2     3     7
+        # added    4     1     5
+
+        tiledb dump diff my_array --from 2023-11-01 --to 2023-12-01 --summary
+        #
+        # Count the cells changed in November 2023.
+
+        tiledb dump diff my_array my_backfilled_array
+        #
+        # Output the cells that differ between two arrays.
+    """
+    for name, value in [("--from", from_), ("--to", to)]:
+        if isinstance(value, tuple):
+            raise click.BadParameter("expected a single timestamp", param_hint=name)
+    if other is None and from_ is None:
+        raise click.UsageError("--from is required to compare an array to itself")
+    from_, to = to_tiledb_timestamp(from_), to_tiledb_timestamp(to)
+
+    with contextlib.ExitStack() as stack:
+        before = stack.enter_context(open_array(uri, timestamp=from_))
+        after = stack.enter_context(open_array(other or uri, timestamp=to))
+
+        attrs = list(attribute or [before.attr(i).name for i in range(before.nattr)])
+        check_comparable(before, after, attrs)
+
+        # only the fragments written between the timestamps can differ
+        fragments = None
+        if other is None:
+            start, end = (from_, to) if to is None else sorted([from_, to])
+            fragments = changed_fragments(uri, start, end, ctx=get_ctx())
+
+        counts = collections.OrderedDict()
+        batches = diff_batches(
+            before, after, attrs, buffer_size, parallel, fragments, counts
+        )
+        with phase("diff"):
+            if summary:
+                for _ in batches:
+                    pass
+            else:
+                with open_writer(format_, output) as writer:
+                    for batch in batches:
+                        writer.write(batch)
+
+    if summary:
+        click.echo(pprint.pformat(counts))
 
 
 @click.command()
@@ -40,9 +219,11 @@ def mbrs(uri, index):
     """
     Output the minimum bounding rectangles of a sparse TileDB array located at uri.
     """
+    import tiledb
+
     pp = pprint.PrettyPrinter()
 
-    fragments = tiledb.array_fragments(uri, include_mbrs=True)
+    fragments = tiledb.array_fragments(uri, include_mbrs=True, ctx=get_ctx())
 
     if not hasattr(fragments, "mbrs"):
         click.echo(
@@ -64,7 +245,7 @@ def metadata(uri):
     """
     Output the metadata of a TileDB array located at uri.
     """
-    with tiledb.open(uri) as array:
+    with open_array(uri) as array:
         pp = pprint.PrettyPrinter()
         click.echo(pp.pformat(array.meta.items()))
 
@@ -75,7 +256,7 @@ def nonempty_domain(uri):
     """
     Output the non-empty domain of a TileDB array located at uri.
     """
-    with tiledb.open(uri) as array:
+    with open_array(uri) as array:
         pp = pprint.PrettyPrinter()
         click.echo(pp.pformat(array.nonempty_domain()))
 
@@ -86,7 +267,7 @@ def schema(uri):
     """
     Output the schema of a TileDB array located at uri.
     """
-    with tiledb.open(uri) as array:
+    with open_array(uri) as array:
         click.echo(array.schema)
 
 
@@ -120,16 +301,256 @@ def schema(uri):
 @click.option(
     "--timestamp",
     "-t",
-    metavar="<unix seconds | iso 8601 date>",
-    help=("Output data from the array at the given UNIX timestamp or ISO 8601 date."),
+    metavar="<unix seconds | iso 8601 date>[:<end>]",
+    help=(
+        "Output data from the array at the given UNIX timestamp or ISO 8601 "
+        "date, or only the data written in a start:end range of them (both "
+        "inclusive, either may be omitted). With a range, only the fragments "
+        "written in it are opened"
+    ),
+    type=TimestampRange(),
+    default=None,
+)
+@click.option(
+    "--stream",
+    "-s",
+    help=(
+        "Read the selection in batches that fit in --buffer-size and write "
+        "each batch to stdout as tab separated lines as soon as it is read, "
+        "so that memory use stays bounded regardless of the selection size"
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--buffer-size",
+    metavar="<bytes>",
+    help=("Buffer budget of each batch read with --stream, e.g. 256MiB"),
+    type=ByteSize(),
+    default="64MiB",
+    show_default=True,
+)
+@click.option(
+    "--format",
+    "-f",
+    "format_",
+    help=(
+        "Output format. All formats except pretty are streamed batch by batch "
+        "as with --stream. parquet and arrow (Arrow IPC stream) require pyarrow. "
+        "By default, the data is pretty printed, or output as tsv with --stream"
+    ),
+    type=click.Choice(["pretty", "tsv", "csv", "ndjson", "parquet", "arrow"]),
+    default=None,
+)
+@click.option(
+    "--output",
+    "-o",
+    metavar="<path>",
+    help=("Write the data to the given file instead of stdout"),
+    type=click.Path(dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--out-npy",
+    metavar="<dir>",
+    help=(
+        "Write each selected attribute and dimension to its own .npy file in "
+        "the given directory, for numpy jobs to memory map. The files are "
+        "preallocated from the estimated result size and filled batch by "
+        "batch through memory maps, as with --stream. Variable sized fields "
+        "cannot be written"
+    ),
+    type=click.Path(file_okay=False),
+    default=None,
+)
+@click.option(
+    "--memory-budget",
+    "-m",
+    metavar="<bytes>",
+    help=(
+        "Cap the memory used to read the selection, e.g. 2GiB. Half of it is "
+        "used for the query buffers of each batch, replacing --buffer-size, "
+        "and the rest caps TileDB's internal memory budgets. Implies --stream. "
+        "The peak memory used is reported to stderr"
+    ),
+    type=ByteSize(),
+    default=None,
+)
+@click.option(
+    "--parallel",
+    metavar="<int>",
+    help=(
+        "Split the selection along the tile boundaries of the first dimension "
+        "and read the parts on the given number of threads. The output is "
+        "written in order. When streaming, at most this many batches are held "
+        "at once"
+    ),
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--where",
+    "-w",
+    metavar="<str>",
+    help=(
+        "Only output the cells whose attributes match the given predicate, "
+        'e.g. "a > 10 and b == 3". The predicate is evaluated by TileDB as '
+        "a QueryCondition while reading, so non-matching cells of sparse "
+        "arrays are never materialized. For dense arrays, cells that do not "
+        "match hold the fill value"
+    ),
+    type=str,
+    default=None,
+)
+@click.option(
+    "--agg",
+    metavar="<func[:field],...>",
+    help=(
+        "Output aggregates of the selected cells instead of the cells, e.g. "
+        "'sum:a,max:b,count'. The functions are count, sum, mean, min and max. "
+        "The cells are read in batches as with --stream and folded into the "
+        "aggregates as they arrive, in constant memory. Null and NaN values "
+        "are skipped"
+    ),
+    type=Aggregates(),
+    default=None,
+)
+@click.option(
+    "--group-by",
+    metavar="<str>",
+    help=("Compute the --agg aggregates per value of the given dimension"),
     type=str,
     default=None,
 )
-def array(uri, selection, attribute, dimension, timestamp):
+@click.option(
+    "--limit",
+    "--head",
+    "limit",
+    metavar="<int>",
+    help=(
+        "Output at most the given number of cells. The selection is read in "
+        "batches sized for the limit and no further batches are read once it "
+        "is reached, so peeking at a large array returns quickly"
+    ),
+    type=click.IntRange(min=0),
+    default=None,
+)
+@click.option(
+    "--sample",
+    metavar="<fraction | int>",
+    help=(
+        "Output a random sample of the selection: a fraction of it, e.g. 0.01, "
+        "or a number of cells, e.g. 1000. Only randomly chosen tiles (dense "
+        "arrays) or fragment MBRs (sparse arrays) are read, so the I/O is "
+        "bounded by the sample size"
+    ),
+    type=SampleSize(),
+    default=None,
+)
+@click.option(
+    "--seed",
+    metavar="<int>",
+    help=("Seed of the random --sample, for a reproducible sample"),
+    type=int,
+    default=None,
+)
+@click.option(
+    "--checkpoint",
+    metavar="<path>",
+    help=(
+        "Record in the given file which partitions of the selection have been "
+        "written to --output, so that rerunning the export with the same "
+        "arguments after a failure skips them and appends the rest. Requires "
+        "--output and the tsv, csv or ndjson format"
+    ),
+    type=click.Path(dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--cache",
+    "use_cache",
+    help=(
+        "Cache the cells read on disk, in $TILEDB_CLI_CACHE_DIR or "
+        "~/.cache/tiledb-cli, and reuse them when the same read is repeated. "
+        "Entries are invalidated when the fragments of the array change"
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--cache-size",
+    metavar="<bytes>",
+    help=("Size of the --cache above which least recently used reads are evicted"),
+    type=ByteSize(),
+    default="1GiB",
+    show_default=True,
+)
+@click.option(
+    "--points",
+    metavar="<path>",
+    help=(
+        "Output the cells at the coordinates listed in the given CSV, npy or "
+        "Parquet file, in its order, instead of a selection. The points are "
+        "sorted in the cell order of the array and looked up in batched "
+        "multi-range queries. Points without a cell hold the fill values"
+    ),
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--explain",
+    help=(
+        "Output the read plan of the selection of a dense array instead of "
+        "reading it: the tiles it touches, the fraction of the bytes "
+        "decompressed from them that is used, the selection expanded to tile "
+        "boundaries and, when streaming, the number of slabs and of tiles "
+        "they decompress"
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--align",
+    help=(
+        "Align the reads of a dense array to its tiles. With split (the "
+        "default), streamed slabs are cut at tile boundaries so that no tile "
+        "is decompressed twice. With expand, the selection is also expanded "
+        "to tile boundaries, so that it uses all the data decompressed"
+    ),
+    type=click.Choice(["split", "expand"]),
+    is_flag=False,
+    flag_value="split",
+    default=None,
+)
+def array(
+    uri,
+    selection,
+    attribute,
+    dimension,
+    timestamp,
+    stream,
+    buffer_size,
+    format_,
+    output,
+    out_npy,
+    memory_budget,
+    parallel,
+    where,
+    agg,
+    group_by,
+    limit,
+    sample,
+    seed,
+    checkpoint,
+    use_cache,
+    cache_size,
+    points,
+    explain,
+    align,
+):
     """
     Output the data of a TileDB array located at uri with a given selection.
     The selection is given per dimension and is a scalar or slice that matches
-    the type of the underlying dimension.
+    the type of the underlying dimension, or several of them separated by
+    commas, which are read in a single query.
 
     For datetime dimensions, select by enclose the datetime string in quotes.
     e.g. tiledb dump array uri_to_array '5-3-2020 12:00':"5-3-2021"
@@ -159,53 +580,327 @@ def array(uri, selection, attribute, dimension, timestamp):
         #    rows  a
         # 0     2  3
         # 1     2  2
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse 1,2 1,4:5
+        #
+        # Read rows 1 and 2 and columns 1 and 4.
+        #    rows  cols  a
+        # 0     1     1  1
+        # 1     2     4  2
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse : : --stream
+        #
+        # Stream the whole array in batches.
+        # rows  cols  a
+        # 1     1     1
+        # 2     3     3
+        # 2     4     2
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse : : -f csv -o a.csv
+        #
+        # Write the whole array to a CSV file batch by batch.
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse : : -w "a > 1"
+        #
+        # Read only the cells where a is greater than 1.
+        #    rows  cols  a
+        # 0     2     3  3
+        # 1     2     4  2
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse : : --agg sum:a,count
+        #
+        # Sum a and count the cells without outputting them.
+        # OrderedDict([('sum(a)', array([6])), ('count', array([3]))])
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse : : --out-npy out
+        #
+        # Write out/rows.npy, out/cols.npy and out/a.npy.
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse : : --head 2
+        #
+        # Read only the first 2 cells.
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse : : --sample 2
+        #
+        # Read 2 cells from randomly chosen fragment MBRs.
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse : : -f csv \\
+            -o a.csv --checkpoint a.json
+        #
+        # Export to a CSV file, resuming where a previous run stopped.
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse : : -t 1700000000:
+        #
+        # Read only the cells written since the given UNIX timestamp.
+
+        tiledb dump array tiledb://TileDB-Inc/quickstart_sparse --points p.csv
+        #
+        # Read the cells at the rows,cols listed in p.csv, in its order.
+
+        tiledb dump array dense_array 5:95 : --explain
+        #
+        # Output the tiles read for rows 5 thru 94 and how much of them is used.
     """
-    import numpy as np
+    if agg is None and group_by is not None:
+        raise click.UsageError("--group-by requires --agg")
+    if agg is not None and (attribute or dimension):
+        raise click.UsageError("--agg cannot be used with --attribute or --dimension")
 
-    if timestamp:
-        timestamp = to_unix_time(timestamp)
+    if points is not None:
+        if explain or align is not None:
+            raise click.UsageError("--points cannot be used with --explain or --align")
+        if selection:
+            raise click.UsageError("--points cannot be used with a selection")
+        if agg is not None or sample is not None:
+            raise click.UsageError("--points cannot be used with --agg or --sample")
 
-    with tiledb.open(uri, timestamp=timestamp) as array:
-        pp = pprint.PrettyPrinter()
+    timestamp = to_tiledb_timestamp(timestamp)
+
+    # read in batches even if they are pretty printed together
+    batched = any(x is not None for x in (agg, limit, sample, points))
+
+    if memory_budget is not None:
+        if format_ == "pretty" and not batched:
+            raise click.UsageError(
+                "--memory-budget cannot be used with --format pretty"
+            )
+        buffer_size = memory_budget // 2 // parallel
+
+    if out_npy is not None:
+        if format_ is not None or output is not None:
+            raise click.UsageError("--out-npy cannot be used with --format or --output")
+        format_, output = "npy", out_npy
+
+    if format_ is None:
+        format_ = "tsv" if stream or memory_budget else "pretty"
+    stream = format_ != "pretty"
+
+    state = None
+    if checkpoint is not None:
+        if output is None or format_ == "pretty" or WRITERS[format_].binary:
+            raise click.UsageError(
+                "--checkpoint requires --output and the tsv, csv or ndjson format"
+            )
+        if batched:
+            raise click.UsageError(
+                "--checkpoint cannot be used with --agg, --limit, --sample or "
+                "--points"
+            )
+
+        args = {
+            "uri": uri,
+            "selection": list(selection),
+            "attribute": list(attribute),
+            "dimension": list(dimension),
+            "timestamp": list(timestamp) if isinstance(timestamp, tuple) else timestamp,
+            "format": format_,
+            "output": os.path.abspath(output),
+            "where": where,
+            "align": align,
+        }
+        # resume from the same version of the array
+        state, timestamp = open_checkpoint(checkpoint, args, timestamp)
+
+    cache = None
+    if use_cache:
+        if checkpoint is not None:
+            raise click.UsageError("--cache cannot be used with --checkpoint")
+        if sample is not None and seed is None:
+            raise click.UsageError("--cache requires a --seed with --sample")
+        cache = ResultCache(default_cache_dir(), cache_size)
+
+    attrs = None if attribute == () else attribute
+
+    config = None
+    masked = arrow = False
+    if stream or batched:
+        import tiledb
 
-        attrs = None if attribute == () else attribute
-        sels = list(selection)
+        schema = tiledb.ArraySchema.load(uri, ctx=get_ctx())
+        if agg is not None:
+            attrs, agg_dims = check_aggregates(schema, agg, group_by)
+            # the cells of dense arrays that do not match --where hold the
+            # fill value, so they are read with the attributes of the
+            # predicate and filtered out before they are aggregated
+            masked = where is not None and not schema.sparse
+            if masked:
+                attrs += [
+                    name
+                    for name in condition_fields(where)
+                    if schema.has_attr(name) and name not in attrs
+                ]
+            fields = len(attrs) + len(agg_dims)
+        else:
+            fields = len(attrs or range(schema.nattr))
+            fields += len(dimension or schema.domain)
+        config = batch_config(buffer_size, fields, memory_budget, limit)
+
+        # numpy query results fill the null values of nullable attributes,
+        # which Arrow tables keep track of
+        nullable = any(
+            schema.attr(name).isnullable
+            for name in attrs or [schema.attr(i).name for i in range(schema.nattr)]
+        )
+        if agg is not None:
+            arrow = nullable
+        elif stream:
+            arrow = WRITERS[format_].arrow or (nullable and WRITERS[format_].nulls)
+        if nullable and arrow:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise click.ClickException(
+                    "pyarrow is required to read the nulls of nullable attributes"
+                )
+
+    with open_array(uri, timestamp=timestamp, config=config) as array:
         dims = (
             [array.domain.dim(i).name for i in range(array.domain.ndim)]
             if dimension == ()
             else dimension
         )
+        cond = None if where is None else parse_condition(array, where)
+        if points is None:
+            sels, coords = parse_selection(array, dims, selection), None
+        else:
+            sels, coords = [], load_points(points, array)
 
-        if len(dims) != len(sels):
+        if (explain or align is not None) and array.schema.sparse:
+            raise click.UsageError("--explain and --align only apply to dense arrays")
+        if align == "expand":
+            sels = align_selection(array, sels)
+
+        if explain:
+            plan = plan_read(
+                array,
+                selection_ranges(array, sels),
+                list(attrs or [array.attr(i).name for i in range(array.nattr)]),
+                list(dims),
+                buffer_size if stream or batched else None,
+                align is not None,
+            )
+            click.echo(pprint.pformat(plan))
+            return
+
+        key = None
+        if cache is not None:
+            read = {
+                "selection": list(selection),
+                "attrs": attrs,
+                "dims": dims if agg is None else agg_dims,
+                "timestamp": timestamp,
+                "where": where,
+                "limit": limit,
+                "sample": sample,
+                "seed": seed,
+                "align": align,
+                "points": (
+                    None
+                    if points is None
+                    else [os.path.abspath(points), os.stat(points).st_mtime_ns]
+                ),
+                # batched reads return cells, the others the shaped query result
+                "batched": stream or batched,
+                "arrow": arrow,
+            }
+            key = cache.key(array, read)
+
+        # the size of the batches is only measured to report it
+        usage = {} if memory_budget is not None else None
+
+        def read_batches(ranges, dims, cond=cond, limit=limit):
+            return cached(
+                cache,
+                key,
+                lambda: iter_batches(
+                    array,
+                    ranges,
+                    attrs,
+                    dims,
+                    buffer_size,
+                    arrow=arrow,
+                    usage=usage,
+                    parallel=parallel,
+                    cond=cond,
+                    limit=limit,
+                    sample=sample,
+                    seed=seed,
+                    points=coords,
+                    align=align is not None,
+                ),
+            )
+
+        if stream and agg is None:
+            ranges = selection_ranges(array, sels)
+            parts, offset = remaining_partitions(array, ranges, state, timestamp)
+
+            # the npy writer preallocates its files for the cells expected
+            cells = None
+            if format_ == "npy":
+                if coords is not None:
+                    cells = len(next(iter(coords.values())))
+                else:
+                    cells = estimate_cells(array, ranges)
+                if limit is not None:
+                    cells = min(cells, limit)
+
+            opened = open_writer(format_, output, offset, cells)
+            with opened as writer, phase("stream"):
+                write_partitions(
+                    writer, parts, lambda part: read_batches(part, dims), state
+                )
+        elif batched:
+            with phase("read" if agg is None else "aggregate"):
+                batches = read_batches(
+                    selection_ranges(array, sels),
+                    dims if agg is None else agg_dims,
+                    cond=None if masked else cond,
+                    limit=None if masked else limit,
+                )
+                if masked:
+                    batches = filter_batches(batches, cond)
+                    if limit is not None:
+                        batches = head(batches, limit)
+                if agg is None:
+                    subarray = concat_batches(batches)
+                else:
+                    aggregator = Aggregator(agg, group_by)
+                    for batch in batches:
+                        aggregator.update(batch)
+                    subarray = aggregator.result()
+        else:
+            with phase("read"):
+                [subarray] = cached(
+                    cache,
+                    key,
+                    lambda: [read_selection(array, sels, attrs, dims, parallel, cond)],
+                )
+
+        # nothing is read, so nothing is measured, when the cache is hit
+        if memory_budget is not None and not usage:
+            click.echo(f"served from the cache, peak RSS: {mib(peak_rss())}", err=True)
+        elif memory_budget is not None:
             click.echo(
-                f"Error: The number of selections ({len(sels)}) needs to match "
-                f"the number of dimensions ({len(dims)})",
+                f"peak batch memory: {mib(usage['peak_bytes'])} in "
+                f"{usage['batches']} batches (budget {mib(memory_budget)}), "
+                f"peak RSS: {mib(peak_rss())}",
                 err=True,
             )
-            sys.exit(1)
-
-        for i, dim in enumerate(dims):
-            dt = np.dtype(array.domain.dim(dim).dtype)
-            if np.issubdtype(dt, np.datetime64):
-                quoted = re.compile("'[^']*'|\"[^\"]*\"")
-                sel = [p[1:-1] if p else None for p in quoted.findall(sels[i])]
-                if len(sel) == 0:
-                    click.echo(
-                        "Error: could not parse the selection for the datetime"
-                        f"dimension '{dim}'. (Did you enclose the selection in "
-                        "quotes?)",
-                        err=True,
-                    )
-                sel = np.array(sel, dtype=dt)
-                sels[i] = slice(*sel) if len(sel) > 1 else sel[0]
-            else:
-                sel = [p if p else None for p in sels[i].split(":")]
-                sel = np.array(sel, dtype=dt)
-                sels[i] = slice(*sel) if ":" in sels[i] else sel[0]
 
-        query = array.query(attrs=attrs, dims=dims, use_arrow=False)
-        subarray = query[tuple(sels)]
-        click.echo(pp.pformat(subarray))
+        if stream and agg is None:
+            return
+
+        pp = pprint.PrettyPrinter()
+
+        with phase("output"):
+            if stream:
+                with open_writer(format_, output) as writer:
+                    writer.write(subarray)
+            elif output is None:
+                click.echo(pp.pformat(subarray))
+            else:
+                with open(output, "w") as f:
+                    f.write(pp.pformat(subarray) + "\n")
 
 
 @click.command()
@@ -226,9 +921,11 @@ def fragments(uri, index, number):
     """
     Output the fragment information of a TileDB array located at uri.
     """
+    import tiledb
+
     pp = pprint.PrettyPrinter()
 
-    fragments = tiledb.array_fragments(uri)
+    fragments = tiledb.array_fragments(uri, ctx=get_ctx())
 
     if number:
         click.echo(len(fragments))
@@ -240,21 +937,208 @@ def fragments(uri, index, number):
     click.echo(pp.pformat(fragments))
 
 
+@click.command()
+@click.argument("uri")
+@click.argument("selection", nargs=-1)
+@click.option(
+    "--attribute",
+    "-A",
+    metavar="<str>",
+    help=(
+        "Compute the statistics of the given attribute. Multiple attributes "
+        "may be provided by passing the flag multiple times. By default, all "
+        "attributes are selected"
+    ),
+    multiple=True,
+    default=[],
+)
+@click.option(
+    "--timestamp",
+    "-t",
+    metavar="<unix seconds | iso 8601 date>[:<end>]",
+    help=(
+        "Compute the statistics of the array at the given UNIX timestamp or "
+        "ISO 8601 date, or of the data written in a start:end range of them"
+    ),
+    type=TimestampRange(),
+    default=None,
+)
+@click.option(
+    "--where",
+    "-w",
+    metavar="<str>",
+    help=("Only count the cells whose attributes match the given predicate"),
+    type=str,
+    default=None,
+)
+@click.option(
+    "--bins",
+    metavar="<int>",
+    help=(
+        "Number of bins of the histograms of numeric and datetime attributes. "
+        "Odd numbers are rounded up"
+    ),
+    type=click.IntRange(min=2),
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--parallel",
+    metavar="<int>",
+    help=(
+        "Split the selection along the tile boundaries of the first dimension "
+        "and scan the parts on the given number of threads"
+    ),
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--buffer-size",
+    metavar="<bytes>",
+    help=("Buffer budget of each batch scanned, e.g. 256MiB"),
+    type=ByteSize(),
+    default="64MiB",
+    show_default=True,
+)
+@click.option(
+    "--save",
+    help=(
+        "Save the statistics in the metadata of the array, along with the "
+        "fragments they were computed from, for --saved to output"
+    ),
+    is_flag=True,
+)
+@click.option(
+    "--saved",
+    help=(
+        "Output the statistics saved by --save instead of scanning the array. "
+        "A warning is written to stderr if fragments were added or removed "
+        "since"
+    ),
+    is_flag=True,
+)
+def stats(
+    uri,
+    selection,
+    attribute,
+    timestamp,
+    where,
+    bins,
+    parallel,
+    buffer_size,
+    save,
+    saved,
+):
+    """
+    Output statistics of the attributes of a TileDB array located at uri, or
+    of a selection of it given as with `tiledb dump array`: the number of
+    values and of nulls, the minimum and maximum, an estimate of the number
+    of distinct values and, for numeric and datetime attributes, a histogram.
+
+    The array is scanned once in batches that fit in --buffer-size, sparse
+    arrays with incomplete queries, and the statistics are folded in as the
+    batches arrive, in constant memory. Distinct values are estimated with
+    HyperLogLog to within about 1%. The histograms start from the range of
+    the first batch and double the width of their bins as later batches fall
+    outside of it.
+
+    Example:
+        tiledb dump stats tiledb://TileDB-Inc/quickstart_sparse
+        #
+        # OrderedDict([('a',
+        #               OrderedDict([('count', 3),
+        #                            ('nulls', 0),
+        #                            ('min', 1),
+        #                            ('max', 3),
+        #                            ('distinct', 3),
+        #                            ('histogram', ...)]))])
+
+        tiledb dump stats tiledb://TileDB-Inc/quickstart_sparse 2 : --save
+        #
+        # Compute the statistics of row 2 and save them in the array metadata.
+
+        tiledb dump stats tiledb://TileDB-Inc/quickstart_sparse --saved
+        #
+        # Output the saved statistics without scanning the array.
+    """
+    if saved:
+        if selection or attribute or timestamp is not None or where or save:
+            raise click.UsageError("--saved cannot be used with other options")
+
+        with open_array(uri) as array:
+            record = load_stats(array)
+            if record["fragments"] != fragments_key(array):
+                click.echo(
+                    "warning: the fragments of the array changed since the "
+                    "statistics were saved",
+                    err=True,
+                )
+        click.echo(pprint.pformat(record["stats"]))
+        return
+
+    import tiledb
+
+    schema = tiledb.ArraySchema.load(uri, ctx=get_ctx())
+    config = batch_config(buffer_size, len(attribute or range(schema.nattr)))
+
+    opened = open_array(uri, timestamp=to_tiledb_timestamp(timestamp), config=config)
+    with opened as array:
+        attrs = list(attribute or [array.attr(i).name for i in range(array.nattr)])
+        for name in attrs:
+            if not array.schema.has_attr(name):
+                raise click.BadParameter(
+                    f"'{name}' is not an attribute of {uri}", param_hint="'--attribute'"
+                )
+
+        dims = [array.domain.dim(i).name for i in range(array.domain.ndim)]
+        cond = None if where is None else parse_condition(array, where)
+        if selection:
+            sels = parse_selection(array, dims, selection)
+        else:
+            sels = [slice(None)] * len(dims)
+        ranges = selection_ranges(array, sels)
+        parts = (
+            [ranges] if parallel == 1 or ranges is None else partitions(array, ranges)
+        )
+
+        with phase("scan"):
+            result = scan_stats(array, parts, attrs, bins, buffer_size, parallel, cond)
+
+        if save:
+            record = {
+                "selection": list(selection),
+                "timestamp": (
+                    list(timestamp) if isinstance(timestamp, tuple) else timestamp
+                ),
+                "where": where,
+                "fragments": fragments_key(array),
+                "stats": result,
+            }
+            save_stats(uri, record, ctx=get_ctx())
+
+    click.echo(pprint.pformat(result))
+
+
 @click.command()
 def versions():
     """
     Output the TileDB version information for the embedded library (libtiledb)
     and Python package.
     """
+    import tiledb
+
     click.echo(f"{'TileDB':<12} {'.'.join(map(str, tiledb.libtiledb.version()))}")
     click.echo(f"{'TileDB-Py':<12} {tiledb.version.version}")
 
 
 dump.add_command(array)
 dump.add_command(config)
+dump.add_command(diff)
 dump.add_command(mbrs)
 dump.add_command(metadata)
 dump.add_command(nonempty_domain)
 dump.add_command(schema)
 dump.add_command(fragments)
+dump.add_command(stats)
 dump.add_command(versions)
@@ -1,5 +1,5 @@
-import tiledb
-from .utils import to_unix_time, prompt_poweruser
+from .stats import phase
+from .utils import get_ctx, to_unix_time, prompt_poweruser
 
 import click
 
@@ -45,6 +45,8 @@ def fragments_copy(uri_src, uri_dst, time_start, time_end, verbose, dry_run, for
     in an array located at uri-src to an array at uri-dst. If the array does not
     exist, it will be created. The range may be formatted in UNIX seconds or ISO 8601.
     """
+    import tiledb
+
     if not force:
         prompt_poweruser()
 
@@ -56,17 +58,19 @@ def fragments_copy(uri_src, uri_dst, time_start, time_end, verbose, dry_run, for
 
     copy_fragments_to_array = (
         tiledb.copy_fragments_to_existing_array
-        if tiledb.array_exists(uri_dst)
+        if tiledb.array_exists(uri_dst, ctx=get_ctx())
         else tiledb.create_array_from_fragments
     )
 
-    copy_fragments_to_array(
-        uri_src,
-        uri_dst,
-        timestamp_range=(time_start, time_end),
-        verbose=verbose,
-        dry_run=dry_run,
-    )
+    with phase("copy"):
+        copy_fragments_to_array(
+            uri_src,
+            uri_dst,
+            timestamp_range=(time_start, time_end),
+            ctx=get_ctx(),
+            verbose=verbose,
+            dry_run=dry_run,
+        )
 
 
 @click.command("delete")
@@ -99,6 +103,8 @@ def fragments_delete(uri, time_start, time_end, verbose, dry_run, force):
     Delete a range of fragments from time-start to time-end (inclusive) in an
     array located at uri. The range is a UNIX timestamp.
     """
+    import tiledb
+
     if not force:
         prompt_poweruser()
 
@@ -108,12 +114,14 @@ def fragments_delete(uri, time_start, time_end, verbose, dry_run, force):
     if time_end:
         time_end = to_unix_time(time_end)
 
-    tiledb.delete_fragments(
-        uri,
-        timestamp_range=(time_start, time_end),
-        verbose=verbose,
-        dry_run=dry_run,
-    )
+    with phase("delete"):
+        tiledb.delete_fragments(
+            uri,
+            timestamp_range=(time_start, time_end),
+            ctx=get_ctx(),
+            verbose=verbose,
+            dry_run=dry_run,
+        )
 
 
 fragments.add_command(fragments_delete)
@@ -0,0 +1,170 @@
+from .query import _cell_size, _extent, _slice, selection_ranges, slab_stop
+
+import collections
+
+
+def _offset(dim, value):
+    """
+    Return the offset of a coordinate from the start of the domain of its
+    dimension, as an int.
+    """
+    import numpy as np
+
+    lower = np.asarray(dim.domain[0]).astype(np.int64)
+    return int(np.asarray(value).astype(np.int64) - lower)
+
+
+def _tiles(dim, dim_ranges):
+    """
+    Return the indices of the tiles of a dimension that inclusive ranges
+    touch.
+    """
+    extent = _extent(dim)
+    tiles = set()
+    for lo, hi in dim_ranges:
+        tiles.update(range(_offset(dim, lo) // extent, _offset(dim, hi) // extent + 1))
+    return tiles
+
+
+def _length(dim, dim_ranges):
+    """
+    Return the number of coordinates of a dimension in inclusive ranges.
+    """
+    return sum(_offset(dim, hi) - _offset(dim, lo) + 1 for lo, hi in dim_ranges)
+
+
+def _selection(array, ranges):
+    """
+    Format inclusive ranges as the selection strings of `tiledb dump array`,
+    whose stops are excluded for integer dimensions only.
+    """
+    import numpy as np
+
+    selection = []
+    for i, dim_ranges in enumerate(ranges):
+        datetime = np.issubdtype(array.domain.dim(i).dtype, np.datetime64)
+        quote = "'" if datetime else ""
+        slices = [_slice(lo, hi) for lo, hi in dim_ranges]
+        selection.append(
+            ",".join(f"{quote}{s.start}{quote}:{quote}{s.stop}{quote}" for s in slices)
+        )
+    return selection
+
+
+def align_ranges(array, ranges):
+    """Expand inclusive ranges to the tile boundaries of their dimensions,
+    clipped to the domain, merging ranges that end up in the same tiles.
+
+    Args:
+        array (tiledb.Array): the opened dense array
+        ranges (list): inclusive ranges from selection_ranges()
+
+    Returns:
+        list: the expanded ranges, in the format of ranges
+    """
+    aligned = []
+    for i, dim_ranges in enumerate(ranges):
+        dim = array.domain.dim(i)
+        lower, upper = dim.domain
+        extent, tile = dim.tile, _extent(dim)
+
+        expanded = []
+        for lo, hi in sorted(dim_ranges):
+            start = lower + _offset(dim, lo) // tile * extent
+            end = min(lower + (_offset(dim, hi) // tile + 1) * extent - 1, upper)
+            if expanded and start <= expanded[-1][1]:
+                start = expanded.pop()[0]
+            expanded.append((start, end))
+        aligned.append(expanded)
+
+    return aligned
+
+
+def align_selection(array, sels):
+    """Expand parsed selections of a dense array to tile boundaries, for
+    `tiledb dump array --align expand`.
+
+    Args:
+        array (tiledb.Array): the opened dense array
+        sels (list): selections from parse_selection()
+
+    Returns:
+        list: a slice per dimension, or a list of them for dimensions with
+        several ranges
+    """
+    aligned = []
+    for dim_ranges in align_ranges(array, selection_ranges(array, sels)):
+        slices = [_slice(lo, hi) for lo, hi in dim_ranges]
+        aligned.append(slices if len(slices) > 1 else slices[0])
+    return aligned
+
+
+def _stream_plan(array, ranges, step, align):
+    """
+    Return the number of slabs a dense selection is streamed in with slabs of
+    step rows, and the number of tiles they decompress in total, counting the
+    tiles shared by consecutive slabs once per slab.
+    """
+    others = 1
+    for i, dim_ranges in enumerate(ranges[1:], start=1):
+        others *= len(_tiles(array.domain.dim(i), dim_ranges))
+
+    slabs = tile_reads = 0
+    for start, end in ranges[0]:
+        while start <= end:
+            stop = slab_stop(array, start, end, step, align)
+            slabs += 1
+            tile_reads += len(_tiles(array.domain.dim(0), [(start, stop - 1)])) * others
+            start = stop
+
+    return slabs, tile_reads
+
+
+def plan_read(array, ranges, attrs, dims, buffer_size=None, align=False):
+    """Plan the read of a selection of a dense array: the tiles it touches and
+    how much of the data decompressed from them is actually used.
+
+    TileDB decompresses whole tiles, so a selection that only uses a sliver
+    of the tiles at its edges wastes most of their decompression. The plan
+    also gives the selection expanded to tile boundaries, which decompresses
+    the same tiles without waste, and, if the selection is streamed, the
+    number of slabs and of tiles decompressed by them, estimated from the
+    initial slab size.
+
+    Args:
+        array (tiledb.Array): the opened dense array
+        ranges (list): inclusive ranges from selection_ranges()
+        attrs (list): attributes to read
+        dims (list): dimensions to return coordinates for
+        buffer_size (int): buffer budget of each batch if streamed
+        align (bool): whether the streamed slabs are cut at tile boundaries
+
+    Returns:
+        collections.OrderedDict: the plan; bytes only count the attributes,
+        which are what tiles hold, with variable sized values as 16 bytes
+    """
+    cell_size = _cell_size(array, attrs)
+
+    tiles = cells = tile_cells = 1
+    for i, dim_ranges in enumerate(ranges):
+        dim = array.domain.dim(i)
+        touched = len(_tiles(dim, dim_ranges))
+        tiles *= touched
+        tile_cells *= touched * _extent(dim)
+        cells *= _length(dim, dim_ranges)
+
+    plan = collections.OrderedDict()
+    plan["selection"] = _selection(array, ranges)
+    plan["tiles"] = tiles
+    plan["cells"] = cells
+    plan["bytes"] = cells * cell_size
+    plan["decompressed_bytes"] = tile_cells * cell_size
+    plan["used"] = round(cells / tile_cells, 4)
+    plan["aligned_selection"] = _selection(array, align_ranges(array, ranges))
+
+    if buffer_size is not None:
+        row_cells = cells // _length(array.domain.dim(0), ranges[0])
+        step = max(1, buffer_size // (row_cells * _cell_size(array, attrs + dims)))
+        plan["slabs"], plan["tile_reads"] = _stream_plan(array, ranges, step, align)
+
+    return plan
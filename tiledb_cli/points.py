@@ -0,0 +1,128 @@
+import click
+import collections
+import os
+
+
+def _read_table(path):
+    """
+    Read a CSV or Parquet file of points into a pandas DataFrame, or a npy
+    file into a numpy array.
+    """
+    import numpy as np
+    import pandas as pd
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        return np.load(path, allow_pickle=False)
+    if ext == ".csv":
+        # the header is told apart from a first point by load_points()
+        return pd.read_csv(path, dtype=str, keep_default_na=False, header=None)
+    if ext in (".parquet", ".pq"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise click.ClickException("pyarrow is required to read Parquet points")
+        return pd.read_parquet(path)
+
+    raise click.ClickException(
+        f"cannot read points from {path}: expected a .csv, .npy or .parquet file"
+    )
+
+
+def _convert(values, dim):
+    """
+    Convert the coordinates of the points along a dimension to its type.
+    String coordinates are returned as an object array of bytes, like the
+    coordinates TileDB returns for string dimensions.
+    """
+    import numpy as np
+
+    dt = np.dtype(dim.dtype)
+    values = np.asarray(values)
+    try:
+        if dt.kind == "S":
+            return np.array(
+                [v if isinstance(v, bytes) else str(v).encode() for v in values],
+                dtype=object,
+            )
+        return values.astype(dt)
+    except (TypeError, ValueError) as e:
+        raise click.ClickException(
+            f"cannot convert the points of dimension '{dim.name}' to {dt}: {e}"
+        )
+
+
+def _is_point(row, dims):
+    """
+    Return whether the first row of a CSV file holds coordinates rather than
+    column names.
+    """
+    if len(row) != len(dims):
+        return False
+
+    try:
+        for value, dim in zip(row, dims):
+            _convert([value], dim)
+    except click.ClickException:
+        return False
+    return True
+
+
+def load_points(path, array):
+    """Load the coordinates given to `tiledb dump array --points`.
+
+    CSV and Parquet files hold a column per dimension, named after the
+    dimensions or else in the order of the domain; a CSV file without a
+    header is read positionally. npy files hold an array of shape
+    (points, dimensions), or a structured array with a field per dimension.
+
+    Args:
+        path (str): the .csv, .npy or .parquet file
+        array (tiledb.Array): the opened array
+
+    Returns:
+        collections.OrderedDict: the coordinates of the points as numpy
+        arrays in the types of the dimensions, by dimension name in domain
+        order
+    """
+    import numpy as np
+
+    dims = [array.domain.dim(i) for i in range(array.domain.ndim)]
+    names = [dim.name for dim in dims]
+    table = _read_table(path)
+
+    if isinstance(table, np.ndarray):
+        if table.dtype.names is not None:
+            missing = [name for name in names if name not in table.dtype.names]
+            if missing:
+                raise click.ClickException(
+                    f"the points in {path} have no field '{missing[0]}'"
+                )
+            columns = [table[name] for name in names]
+        else:
+            if table.ndim == 1 and len(dims) == 1:
+                table = table.reshape(-1, 1)
+            if table.ndim != 2 or table.shape[1] != len(dims):
+                raise click.ClickException(
+                    f"the points in {path} have shape {table.shape}, expected "
+                    f"(points, {len(dims)})"
+                )
+            columns = list(table.T)
+    else:
+        if path.lower().endswith(".csv") and len(table):
+            header = list(table.iloc[0])
+            if set(names) <= set(header) or not _is_point(header, dims):
+                table = table.iloc[1:]
+                table.columns = header
+        if not all(name in table.columns for name in names):
+            if len(table.columns) != len(dims):
+                raise click.ClickException(
+                    f"the points in {path} need a column per dimension, named "
+                    f"{', '.join(names)}"
+                )
+            table.columns = names
+        columns = [table[name].to_numpy() for name in names]
+
+    return collections.OrderedDict(
+        (dim.name, _convert(values, dim)) for dim, values in zip(dims, columns)
+    )
@@ -0,0 +1,1363 @@
+import click
+import collections
+import concurrent.futures
+import itertools
+import math
+import operator
+import queue
+import re
+import threading
+
+
+def _parse_range(part, dt, dim):
+    """
+    Parse a scalar or start:stop slice of a selection in the type dt of the
+    dimension dim.
+    """
+    import numpy as np
+
+    if np.issubdtype(dt, np.datetime64):
+        quoted = re.compile("'[^']*'|\"[^\"]*\"")
+        sel = quoted.findall(part)
+        if len(sel) == 0:
+            raise click.ClickException(
+                "could not parse the selection for the datetime "
+                f"dimension '{dim}'. (Did you enclose the selection in "
+                "quotes?)"
+            )
+        sel = [np.array(p[1:-1], dtype=dt)[()] for p in sel]
+        return slice(*sel) if len(sel) > 1 else sel[0]
+    else:
+        sel = [np.array(p, dtype=dt)[()] if p else None for p in part.split(":")]
+        return slice(*sel) if ":" in part else sel[0]
+
+
+# the ranges of a selection, separated by commas outside of quoted datetime
+# values, matched in one pass
+_RANGE = re.compile("(?:'[^']*'|\"[^\"]*\"|[^,])+")
+
+
+def parse_selection(array, dims, selection):
+    """Parse the selection strings given to `tiledb dump array`.
+
+    Each selection is a scalar or a start:stop slice (either bound may be
+    omitted; stop is excluded for integer dimensions and included for the
+    others, as when indexing the array) in the type of the matching
+    dimension, or several of them separated by commas. Datetime values are
+    enclosed in quotes.
+
+    Args:
+        array (tiledb.Array): the opened array
+        dims (list): names of the dimensions the selections are typed by
+        selection (list): one selection string per dimension
+
+    Returns:
+        list: a scalar or slice per dimension, or a list of them for
+        dimensions with several ranges
+    """
+    import numpy as np
+
+    sels = list(selection)
+
+    if len(dims) != len(sels):
+        raise click.ClickException(
+            f"The number of selections ({len(sels)}) needs to match "
+            f"the number of dimensions ({len(dims)})"
+        )
+
+    for i, dim in enumerate(dims):
+        dt = np.dtype(array.domain.dim(dim).dtype)
+        parts = _RANGE.findall(sels[i]) or [sels[i]]
+        sel = [_parse_range(part.strip(), dt, dim) for part in parts]
+        sels[i] = sel if len(sel) > 1 else sel[0]
+
+    return sels
+
+
+def parse_condition(array, where):
+    """Check an attribute predicate given to `tiledb dump array --where`.
+
+    The predicate uses TileDB's QueryCondition syntax, e.g.
+    "a > 10 and b == 3", and is evaluated by the storage engine, so that only
+    the matching cells of sparse arrays are read. For dense arrays, cells
+    that do not match hold the fill value of their attributes, unless they
+    are read without the predicate and filtered with filter_batches().
+
+    Args:
+        array (tiledb.Array): the opened array
+        where (str): the predicate
+
+    Returns:
+        str: the predicate, to be passed as the cond of the queries
+    """
+    import tiledb
+
+    try:
+        tiledb.QueryCondition(where, ctx=array.ctx)
+    except tiledb.TileDBError as e:
+        raise click.ClickException(f"invalid --where predicate: {e}")
+
+    # QueryCondition only looks up the fields once the query is submitted
+    for name in sorted(condition_fields(where)):
+        if not (array.schema.has_attr(name) or array.domain.has_dim(name)):
+            raise click.ClickException(
+                f"invalid --where predicate: no attribute or dimension '{name}'"
+            )
+        if array.domain.has_dim(name) and not array.schema.sparse:
+            raise click.ClickException(
+                f"invalid --where predicate: '{name}' is a dimension of a dense "
+                "array"
+            )
+
+    return where
+
+
+def _condition_field(node):
+    """
+    Return the name of the field a node of a predicate refers to, or None if
+    it is a value.
+    """
+    import ast
+
+    if isinstance(node, ast.Name):
+        return node.id
+    if (
+        isinstance(node, ast.Call)
+        and getattr(node.func, "id", None) in ("attr", "dim")
+        and isinstance(node.args[0], ast.Constant)
+    ):
+        return node.args[0].value
+    return None
+
+
+def condition_fields(where):
+    """Return the names of the attributes and dimensions a predicate given to
+    `tiledb dump array --where` refers to.
+
+    Args:
+        where (str): the predicate
+
+    Returns:
+        list: the field names, in the order they first appear
+    """
+    import ast
+
+    names = []
+
+    def visit(node):
+        name = _condition_field(node)
+        if name is not None:
+            if name not in names:
+                names.append(name)
+            return
+        # the names of the attr(), dim() and val() functions are not fields
+        if isinstance(node, ast.Call):
+            children = node.args
+        else:
+            children = ast.iter_child_nodes(node)
+        for child in children:
+            visit(child)
+
+    visit(ast.parse(where, mode="eval"))
+    return names
+
+
+def _condition_value(node):
+    """
+    Return the value a node of a predicate stands for: a constant, a val()
+    cast, a signed number or a list of them.
+    """
+    import ast
+
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Call):
+        return _condition_value(node.args[0])
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        value = _condition_value(node.operand)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.List):
+        return [_condition_value(elt) for elt in node.elts]
+    raise click.ClickException(f"invalid --where predicate: {ast.dump(node)}")
+
+
+def _condition_column(batch, name):
+    """
+    Return the values of a field of a batch as a numpy array, with the mask
+    of its null values.
+    """
+    import numpy as np
+
+    values = batch[name]
+    if hasattr(values, "null_count"):
+        return values.to_numpy(), values.is_null().to_numpy()
+    return values, np.zeros(len(values), dtype=bool)
+
+
+def _compare(batch, lhs, op, rhs):
+    """
+    Evaluate a comparison of a field with a value over the cells of a batch.
+    Null values only match "is None" and "== None".
+    """
+    import ast
+    import numpy as np
+
+    # the field is on the right of e.g. "3 < a"
+    mirrored = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE}
+    if _condition_field(lhs) is None:
+        lhs, rhs = rhs, lhs
+        op = mirrored.get(type(op), type(op))()
+
+    values, nulls = _condition_column(batch, _condition_field(lhs))
+    value = _condition_value(rhs)
+
+    # ASCII strings are read as bytes
+    def cast(v):
+        is_bytes = values.dtype.kind == "S" or (
+            values.dtype.kind == "O" and len(values) and isinstance(values[0], bytes)
+        )
+        return v.encode() if isinstance(v, str) and is_bytes else v
+
+    if value is None:
+        if isinstance(op, (ast.Eq, ast.Is)):
+            return nulls
+        if isinstance(op, (ast.NotEq, ast.IsNot)):
+            return ~nulls
+    if isinstance(op, (ast.In, ast.NotIn)):
+        match = np.isin(values, [cast(v) for v in value])
+        if isinstance(op, ast.NotIn):
+            match = ~match
+    else:
+        ops = {
+            ast.Eq: operator.eq,
+            ast.NotEq: operator.ne,
+            ast.Lt: operator.lt,
+            ast.LtE: operator.le,
+            ast.Gt: operator.gt,
+            ast.GtE: operator.ge,
+        }
+        if type(op) not in ops:
+            raise click.ClickException(
+                f"invalid --where predicate: unsupported operator {ast.dump(op)}"
+            )
+        match = np.asarray(ops[type(op)](values, cast(value)), dtype=bool)
+
+    return match & ~nulls
+
+
+def condition_mask(where, batch):
+    """Evaluate a predicate given to `tiledb dump array --where` over the
+    cells of a batch, the way QueryCondition does in the storage engine.
+
+    Args:
+        where (str): the predicate, from parse_condition()
+        batch: dict of one-dimensional numpy arrays by field name, or a
+            pyarrow.Table, holding the fields of condition_fields()
+
+    Returns:
+        numpy.ndarray: the boolean mask of the matching cells
+    """
+    import ast
+    import numpy as np
+
+    def evaluate(node):
+        if isinstance(node, ast.BoolOp):
+            operands = node.values
+        elif isinstance(node, ast.BinOp) and isinstance(
+            node.op, (ast.BitAnd, ast.BitOr)
+        ):
+            operands = [node.left, node.right]
+        else:
+            operands = None
+
+        if operands is not None:
+            combine = (
+                np.logical_and
+                if isinstance(node.op, (ast.And, ast.BitAnd))
+                else np.logical_or
+            )
+            return combine.reduce([evaluate(operand) for operand in operands])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return ~evaluate(node.operand)
+        if isinstance(node, ast.Compare):
+            # chained comparisons such as "1 < a < 5" hold pairwise
+            terms = [node.left] + node.comparators
+            return np.logical_and.reduce(
+                [
+                    _compare(batch, lhs, op, rhs)
+                    for lhs, op, rhs in zip(terms[:-1], node.ops, terms[1:])
+                ]
+            )
+        raise click.ClickException(f"invalid --where predicate: {ast.dump(node)}")
+
+    return evaluate(ast.parse(where, mode="eval").body)
+
+
+def filter_batches(batches, where):
+    """Filter batches of cells by a predicate, for dense arrays whose queries
+    keep the cells that do not match it with the fill values.
+
+    Args:
+        batches (iterable): dicts of numpy arrays or pyarrow Tables from
+            iter_batches(), holding the fields of condition_fields()
+        where (str): the predicate, from parse_condition()
+
+    Yields:
+        The batches with only their matching cells.
+    """
+    for batch in batches:
+        mask = condition_mask(where, batch)
+        if isinstance(batch, dict):
+            yield type(batch)((name, values[mask]) for name, values in batch.items())
+        else:
+            import pyarrow as pa
+
+            yield batch.filter(pa.array(mask))
+
+
+def is_multi_range(sels):
+    """
+    Return whether any dimension of a parsed selection has several ranges.
+    """
+    return any(isinstance(sel, list) for sel in sels)
+
+
+def _bounds(sel, lower, upper):
+    """
+    Return the inclusive [start, end] range covered by a parsed selection,
+    with omitted slice bounds replaced by the given lower and upper bound.
+    As when indexing the array, the stop of integer slices is excluded and
+    that of floating point, datetime and string slices included.
+    """
+    import numpy as np
+
+    if not isinstance(sel, slice):
+        return sel, sel
+
+    start = lower if sel.start is None else sel.start
+    if sel.stop is None:
+        end = upper
+    elif isinstance(sel.stop, (int, np.integer)):
+        end = sel.stop - 1
+    else:
+        end = sel.stop
+
+    return start, end
+
+
+def _slice(lo, hi):
+    """
+    Turn an inclusive range into the slice indexing the array reads, which
+    excludes the stop of integer slices only, see _bounds().
+    """
+    import numpy as np
+
+    if isinstance(hi, (int, np.integer)):
+        return slice(lo, hi + 1)
+    return slice(lo, hi)
+
+
+def selection_ranges(array, sels, nonempty=True):
+    """Turn parsed selections into inclusive [start, end] ranges for each
+    dimension of the array.
+
+    Selections apply to the leading dimensions. Omitted bounds and
+    dimensions without a selection are limited to the domain for dense arrays
+    and to the non-empty domain for sparse arrays.
+
+    Args:
+        array (tiledb.Array): the opened array
+        sels (list): selections from parse_selection()
+        nonempty (bool): limit sparse arrays to their non-empty domain
+
+    Returns:
+        list: a list of (start, end) tuples per dimension, or None if the
+        array is sparse and empty
+    """
+    domain = None
+    if array.schema.sparse and nonempty:
+        domain = array.nonempty_domain()
+        if domain is None:
+            return None
+
+    ranges = []
+    for i in range(array.domain.ndim):
+        lower, upper = domain[i] if domain else array.domain.dim(i).domain
+        sel = sels[i] if i < len(sels) else slice(None)
+        sel = sel if isinstance(sel, list) else [sel]
+        ranges.append([_bounds(s, lower, upper) for s in sel])
+
+    return ranges
+
+
+def _slices(ranges):
+    """
+    Turn inclusive ranges per dimension into the lists of slices taken by the
+    multi_index and df indexers.
+    """
+    return tuple([slice(lo, hi) for lo, hi in r] for r in ranges)
+
+
+def _length(lo, hi):
+    """
+    Return the number of coordinates in the inclusive range [lo, hi] of an
+    integer or datetime dimension.
+    """
+    import numpy as np
+
+    return int(np.asarray(hi - lo).astype(np.int64)) + 1
+
+
+def _extent(dim):
+    """
+    Return the tile extent of an integer or datetime dimension as an int.
+    """
+    import numpy as np
+
+    return int(np.asarray(dim.tile).astype(np.int64))
+
+
+def _cell_size(array, names):
+    """
+    Estimate the number of bytes needed per cell for the given attributes and
+    dimensions, counting variable sized values as 8 bytes of offsets plus 8
+    bytes of data.
+    """
+    import numpy as np
+
+    size = 0
+    for name in names:
+        if array.schema.has_attr(name):
+            field = array.attr(name)
+            var = field.isvar
+        else:
+            field = array.domain.dim(name)
+            var = field.isvar
+        size += 16 if var else np.dtype(field.dtype).itemsize
+
+    return size
+
+
+def estimate_cells(array, ranges):
+    """Estimate the number of cells in the given ranges: exactly for dense
+    arrays, and from TileDB's estimated result size of the coordinates of
+    the first dimension for sparse arrays.
+
+    Args:
+        array (tiledb.Array): the opened array
+        ranges (list): inclusive ranges from selection_ranges()
+
+    Returns:
+        int: the estimated number of cells
+    """
+    import numpy as np
+
+    if ranges is None:
+        return 0
+
+    if not array.schema.sparse:
+        cells = 1
+        for dim_ranges in ranges:
+            cells *= sum(_length(lo, hi) for lo, hi in dim_ranges)
+        return cells
+
+    dim = array.domain.dim(0)
+    query = array.query(attrs=[], dims=[dim.name], return_incomplete=True)
+    size = query.multi_index[_slices(ranges)].estimated_result_sizes()[dim.name]
+    if dim.isvar:
+        return size.offsets_bytes // 8
+    return size.data_bytes // np.dtype(dim.dtype).itemsize
+
+
+def tile_slabs(array, start, end, tiles=1, dim=0):
+    """Split an inclusive range of a dimension into slabs of whole tiles,
+    aligned to the tile boundaries of the dimension.
+
+    Args:
+        array (tiledb.Array): the opened array
+        start: first coordinate of the range
+        end: last coordinate of the range
+        tiles (int): number of tiles per slab
+        dim (int): index of the dimension, the first by default
+
+    Returns:
+        list: inclusive (start, end) range of each slab; a single slab if the
+        dimension is not of an integer or datetime type
+    """
+    import numpy as np
+
+    dim = array.domain.dim(dim)
+    dt = np.dtype(dim.dtype)
+    if not (np.issubdtype(dt, np.integer) or np.issubdtype(dt, np.datetime64)):
+        return [(start, end)]
+
+    lower, extent = dim.domain[0], dim.tile
+
+    slabs = []
+    while start <= end:
+        index = (start - lower) // extent
+        stop = min(lower + (index + tiles) * extent - 1, end)
+        slabs.append((start, stop))
+        start = stop + 1
+
+    return slabs
+
+
+def slab_stop(array, start, end, step, align=False):
+    """Return the exclusive end of the slab of at most step rows of the first
+    dimension that starts at start, without going past end.
+
+    With align, the slab is cut at the last tile boundary it crosses, so that
+    consecutive slabs do not decompress the same tiles. Slabs of less than
+    a tile cannot be aligned and are left as they are.
+
+    Args:
+        array (tiledb.Array): the opened array
+        start: first coordinate of the slab
+        end: last coordinate of the range being split
+        step (int): maximum number of rows of the slab
+        align (bool): cut the slab at a tile boundary
+
+    Returns:
+        The coordinate after the last row of the slab.
+    """
+    stop = min(start + step, end + 1)
+    if not align or stop > end:
+        return stop
+
+    dim = array.domain.dim(0)
+    lower, extent = dim.domain[0], dim.tile
+    boundary = lower + (stop - lower) // extent * extent
+    return boundary if stop - start >= extent and boundary > start else stop
+
+
+def read_slab(array, subarray, attrs, dims, arrow=False, cond=None):
+    """Read all cells in a subarray in a single query.
+
+    Args:
+        array (tiledb.Array): the opened array
+        subarray (list): list of inclusive (start, end) ranges per dimension
+        attrs (list): attributes to read
+        dims (list): dimensions to return coordinates for
+        arrow (bool): return a pyarrow Table instead of a dict
+        cond (str): attribute predicate from parse_condition()
+
+    Returns:
+        dict: one-dimensional numpy arrays of the cells read, by field name,
+        or a pyarrow.Table with arrow
+    """
+    query = array.query(attrs=attrs, dims=dims, cond=cond, return_arrow=arrow)
+
+    if arrow:
+        return _strip_metadata(query.df[_slices(subarray)])
+
+    result = query.multi_index[_slices(subarray)]
+    return {name: values.ravel() for name, values in result.items()}
+
+
+def map_ordered(func, items, workers):
+    """Apply func to items on a pool of threads and yield the results in the
+    order of items, keeping at most workers results in flight.
+
+    Args:
+        func (callable): function of one item
+        items (iterable): the items
+        workers (int): number of threads
+
+    Yields:
+        The result of func for each item.
+    """
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def chain_ordered(func, items, workers):
+    """Run the generator func returns for each item on a pool of threads and
+    yield the values of one generator after the other, in the order of
+    items. Each generator runs at most one value ahead of the consumer, so
+    at most about two values per thread are held at once.
+
+    Args:
+        func (callable): generator function of one item
+        items (iterable): the items
+        workers (int): number of threads
+
+    Yields:
+        The values of the generator of each item.
+    """
+    stop = threading.Event()
+    done = object()
+
+    def put(values, value):
+        while not stop.is_set():
+            try:
+                values.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(item, values):
+        try:
+            if stop.is_set():
+                return
+            for value in func(item):
+                if not put(values, value):
+                    return
+        finally:
+            put(values, done)
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        try:
+            running = []
+            for item in items:
+                values = queue.Queue(maxsize=1)
+                running.append((pool.submit(run, item, values), values))
+
+            for future, values in running:
+                for value in iter(values.get, done):
+                    yield value
+                future.result()
+        finally:
+            stop.set()
+
+
+def iter_batches(
+    array,
+    ranges,
+    attrs=None,
+    dims=None,
+    buffer_size=None,
+    arrow=False,
+    usage=None,
+    parallel=1,
+    cond=None,
+    limit=None,
+    sample=None,
+    seed=None,
+    points=None,
+    align=False,
+):
+    """Read the cells in the given ranges in batches that fit in a buffer
+    budget.
+
+    Sparse arrays are read with an incomplete query, so TileDB fills buffers
+    of at most buffer_size bytes and resumes where the previous batch ended.
+    Dense arrays are read in slabs of whole rows of the first dimension
+    sized to fit the budget. The slab size starts from an estimate of the
+    cell size and is grown or shrunk after each slab from the bytes it
+    actually held, which matters for variable sized attributes.
+
+    With parallel > 1, the first dimension is instead split at its tile
+    boundaries into slabs that are read concurrently on a thread pool and
+    yielded in order. Dense slabs are sized from the estimate; sparse slabs
+    span one tile each and are read in full.
+
+    With arrow, TileDB-Py builds the batches directly as Arrow tables from the
+    query buffers, without converting them to numpy arrays first.
+
+    Args:
+        array (tiledb.Array): the opened array; for sparse arrays, its context
+            should set py.init_buffer_bytes (see batch_config())
+        ranges (list): inclusive ranges from selection_ranges()
+        attrs (list): attributes to read, all if None
+        dims (list): dimensions to return coordinates for, all if None
+        buffer_size (int): buffer budget in bytes of each batch
+        arrow (bool): yield pyarrow Tables instead of dicts
+        usage (dict): if given, the number of "batches" read and the
+            "peak_bytes" held by a single batch are recorded in it, adding to
+            the values of earlier calls
+        parallel (int): number of slabs read concurrently
+        cond (str): attribute predicate from parse_condition()
+        limit (int): stop reading once this many cells have been yielded,
+            cutting the last batch short; dense slabs are capped to the rows
+            needed for it
+        sample: if given, read a random sample of the cells instead, see
+            sample_batches()
+        seed (int): seed of the random generator used for the sample
+        points (dict): if given, look up the cells at these points instead of
+            reading the ranges, see point_batches()
+        align (bool): cut the slabs of dense arrays at tile boundaries, see
+            slab_stop()
+
+    Yields:
+        dict: one-dimensional numpy arrays of the cells read, by field name,
+        or a pyarrow.Table with arrow
+    """
+    if usage is not None:
+        usage.setdefault("batches", 0)
+        usage.setdefault("peak_bytes", 0)
+
+    if ranges is None and points is None:
+        return
+
+    if attrs is None:
+        attrs = [array.attr(i).name for i in range(array.nattr)]
+    if dims is None:
+        dims = [array.domain.dim(i).name for i in range(array.domain.ndim)]
+
+    if points is not None:
+        batches = point_batches(
+            array, points, attrs, dims, buffer_size, arrow, parallel, cond
+        )
+    elif sample is not None:
+        batches = sample_batches(array, ranges, attrs, dims, sample, seed, arrow, cond)
+    else:
+        batches = _read_batches(
+            array, ranges, attrs, dims, buffer_size, arrow, parallel, cond, limit, align
+        )
+    if limit is not None:
+        batches = head(batches, limit)
+
+    if usage is None:
+        yield from batches
+        return
+
+    for batch in batches:
+        usage["batches"] += 1
+        usage["peak_bytes"] = max(usage["peak_bytes"], batch_nbytes(batch))
+        yield batch
+
+
+def _read_batches(
+    array, ranges, attrs, dims, buffer_size, arrow, parallel, cond, limit, align
+):
+    """
+    Yield the batches of iter_batches() as they are read.
+    """
+    first, rest = ranges[0], ranges[1:]
+
+    if array.schema.sparse:
+        # incomplete queries return as many cells as fit in the buffers
+        def read(part):
+            query = array.query(
+                attrs=attrs,
+                dims=dims,
+                cond=cond,
+                return_incomplete=True,
+                return_arrow=arrow,
+            )
+            indexer = query.df if arrow else query.multi_index
+            for batch in indexer[_slices(part)]:
+                yield _strip_metadata(batch) if arrow else batch
+
+        if parallel == 1:
+            yield from read(ranges)
+            return
+
+        # one part of whole tiles of the first dimension per thread
+        ntiles = sum(len(tile_slabs(array, *r)) for r in first)
+        tiles = -(-ntiles // parallel)
+        parts = [
+            [[slab], *rest] for r in first for slab in tile_slabs(array, *r, tiles)
+        ]
+        yield from chain_ordered(read, parts, parallel)
+        return
+
+    cell_size = _cell_size(array, list(attrs) + list(dims))
+
+    row_cells = 1
+    for r in rest:
+        row_cells *= sum(_length(lo, hi) for lo, hi in r)
+
+    step = max(1, (buffer_size or 0) // (row_cells * cell_size))
+    if limit is not None:
+        step = min(step, max(1, -(-limit // row_cells)))
+
+    if parallel > 1:
+        tiles = max(1, step // _extent(array.domain.dim(0)))
+        slabs = [slab for r in first for slab in tile_slabs(array, *r, tiles)]
+
+        def read(slab):
+            return read_slab(array, [[slab], *rest], attrs, dims, arrow, cond)
+
+        for batch in map_ordered(read, slabs, parallel):
+            yield batch
+        return
+
+    for start, end in first:
+        while start <= end:
+            stop = slab_stop(array, start, end, step, align)
+            subarray = [[(start, stop - 1)], *rest]
+            batch = read_slab(array, subarray, attrs, dims, arrow, cond)
+
+            yield batch
+
+            # resize the next slab to what this one actually took per row
+            if buffer_size:
+                nbytes = batch_nbytes(batch)
+                if nbytes:
+                    rows = _length(start, stop - 1)
+                    step = max(1, rows * buffer_size // nbytes)
+            start = stop
+
+
+def head(batches, limit):
+    """Yield batches until limit cells have been yielded, cutting the last
+    one short. No further batches are requested once the limit is reached,
+    so the remaining queries are never submitted.
+
+    Args:
+        batches (iterable): dicts of numpy arrays or pyarrow Tables
+        limit (int): number of cells
+
+    Yields:
+        The batches, with at most limit cells in total.
+    """
+    if limit <= 0:
+        return
+
+    for batch in batches:
+        ncells = _batch_len(batch)
+        if ncells >= limit:
+            if isinstance(batch, dict):
+                yield {name: values[:limit] for name, values in batch.items()}
+            else:
+                yield batch.slice(0, limit)
+            return
+        limit -= ncells
+        yield batch
+
+
+def _batch_len(batch):
+    """
+    Return the number of cells in a batch from iter_batches().
+    """
+    if not isinstance(batch, dict):
+        return batch.num_rows
+    return len(next(iter(batch.values()))) if batch else 0
+
+
+def sample_units(array, ranges):
+    """Split inclusive ranges into the units sampled by sample_batches(): the
+    space tiles of dense arrays and the MBRs of the fragments of sparse
+    arrays, clipped to the ranges.
+
+    The number of cells of dense units is exact. Sparse units are estimated
+    to hold as many cells as their MBR, a full data tile of the capacity of
+    the array but for the last one of a fragment, before clipping.
+
+    Args:
+        array (tiledb.Array): the opened array
+        ranges (list): inclusive ranges from selection_ranges()
+
+    Returns:
+        tuple: the number of units, a function returning the ranges of the
+        unit with the given index, in the format of ranges, and a numpy
+        array of the number of cells of each unit
+    """
+    import numpy as np
+    import tiledb
+
+    if not array.schema.sparse:
+        pieces = [
+            [piece for r in dim_ranges for piece in tile_slabs(array, *r, dim=i)]
+            for i, dim_ranges in enumerate(ranges)
+        ]
+        shape = tuple(len(dim_pieces) for dim_pieces in pieces)
+
+        def unit(index):
+            return [
+                [dim_pieces[i]]
+                for dim_pieces, i in zip(pieces, np.unravel_index(index, shape))
+            ]
+
+        sizes = np.ones(shape, dtype=np.int64)
+        for i, dim_pieces in enumerate(pieces):
+            lengths = np.array([_length(lo, hi) for lo, hi in dim_pieces])
+            sizes *= lengths.reshape([-1 if j == i else 1 for j in range(len(shape))])
+
+        return int(np.prod(shape)), unit, sizes.ravel()
+
+    fragments = tiledb.array_fragments(array.uri, include_mbrs=True, ctx=array.ctx)
+    opened, end = array.timestamp_range
+
+    # MBRs of datetime dimensions are given as integers
+    dtypes = [np.dtype(array.domain.dim(i).dtype) for i in range(array.domain.ndim)]
+    datetimes = [np.issubdtype(dt, np.datetime64) for dt in dtypes]
+
+    capacity = array.schema.capacity
+
+    units, sizes = [], []
+    for mbrs, (start, stop), cells in zip(
+        fragments.mbrs, fragments.timestamp_range, fragments.cell_num
+    ):
+        if start > end or stop < opened:
+            continue
+        for j, mbr in enumerate(mbrs):
+            mbr = [
+                np.array(bounds, dtype=np.int64).astype(dt) if datetime else bounds
+                for bounds, dt, datetime in zip(mbr, dtypes, datetimes)
+            ]
+            unit = [
+                [
+                    (max(lo, low), min(hi, high))
+                    for lo, hi in dim_ranges
+                    if lo <= high and low <= hi
+                ]
+                for (low, high), dim_ranges in zip(mbr, ranges)
+            ]
+            if all(unit):
+                units.append(unit)
+                sizes.append(max(1, min(capacity, cells - j * capacity)))
+
+    return len(units), units.__getitem__, np.array(sizes, dtype=np.int64)
+
+
+def _random_order(count, rng):
+    """
+    Yield the integers below count in a random order, without materializing
+    a permutation of them when count is large.
+    """
+    if count <= 1 << 20:
+        yield from rng.permutation(count).tolist()
+        return
+
+    seen = set()
+    while len(seen) < count:
+        index = int(rng.integers(count))
+        if index not in seen:
+            seen.add(index)
+            yield index
+
+
+def _overlaps(unit, other):
+    """
+    Return whether two units of sample_units() share any coordinates.
+    """
+    return all(
+        any(
+            lo <= other_hi and other_lo <= hi
+            for lo, hi in dim_ranges
+            for other_lo, other_hi in other_ranges
+        )
+        for dim_ranges, other_ranges in zip(unit, other)
+    )
+
+
+def _coordinates(batch, names):
+    """
+    Return the coordinates of the cells of a batch on the named dimensions,
+    as numpy arrays.
+    """
+    import numpy as np
+
+    return [
+        batch[name] if isinstance(batch[name], np.ndarray) else batch[name].to_numpy()
+        for name in names
+    ]
+
+
+def _isin(batch, coords, names):
+    """
+    Return the mask of the cells of a batch at one of the given coordinates
+    on the named dimensions.
+    """
+    import pandas as pd
+
+    cells = pd.MultiIndex.from_arrays(_coordinates(batch, names))
+    return cells.isin(pd.MultiIndex.from_arrays(coords))
+
+
+def sample_batches(
+    array, ranges, attrs, dims, sample, seed=None, arrow=False, cond=None
+):
+    """Read a random sample of the cells in the given ranges, one batch per
+    unit from sample_units().
+
+    Only randomly chosen units are read, so the I/O is bounded by the size of
+    the sample rather than of the selection. With a fraction, that fraction
+    of the units is chosen and read in full, in storage order. With a number
+    of cells, the cells are drawn uniformly from the selection: the number
+    taken from each unit is drawn from a multivariate hypergeometric
+    distribution over the number of cells of the units, and only the units
+    with any are read, in storage order, and subsampled. If units hold fewer
+    cells than expected, e.g. with a predicate, the cells missing are drawn
+    from the units not read yet the same way. The MBRs of sparse arrays may
+    overlap, so the cells of a unit that were already taken from an earlier
+    one are dropped.
+
+    Args:
+        array (tiledb.Array): the opened array
+        ranges (list): inclusive ranges from selection_ranges()
+        attrs (list): attributes to read
+        dims (list): dimensions to return coordinates for
+        sample: a fraction (float) of the units or a number (int) of cells
+        seed (int): seed of the random generator, random if None
+        arrow (bool): yield pyarrow Tables instead of dicts
+        cond (str): attribute predicate from parse_condition()
+
+    Yields:
+        dict: one-dimensional numpy arrays of the cells read, by field name,
+        or a pyarrow.Table with arrow
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    count, unit, sizes = sample_units(array, ranges)
+
+    sparse = array.schema.sparse
+    all_dims = [array.domain.dim(i).name for i in range(array.domain.ndim)]
+    read_dims = all_dims if sparse else dims
+    names = [name for name in read_dims if name in dims] + list(attrs)
+
+    # the units read from sparse arrays, with the coordinates of the cells
+    # taken from them
+    taken = []
+
+    # read a unit without the cells taken from an earlier one, keeping a
+    # random subset of size of them
+    def read(index, size=None):
+        subarray = unit(index)
+        batch = read_slab(array, subarray, attrs, read_dims, arrow, cond)
+
+        keep = np.ones(_batch_len(batch), dtype=bool)
+        if sparse:
+            for other, coords in taken:
+                if _overlaps(subarray, other):
+                    keep &= ~_isin(batch, coords, all_dims)
+        keep = np.flatnonzero(keep)
+
+        if size is not None and len(keep) > size:
+            keep = np.sort(rng.choice(keep, size, replace=False))
+        if sparse:
+            coords = [values[keep] for values in _coordinates(batch, all_dims)]
+            taken.append((subarray, coords))
+
+        if isinstance(batch, dict):
+            return {name: batch[name][keep] for name in names}
+        return batch.select(names).take(keep)
+
+    if isinstance(sample, float):
+        order = _random_order(count, rng)
+        for index in sorted(itertools.islice(order, math.ceil(sample * count))):
+            yield read(index)
+        return
+
+    remaining = sample
+    unread = np.ones(count, dtype=bool)
+    while remaining > 0 and unread.any():
+        weights = np.where(unread, sizes, 0)
+        if remaining >= weights.sum():
+            # every cell left is needed
+            indices = np.flatnonzero(unread)
+            counts = np.full(count, remaining)
+        else:
+            counts = rng.multivariate_hypergeometric(weights, remaining)
+            indices = np.flatnonzero(counts)
+
+        for index in indices.tolist():
+            unread[index] = False
+            batch = read(index, min(int(counts[index]), remaining))
+            remaining -= _batch_len(batch)
+            yield batch
+            if remaining == 0:
+                return
+
+
+def _cell_order(array, coords):
+    """
+    Return the permutation that sorts points in the global order of the
+    array: by tile in the tile order, then by cell in the cell order. Tiles
+    are only told apart along integer and datetime dimensions, and points
+    are sorted row-major for Hilbert cell orders.
+    """
+    import numpy as np
+
+    tiles = []
+    for i, values in enumerate(coords):
+        dim = array.domain.dim(i)
+        if dim.tile is None or np.dtype(dim.dtype).kind not in "iumM":
+            continue
+        lower = np.asarray(dim.domain[0]).astype(np.int64)
+        extent = np.asarray(dim.tile).astype(np.int64)
+        tiles.append((values.astype(np.int64) - lower) // extent)
+
+    cells = list(coords)
+    if array.schema.tile_order == "col-major":
+        tiles.reverse()
+    if array.schema.cell_order == "col-major":
+        cells.reverse()
+
+    # np.lexsort sorts by its last key first
+    return np.lexsort((tiles + cells)[::-1])
+
+
+def _point_chunks(coords, order, max_cells):
+    """
+    Split the sorted points into chunks whose queries span at most max_cells
+    cells: a query selects the cross product of the distinct coordinates of
+    its points along each dimension.
+    """
+    import numpy as np
+
+    stack = [order[i : i + max_cells] for i in range(0, len(order), max_cells)]
+    stack.reverse()
+    while stack:
+        chunk = stack.pop()
+        cells = math.prod(len(np.unique(values[chunk])) for values in coords)
+        if cells > max_cells and len(chunk) > 1:
+            half = len(chunk) // 2
+            stack.extend([chunk[half:], chunk[:half]])
+        else:
+            yield chunk
+
+
+def _read_points(array, coords, chunk, attrs, cond):
+    """
+    Read the cells at a chunk of points in a single multi-range query, and
+    return the query result with, for each point, the index of its cell in
+    the result and whether it was found.
+    """
+    import numpy as np
+
+    names = [array.domain.dim(i).name for i in range(array.domain.ndim)]
+    uniques, inverses = zip(
+        *(np.unique(values[chunk], return_inverse=True) for values in coords)
+    )
+    shape = [len(values) for values in uniques]
+
+    query = array.query(attrs=attrs, dims=names, cond=cond)
+    result = query.multi_index[tuple(list(values) for values in uniques)]
+    result = {name: values.ravel() for name, values in result.items()}
+
+    # every cell read lies in the cross product of the coordinates
+    cells = np.ravel_multi_index(
+        [np.searchsorted(u, result[name]) for u, name in zip(uniques, names)], shape
+    )
+    points = np.ravel_multi_index([i.ravel() for i in inverses], shape)
+
+    if len(cells) == 0:
+        return result, np.zeros(len(points), dtype=np.intp), np.zeros(len(points), bool)
+
+    order = np.argsort(cells, kind="stable")
+    index = np.searchsorted(cells[order], points).clip(max=len(cells) - 1)
+    return result, order[index], cells[order][index] == points
+
+
+def point_batches(
+    array, points, attrs, dims, buffer_size=None, arrow=False, parallel=1, cond=None
+):
+    """Look up the cells at the given points, in batches in the order of the
+    points.
+
+    The points are sorted in the global order of the array and read in
+    chunks of consecutive points, one multi-range query each, so that cells
+    of the same tiles are read together. A chunk is split until the cross
+    product of its coordinates fits in buffer_size. The cells read are put
+    back in the order of the points, so all of them are held in memory
+    before the first batch is yielded. Points without a cell hold the fill
+    values of the attributes, as unwritten cells of dense arrays do, and so
+    do points outside of the domain; the first cell is returned for points
+    with duplicates.
+
+    Args:
+        array (tiledb.Array): the opened array
+        points (dict): numpy arrays of coordinates by dimension name, in
+            domain order, from load_points()
+        attrs (list): attributes to read
+        dims (list): dimensions to return the coordinates of
+        buffer_size (int): buffer budget in bytes of each query and batch
+        arrow (bool): yield pyarrow Tables instead of dicts
+        parallel (int): number of chunks read concurrently
+        cond (str): attribute predicate from parse_condition(); points whose
+            cell does not match hold the fill values
+
+    Yields:
+        dict: one-dimensional numpy arrays with an element per point, by
+        field name, or a pyarrow.Table with arrow
+    """
+    import numpy as np
+
+    coords = list(points.values())
+    npoints = len(coords[0])
+    names = list(points)
+
+    max_cells = npoints
+    if buffer_size is not None:
+        max_cells = buffer_size // _cell_size(array, list(attrs) + names)
+    max_cells = max(max_cells, 1)
+
+    cells = collections.OrderedDict((name, points[name]) for name in dims)
+    for name in attrs:
+        attr = array.attr(name)
+        if attr.isvar:
+            fill = "" if np.dtype(attr.dtype).kind == "U" else b""
+            cells[name] = np.full(npoints, fill, dtype=object)
+        else:
+            fill = np.asarray(attr.fill).ravel()[0]
+            cells[name] = np.full(npoints, fill, dtype=attr.dtype)
+
+    # points outside of the domain have no cell and cannot be queried
+    inside = np.ones(npoints, dtype=bool)
+    for i, values in enumerate(coords):
+        lower, upper = array.domain.dim(i).domain
+        if np.dtype(array.domain.dim(i).dtype).kind != "S":
+            inside &= (values >= lower) & (values <= upper)
+
+    order = _cell_order(array, coords)
+    chunks = _point_chunks(coords, order[inside[order]], max_cells)
+
+    def read(chunk):
+        return chunk, _read_points(array, coords, chunk, attrs, cond)
+
+    for chunk, (result, index, found) in map_ordered(read, chunks, parallel):
+        for name in attrs:
+            cells[name][chunk[found]] = result[name][index[found]]
+
+    for start in range(0, npoints, max_cells):
+        batch = {
+            name: values[start : start + max_cells] for name, values in cells.items()
+        }
+        if arrow:
+            import pyarrow as pa
+
+            batch = pa.table(batch)
+        yield batch
+
+
+def read_selection(array, sels, attrs, dims, parallel=1, cond=None):
+    """Read a selection as `array.query(attrs=attrs, dims=dims)[sels]` would.
+
+    Selections with several ranges on a dimension are read in a single
+    multi_index query, so that TileDB can coalesce the tile reads. With
+    parallel > 1, the selection is split along the tile boundaries of the
+    first dimension into queries that run concurrently on parallel threads.
+
+    Args:
+        array (tiledb.Array): the opened array
+        sels (list): selections from parse_selection()
+        attrs (list): attributes to read, all if None
+        dims (list): dimensions to return coordinates for
+        parallel (int): number of threads
+        cond (str): attribute predicate from parse_condition()
+
+    Returns:
+        collections.OrderedDict: numpy arrays by field name
+    """
+    query = array.query(attrs=attrs, dims=dims, cond=cond, use_arrow=False)
+    multi = is_multi_range(sels)
+
+    if not multi and (parallel == 1 or not sels or not isinstance(sels[0], slice)):
+        return query[tuple(sels)]
+
+    ranges = selection_ranges(array, sels, nonempty=not multi)
+    if ranges is None:
+        return query[tuple(sels)]
+
+    if multi and parallel == 1:
+        return query.multi_index[_slices(ranges)]
+
+    # split into about one slab per thread
+    ntiles = sum(len(tile_slabs(array, *r)) for r in ranges[0])
+    tiles = -(-ntiles // parallel)
+    slabs = [slab for r in ranges[0] for slab in tile_slabs(array, *r, tiles)]
+
+    if multi:
+
+        def read(slab):
+            return query.multi_index[_slices([[slab], *ranges[1:]])]
+
+    elif len(slabs) == 1:
+        return query[tuple(sels)]
+    else:
+
+        def read(slab):
+            return query[(_slice(*slab), *sels[1:])]
+
+    return concat_batches(map_ordered(read, slabs, parallel))
+
+
+def concat_batches(batches):
+    """Concatenate batches of numpy arrays, e.g. from iter_batches().
+
+    Args:
+        batches (iterable): dicts of numpy arrays by field name
+
+    Returns:
+        collections.OrderedDict: numpy arrays by field name
+    """
+    import numpy as np
+
+    batches = list(batches)
+    if not batches:
+        return collections.OrderedDict()
+
+    return collections.OrderedDict(
+        (name, np.concatenate([batch[name] for batch in batches]))
+        for name in batches[0]
+    )
+
+
+def _strip_metadata(table):
+    """
+    Drop the pandas metadata TileDB-Py attaches to Arrow results; it only
+    describes a default index and would otherwise be repeated in every batch.
+    """
+    return table.replace_schema_metadata(None)
+
+
+def batch_config(buffer_size, nfields, memory_budget=None, limit=None):
+    """Return the configuration parameters for reading sparse arrays in
+    batches of at most buffer_size bytes spread over nfields buffers.
+
+    Args:
+        buffer_size (int): buffer budget in bytes
+        nfields (int): number of attribute and dimension buffers
+        memory_budget (int): if given, also cap TileDB's internal memory
+            budgets for fixed and variable sized tiles to half of it each
+        limit (int): if given, size the buffers for about this many cells so
+            that the first batch returns as soon as they are read
+
+    Returns:
+        dict: configuration parameters
+    """
+    buffer_bytes = max(1, buffer_size // max(1, nfields))
+    if limit is not None:
+        buffer_bytes = min(buffer_bytes, max(1, limit) * 16)
+
+    params = {"py.init_buffer_bytes": str(buffer_bytes)}
+
+    if memory_budget is not None:
+        params["sm.memory_budget"] = str(memory_budget // 2)
+        params["sm.memory_budget_var"] = str(memory_budget // 2)
+
+    return params
+
+
+# number of values of variable size measured to estimate the size of a batch
+_NBYTES_SAMPLE = 1024
+
+
+def batch_nbytes(batch):
+    """Return the number of bytes held by a batch from iter_batches(),
+    including the data of variable sized values.
+
+    The size of Arrow tables is the size of their buffers. The variable sized
+    values of numpy batches, which are Python objects without their offsets,
+    are not measured one by one: their size is extrapolated from at most
+    _NBYTES_SAMPLE of them, evenly spaced.
+
+    Args:
+        batch: a dict of numpy arrays or a pyarrow.Table
+
+    Returns:
+        int: the size of the batch in bytes
+    """
+    if not isinstance(batch, dict):
+        return batch.nbytes
+
+    nbytes = 0
+    for values in batch.values():
+        nbytes += values.nbytes
+        if values.dtype == object and len(values):
+            sample = values[:: -(-len(values) // _NBYTES_SAMPLE)]
+            nbytes += sum(map(len, sample)) * len(values) // len(sample)
+
+    return nbytes
@@ -0,0 +1,223 @@
+from .utils import normalize_uri
+
+import collections
+import hashlib
+import json
+import os
+import shutil
+
+
+def default_cache_dir():
+    """
+    Return the directory of the result cache. It may be overridden with the
+    environmental variable TILEDB_CLI_CACHE_DIR.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.environ.get(
+        "TILEDB_CLI_CACHE_DIR", os.path.join(cache_home, "tiledb-cli")
+    )
+
+
+def _save_chunk(path, batch):
+    """
+    Save a batch of numpy arrays in the uncompressed npz format, or a pyarrow
+    Table in the Arrow IPC file format, adding the extension to path. Arrays
+    of str or bytes objects are stored as offsets into their concatenated
+    values, so that loading them does not need pickle.
+    """
+    import numpy as np
+
+    if not isinstance(batch, dict):
+        import pyarrow as pa
+
+        with pa.OSFile(f"{path}.arrow", "wb") as f:
+            with pa.ipc.new_file(f, batch.schema) as writer:
+                writer.write_table(batch)
+        return
+
+    arrays = {"names": np.array(list(batch), dtype=str)}
+    kinds = []
+    for i, values in enumerate(batch.values()):
+        if values.dtype != object:
+            kinds.append("array")
+            arrays[f"values{i}"] = values
+            continue
+
+        items = values.ravel().tolist()
+        if all(isinstance(item, str) for item in items):
+            kinds.append("str")
+            items = [item.encode() for item in items]
+        elif all(isinstance(item, bytes) for item in items):
+            kinds.append("bytes")
+        else:
+            raise TypeError("only str and bytes objects can be cached")
+
+        arrays[f"data{i}"] = np.frombuffer(b"".join(items), dtype=np.uint8)
+        arrays[f"offsets{i}"] = np.cumsum([0] + [len(item) for item in items])
+        arrays[f"shape{i}"] = np.array(values.shape, dtype=np.int64)
+
+    arrays["kinds"] = np.array(kinds, dtype=str)
+    np.savez(f"{path}.npz", **arrays)
+
+
+def _load_chunk(path):
+    """
+    Load a batch saved by _save_chunk().
+    """
+    import numpy as np
+
+    if path.endswith(".arrow"):
+        import pyarrow as pa
+
+        with pa.memory_map(path) as f:
+            return pa.ipc.open_file(f).read_all()
+
+    with np.load(path, allow_pickle=False) as chunk:
+        batch = collections.OrderedDict()
+        for i, (name, kind) in enumerate(zip(chunk["names"], chunk["kinds"])):
+            if kind == "array":
+                batch[str(name)] = chunk[f"values{i}"]
+                continue
+
+            data = chunk[f"data{i}"].tobytes()
+            offsets = chunk[f"offsets{i}"].tolist()
+            items = [data[start:end] for start, end in zip(offsets, offsets[1:])]
+            if kind == "str":
+                items = [item.decode() for item in items]
+
+            values = np.empty(len(items), dtype=object)
+            values[:] = items
+            batch[str(name)] = values.reshape(tuple(chunk[f"shape{i}"]))
+
+    return batch
+
+
+class ResultCache:
+    """
+    On-disk cache of the cells read by `tiledb dump array`. Each entry is a
+    directory of npz or Arrow IPC files, one per batch, named by a hash of the read and
+    of the fragments of the array, so that it is invalidated as soon as a
+    fragment is added, consolidated or removed. The least recently used
+    entries are evicted once the cache exceeds max_size bytes.
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+
+    def key(self, array, read):
+        """Return the key of a read.
+
+        Args:
+            array (tiledb.Array): the opened array
+            read (dict): everything that determines the cells read, such as
+                the selection, fields, and query condition
+
+        Returns:
+            str: the key
+        """
+        import tiledb
+
+        fragments = tiledb.array_fragments(array.uri, ctx=array.ctx)
+        key = {
+            "uri": normalize_uri(array.uri),
+            "read": read,
+            "fragments": [
+                [uri, list(timestamps)]
+                for uri, timestamps in zip(fragments.uri, fragments.timestamp_range)
+            ],
+        }
+        text = json.dumps(key, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached batches of a read, or None on a miss.
+
+        Args:
+            key (str): the key from key()
+
+        Returns:
+            iterator: the batches, loaded one at a time
+        """
+        entry = os.path.join(self.path, key)
+        if not os.path.isdir(entry):
+            return None
+
+        os.utime(entry)
+        chunks = sorted(os.listdir(entry), key=lambda name: int(name.split(".")[0]))
+        return (_load_chunk(os.path.join(entry, name)) for name in chunks)
+
+    def store(self, key, batches):
+        """Yield the batches of a read while saving them in the cache. The
+        entry is only added once all batches have been yielded.
+
+        Args:
+            key (str): the key from key()
+            batches (iterable): dicts of numpy arrays or pyarrow Tables
+
+        Yields:
+            The batches.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, f"{key}.tmp-{os.getpid()}")
+        os.makedirs(tmp, exist_ok=True)
+
+        try:
+            saving = True
+            for i, batch in enumerate(batches):
+                if saving:
+                    try:
+                        _save_chunk(os.path.join(tmp, str(i)), batch)
+                    except TypeError:
+                        saving = False
+                yield batch
+
+            entry = os.path.join(self.path, key)
+            if saving and not os.path.isdir(entry):
+                os.replace(tmp, entry)
+                self.evict()
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in
+        max_size bytes.
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            entry = os.path.join(self.path, name)
+            if ".tmp-" in name or not os.path.isdir(entry):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry, chunk))
+                for chunk in os.listdir(entry)
+            )
+            entries.append((os.path.getmtime(entry), size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def cached(cache, key, read):
+    """Return the batches of a read, from the cache if it holds them.
+
+    Args:
+        cache (ResultCache): the cache, or None to always read
+        key (str): the key of the read
+        read (callable): returns an iterable of the batches of the read
+
+    Returns:
+        iterable: the batches
+    """
+    if cache is None:
+        return read()
+
+    batches = cache.get(key)
+    if batches is None:
+        batches = cache.store(key, read())
+    return batches
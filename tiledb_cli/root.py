@@ -1,21 +1,163 @@
+from .utils import PRESETS, parse_config_file, parse_config_options
+
 import click
+import importlib
+import shlex
+import sys
+
+
+class LazyGroup(click.Group):
+    """
+    A click group whose subcommands live in other modules and are only
+    imported when they are dispatched (or listed in the help text).
+
+    Subcommands are given as a mapping of command name to the import path of
+    the click object, e.g. {"dump": "tiledb_cli.dump.dump"}.
+    """
+
+    def __init__(self, *args, lazy_subcommands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx):
+        return sorted(super().list_commands(ctx) + list(self.lazy_subcommands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands:
+            return self._load_command(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load_command(self, cmd_name):
+        module_name, attr_name = self.lazy_subcommands[cmd_name].rsplit(".", 1)
+        module = importlib.import_module(module_name)
+        return getattr(module, attr_name)
+
+
+class RootGroup(LazyGroup):
+    """
+    The root tiledb group. It records the command line in ctx.meta for
+    reporting and lets --stats be given without a value in front of the
+    subcommand.
+    """
+
+    STATS_FORMATS = ("json", "text")
+
+    def parse_args(self, ctx, args):
+        ctx.meta["tiledb_cli.command"] = " ".join(
+            ["tiledb"] + [shlex.quote(arg) for arg in args]
+        )
+
+        args = list(args)
+        for i, arg in enumerate(args):
+            next_arg = args[i + 1] if i + 1 < len(args) else None
+            if arg == "--stats" and next_arg not in self.STATS_FORMATS:
+                args[i] = "--stats=text"
+            elif arg in self.lazy_subcommands:
+                break
+
+        return super().parse_args(ctx, args)
+
+
+@click.group(
+    cls=RootGroup,
+    lazy_subcommands={
+        # groups
+        "bench": "tiledb_cli.bench.bench",
+        "cloud": "tiledb_cli.cloud.cloud",
+        "convert-from": "tiledb_cli.convert_from.convert_from",
+        "consolidate": "tiledb_cli.consolidate_and_vacuum.consolidate",
+        "dump": "tiledb_cli.dump.dump",
+        "fragments": "tiledb_cli.fragments.fragments",
+        "vacuum": "tiledb_cli.consolidate_and_vacuum.vacuum",
+        # commands
+        "batch": "tiledb_cli.batch.batch",
+        "serve": "tiledb_cli.serve.serve",
+    },
+)
+@click.option(
+    "--config",
+    "-c",
+    metavar="<key=value>",
+    help=(
+        "Set a TileDB configuration parameter for the command, e.g. "
+        "'-c sm.compute_concurrency_level=8'. May be passed multiple times. "
+        "Takes precedence over --config-file and --preset"
+    ),
+    multiple=True,
+    default=[],
+)
+@click.option(
+    "--config-file",
+    metavar="<path>",
+    help=(
+        "Read TileDB configuration parameters from a file with one 'key value' "
+        "pair per line, as written by tiledb.Config.save(). Takes precedence "
+        "over --preset"
+    ),
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--preset",
+    "-p",
+    help=("Start from a named set of TileDB tuning parameters"),
+    type=click.Choice(sorted(PRESETS)),
+    default=None,
+)
+@click.option(
+    "--stats",
+    help=(
+        "Collect TileDB's internal statistics along with the wall-clock time "
+        "and peak memory of each phase of the command and report them to "
+        "stderr as text (the default) or json. Use --stats=json to select json"
+    ),
+    type=click.Choice(RootGroup.STATS_FORMATS),
+    default=None,
+)
+@click.option(
+    "--stats-file",
+    metavar="<path>",
+    help=("Append the --stats report to the given file instead of stderr"),
+    type=click.Path(dir_okay=False),
+    default=None,
+)
+@click.pass_context
+def root(ctx, config, config_file, preset, stats, stats_file):
+    params = dict(PRESETS[preset]) if preset else {}
+    if config_file:
+        params.update(parse_config_file(config_file))
+    params.update(parse_config_options(config))
+
+    # commands run by `tiledb serve` and `tiledb batch` share the obj of the
+    # long running process; copy it so one command's options don't leak into
+    # the next and drop the shared context if this command configures its own
+    obj = dict(ctx.obj or {})
+    if params:
+        obj["config"] = {**obj.get("config", {}), **params}
+        obj.pop("ctx", None)
+        obj.pop("array_cache", None)
+    ctx.obj = obj
+
+    if stats or stats_file:
+        from .stats import Profiler, write_report
+
+        profiler = Profiler(ctx.meta.get("tiledb_cli.command"))
+        obj["profiler"] = profiler
+        ctx.call_on_close(
+            lambda: write_report(profiler.report(), stats or "text", stats_file)
+        )
 
-from .cloud import cloud
-from .consolidate_and_vacuum import consolidate, vacuum
-from .convert_from import convert_from
-from .dump import dump
-from .fragments import fragments
 
+def main():
+    """
+    Entry point of the tiledb executable. Commands are forwarded to a running
+    `tiledb serve` daemon when possible and otherwise run in this process.
+    """
+    from .serve import forward
 
-@click.group()
-def root():
-    pass
+    exit_code = forward(sys.argv[1:])
 
+    if exit_code is None:
+        root(prog_name="tiledb")
 
-# groups
-root.add_command(cloud)
-root.add_command(convert_from)
-root.add_command(consolidate)
-root.add_command(dump)
-root.add_command(fragments)
-root.add_command(vacuum)
+    sys.exit(exit_code)
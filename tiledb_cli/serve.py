@@ -0,0 +1,297 @@
+from .utils import ArrayCache, get_ctx, get_state, invoke
+
+import click
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+
+# command groups that are forwarded to a running daemon
+FORWARDED_COMMANDS = ("consolidate", "convert-from", "dump", "vacuum")
+
+
+def unix_sockets_available():
+    """
+    Return whether the daemon can run on this platform. Windows has neither
+    Unix sockets nor user ids, so commands always run locally there.
+    """
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "getuid")
+
+
+def default_socket_path():
+    """
+    Return the path of the daemon's Unix socket. It may be overridden with the
+    environmental variable TILEDB_CLI_SOCKET.
+    """
+    return os.environ.get(
+        "TILEDB_CLI_SOCKET",
+        os.path.join(tempfile.gettempdir(), f"tiledb-cli-{os.getuid()}.sock"),
+    )
+
+
+def _write(stream, data):
+    """
+    Write bytes to a text stream, through its binary buffer if it has one.
+    """
+    buffer = getattr(stream, "buffer", None)
+    if buffer is None:
+        stream.write(data.decode(errors="replace"))
+    else:
+        stream.flush()
+        buffer.write(data)
+        buffer.flush()
+
+
+def send(message, socket_path=None, stdout=None, stderr=None):
+    """
+    Send a message to the daemon listening on socket_path and return its
+    response, or None if no daemon is listening.
+
+    The output of a forwarded command arrives while it runs, as frames of a
+    JSON header line giving the stream and the size of the bytes that
+    follow, and is written to stdout and stderr. The response is the last
+    line, holding the exit code.
+    """
+    socket_path = socket_path or default_socket_path()
+    outputs = {"stdout": stdout or sys.stdout, "stderr": stderr or sys.stderr}
+
+    if not os.path.exists(socket_path):
+        return None
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return None
+
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps(message).encode() + b"\n")
+            stream.flush()
+
+            written = False
+            while True:
+                line = stream.readline()
+                if not line:
+                    # the daemon went away; the command must not run again
+                    # locally once some of its output was written
+                    return {"exit_code": 1} if written else None
+
+                header = json.loads(line)
+                if "exit_code" in header:
+                    return header
+                _write(outputs[header["stream"]], stream.read(header["size"]))
+                written = True
+
+
+def command_name(args):
+    """
+    Return the name of the subcommand in the command line args, skipping over
+    the options of the root command and their values.
+    """
+    from .root import root
+
+    takes_value = {
+        opt for param in root.params if not param.is_flag for opt in param.opts
+    }
+
+    args = iter(args)
+    for arg in args:
+        if arg in takes_value:
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+
+    return None
+
+
+def forward(args, socket_path=None):
+    """
+    Forward the command line args to a running daemon and echo its output
+    as it is written. The command runs in the working directory and with
+    the environmental variables of this process.
+
+    Returns the exit code of the command, or None if the command was not
+    forwarded because it cannot run on the daemon or no daemon is running.
+    """
+    if os.environ.get("TILEDB_CLI_NO_DAEMON") or not unix_sockets_available():
+        return None
+
+    if command_name(args) not in FORWARDED_COMMANDS or "--help" in args:
+        return None
+
+    message = {"args": list(args), "cwd": os.getcwd(), "env": dict(os.environ)}
+    response = send(message, socket_path)
+    if response is None:
+        return None
+
+    return response["exit_code"]
+
+
+class OutputFrames(io.RawIOBase):
+    """
+    A binary stream sending what is written to it to the client of a
+    RequestHandler, as frames of a JSON header line giving the stream name
+    and the size of the bytes that follow.
+    """
+
+    def __init__(self, wfile, name):
+        self.wfile = wfile
+        self.name = name
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = bytes(b)
+        if data:
+            header = {"stream": self.name, "size": len(data)}
+            self.wfile.write(json.dumps(header).encode() + b"\n" + data)
+        return len(data)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        message = json.loads(self.rfile.readline())
+
+        if message.get("ping") or message.get("shutdown"):
+            self.server.stopped = bool(message.get("shutdown"))
+            exit_code = 0
+        elif command_name(message["args"]) not in FORWARDED_COMMANDS:
+            OutputFrames(self.wfile, "stderr").write(
+                b"Error: the command cannot run on the daemon\n"
+            )
+            exit_code = 2
+        else:
+            exit_code = self.run(message)
+
+        self.wfile.write(json.dumps({"exit_code": exit_code}).encode() + b"\n")
+
+    def run(self, message):
+        """
+        Run a forwarded command in the working directory and with the
+        environmental variables of the client, streaming its output.
+        """
+        stdout, stderr = (
+            io.TextIOWrapper(
+                io.BufferedWriter(OutputFrames(self.wfile, name)),
+                encoding="utf-8",
+                write_through=True,
+            )
+            for name in ("stdout", "stderr")
+        )
+
+        # commands are served one at a time, so the environment of the
+        # daemon can be swapped for the client's
+        cwd, environ = os.getcwd(), dict(os.environ)
+        try:
+            os.chdir(message["cwd"])
+            if "env" in message:
+                os.environ.clear()
+                os.environ.update(message["env"])
+            exit_code, _, _ = invoke(message["args"], self.server.obj, stdout, stderr)
+        finally:
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(environ)
+            stdout.flush()
+            stderr.flush()
+
+        return exit_code
+
+
+# socketserver only defines UnixStreamServer where Unix sockets are available
+class Server(getattr(socketserver, "UnixStreamServer", socketserver.BaseServer)):
+    """
+    Serve CLI commands one at a time over a Unix socket. The obj shared with
+    every command holds a single tiledb.Ctx and a cache of open arrays.
+    """
+
+    def __init__(self, socket_path, obj):
+        super().__init__(socket_path, RequestHandler)
+        self.obj = obj
+        self.stopped = False
+
+    def handle_timeout(self):
+        self.stopped = True
+
+    def server_close(self):
+        super().server_close()
+        self.obj["array_cache"].close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+@click.command()
+@click.option(
+    "--socket",
+    "-s",
+    "socket_path",
+    metavar="<path>",
+    help=(
+        "Path of the Unix socket to listen on. Defaults to the environmental "
+        "variable TILEDB_CLI_SOCKET or a per-user path in the temp directory"
+    ),
+    default=None,
+)
+@click.option(
+    "--max-open-arrays",
+    "-m",
+    metavar="<int>",
+    help=("Maximum number of arrays kept open between commands"),
+    type=int,
+    default=16,
+    show_default=True,
+)
+@click.option(
+    "--idle-timeout",
+    metavar="<seconds>",
+    help=("Exit after no command has been received for the given time"),
+    type=float,
+    default=None,
+)
+@click.option("--stop", help=("Stop the running daemon"), is_flag=True)
+def serve(socket_path, max_open_arrays, idle_timeout, stop):
+    """
+    (POSIX only). Run a daemon that keeps TileDB warm between commands.
+
+    While the daemon is running, the consolidate, convert-from, dump and vacuum
+    commands are forwarded to it and run in a single process that shares one
+    TileDB context (and its tile cache) and keeps recently used arrays open.
+    The context is configured by the root options given to `tiledb serve`.
+    Set the environmental variable TILEDB_CLI_NO_DAEMON to run commands locally.
+    """
+    if not unix_sockets_available():
+        raise click.ClickException("tiledb serve is not available on this platform")
+
+    socket_path = socket_path or default_socket_path()
+
+    if stop:
+        if send({"shutdown": True}, socket_path) is None:
+            click.echo("Error: no daemon is running", err=True)
+            sys.exit(1)
+        return
+
+    if send({"ping": True}, socket_path) is not None:
+        click.echo(f"Error: a daemon is already running on {socket_path}", err=True)
+        sys.exit(1)
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    obj = {
+        "config": get_state("config", {}),
+        "ctx": get_ctx(),
+        "array_cache": ArrayCache(max_open_arrays),
+    }
+
+    with Server(socket_path, obj) as server:
+        server.timeout = idle_timeout
+        click.echo(f"Listening on {socket_path}", err=True)
+        try:
+            while not server.stopped:
+                server.handle_request()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,168 @@
+from .utils import get_state
+
+import click
+import contextlib
+import json
+import re
+import sys
+import time
+
+# headline values summed from TileDB's statistics, by section and key pattern
+SUMMARY = {
+    "vfs_read_bytes": ("counters", r"VFS\.read_byte_num$"),
+    "vfs_read_ops": ("counters", r"VFS\.read_ops_num$"),
+    "vfs_write_bytes": ("counters", r"VFS\.write_byte_num$"),
+    "tiles_read": ("counters", r"\.num_tiles_read$"),
+    "cells_read": ("counters", r"Reader\.cell_num$"),
+    "filter_pipeline_seconds": ("timers", r"\.(unfilter|filter)_\w*tiles\.sum$"),
+}
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process in bytes, or None on
+    platforms where it cannot be measured.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class Profiler:
+    """
+    Record the wall-clock time and peak RSS of a command and its phases, along
+    with TileDB's internal statistics. The RSS of a phase is the peak of the
+    process up to its end, as the operating system only keeps the peak over
+    the lifetime of the process.
+    """
+
+    def __init__(self, command):
+        import tiledb
+
+        self.command = command
+        self.phases = []
+        self.start = time.perf_counter()
+
+        tiledb.stats_enable()
+        tiledb.stats_reset()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append(
+                {
+                    "name": name,
+                    "wall_time": time.perf_counter() - start,
+                    "process_peak_rss": peak_rss(),
+                }
+            )
+
+    def report(self):
+        """
+        Stop collecting TileDB statistics and return everything recorded as a
+        dict.
+        """
+        import tiledb
+
+        wall_time = time.perf_counter() - self.start
+
+        raw = tiledb.stats_dump(print_out=False, json=True)
+        tiledb.stats_disable()
+
+        try:
+            tiledb_stats = json.loads(raw)
+        except ValueError:
+            tiledb_stats = raw
+
+        return {
+            "command": self.command,
+            "wall_time": wall_time,
+            "peak_rss": peak_rss(),
+            "phases": self.phases,
+            "summary": summarize(tiledb_stats),
+            "tiledb": tiledb_stats,
+        }
+
+
+def summarize(tiledb_stats):
+    """
+    Sum the headline values listed in SUMMARY out of TileDB's statistics.
+    """
+    # TileDB returns a list with one entry per context
+    entries = tiledb_stats if isinstance(tiledb_stats, list) else [tiledb_stats]
+
+    summary = {}
+    for name, (section, pattern) in SUMMARY.items():
+        summary[name] = sum(
+            value
+            for entry in entries
+            if isinstance(entry, dict)
+            for key, value in entry.get(section, {}).items()
+            if re.search(pattern, key)
+        )
+
+    return summary
+
+
+def mib(nbytes):
+    """
+    Format a number of bytes, or None if unknown, in MiB.
+    """
+    return "n/a" if nbytes is None else f"{nbytes / 1024 ** 2:.1f} MiB"
+
+
+def format_text(report):
+    """
+    Format a report from Profiler.report() for humans.
+    """
+    lines = [
+        f"command: {report['command']}",
+        f"wall time: {report['wall_time']:.3f} s",
+        f"peak RSS: {mib(report['peak_rss'])}",
+        "",
+        f"{'phase':<20} {'wall time':>12} {'process peak RSS':>18}",
+    ]
+    for phase in report["phases"]:
+        lines.append(
+            f"{phase['name']:<20} {phase['wall_time']:>10.3f} s "
+            f"{mib(phase['process_peak_rss']):>18}"
+        )
+
+    lines.append("")
+    for name, value in report["summary"].items():
+        lines.append(f"{name:<24} {value}")
+
+    lines += ["", json.dumps(report["tiledb"], indent=2)]
+    return "\n".join(lines)
+
+
+def write_report(report, format, path=None):
+    """
+    Write a report from Profiler.report() to stderr or append it to path.
+    """
+    text = json.dumps(report) if format == "json" else format_text(report)
+
+    if path is None:
+        click.echo(text, err=True)
+    else:
+        with open(path, "a") as f:
+            f.write(text + "\n")
+
+
+def phase(name):
+    """
+    Time a phase of the running command when --stats is enabled.
+
+    Example:
+        with phase("read"):
+            data = query[...]
+    """
+    profiler = get_state("profiler")
+    return profiler.phase(name) if profiler else contextlib.nullcontext()
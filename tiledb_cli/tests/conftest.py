@@ -1,2 +1,40 @@
 import pytest
 from common import *
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark", "performance regression benchmarks")
+    group.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="run the tests marked benchmark, which are skipped by default",
+    )
+    group.addoption(
+        "--benchmark-update",
+        action="store_true",
+        default=False,
+        help="store the measured benchmark results as the new baseline",
+    )
+    group.addoption(
+        "--benchmark-threshold",
+        type=float,
+        default=None,
+        help="allowed ratio over the baseline before a benchmark fails",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: performance regression test, run with --benchmark"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark") or config.getoption("--benchmark-update"):
+        return
+
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
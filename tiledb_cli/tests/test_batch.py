@@ -0,0 +1,112 @@
+import tiledb
+from tiledb_cli.batch import parse_commands
+from tiledb_cli.root import root
+
+import click
+import numpy as np
+import os
+import pytest
+import shutil
+
+
+@pytest.fixture(scope="function")
+def uri(temp_rootdir):
+    """
+    Create a simple sparse test array with two fragments.
+    """
+    path = os.path.abspath(os.path.join(temp_rootdir, "test_batch_array"))
+
+    dom = tiledb.Domain(tiledb.Dim(name="x", domain=(1, 10), tile=10, dtype=np.int64))
+    att = tiledb.Attr(name="a", dtype=np.int64)
+    schema = tiledb.ArraySchema(domain=dom, attrs=(att,), sparse=True)
+    tiledb.Array.create(path, schema)
+
+    for ts in range(1, 3):
+        with tiledb.open(path, mode="w", timestamp=ts) as A:
+            A[np.arange(1, 6)] = np.arange(5)
+
+    yield path
+
+    shutil.rmtree(path)
+
+
+def test_parse_commands():
+    lines = [
+        "# a comment",
+        "tiledb dump schema 'my array'",
+        "",
+        "dump nonempty-domain my_array  # trailing comment",
+    ]
+    assert parse_commands(lines) == [
+        (2, ["dump", "schema", "my array"]),
+        (4, ["dump", "nonempty-domain", "my_array"]),
+    ]
+
+    with pytest.raises(click.UsageError):
+        parse_commands(["batch -"])
+
+
+def test_batch(runner, uri):
+    commands = "\n".join(
+        [
+            f"dump nonempty-domain {uri}",
+            f"dump fragments {uri} -n",
+            f"consolidate fragments {uri}",
+            f"vacuum fragments {uri}",
+            f"dump fragments {uri} -n",
+        ]
+    )
+
+    result = runner.invoke(root, ["batch", "-"], input=commands)
+    assert result.exit_code == 0
+    assert result.stdout.split() == ["((1,", "5),)", "2", "1"]
+
+    timings = result.stderr.splitlines()
+    assert len(timings) == 6
+    assert "5 commands, 0 failed" in timings[-1]
+
+
+@pytest.mark.parametrize("jobs", ["1", "4"])
+def test_batch_jobs(runner, uri, jobs):
+    commands = "\n".join(
+        [f"dump nonempty-domain {uri}", f"dump fragments {uri} -n"] * 10
+    )
+
+    result = runner.invoke(root, ["batch", "-", "-j", jobs], input=commands)
+    assert result.exit_code == 0
+    assert result.stdout.split() == ["((1,", "5),)", "2"] * 10
+
+
+def test_batch_failure(runner, uri):
+    commands = "\n".join([f"dump array {uri} 1:2 1:2", f"dump nonempty-domain {uri}"])
+
+    result = runner.invoke(root, ["batch", "-", "--no-timings"], input=commands)
+    assert result.exit_code == 1
+    assert "number of selections" in result.stderr
+    assert result.stdout.split() == ["((1,", "5),)"]
+
+    result = runner.invoke(root, ["batch", "-", "-x"], input=commands)
+    assert result.exit_code == 1
+    assert result.stdout == ""
+    assert "1 commands, 1 failed" in result.stderr
+
+    result = runner.invoke(root, ["batch", "-", "-j", "2", "-x"], input=commands)
+    assert result.exit_code == 1
+    assert result.stdout == ""
+    assert "1 commands, 1 failed" in result.stderr
+
+
+def test_batch_binary(runner, uri):
+    pa = pytest.importorskip("pyarrow")
+
+    commands = f"dump array {uri} : -f arrow"
+
+    result = runner.invoke(root, ["batch", "-", "--no-timings"], input=commands)
+    assert result.exit_code == 0
+    table = pa.ipc.open_stream(result.stdout_bytes).read_all()
+    assert table.column("a").to_pylist() == list(range(5))
+
+    # the output of concurrent commands is held as text
+    result = runner.invoke(root, ["batch", "-", "-j", "2"], input=commands)
+    assert result.exit_code == 1
+    assert "--output is required" in result.stderr
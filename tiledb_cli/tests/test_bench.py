@@ -0,0 +1,69 @@
+import tiledb
+from tiledb_cli.bench import create_array
+from tiledb_cli.root import root
+
+import json
+import numpy as np
+import os
+import pytest
+
+# keep the synthetic arrays tiny so that the benchmarks only check plumbing
+SMALL = ["-r", "20", "-c", "10", "--tile", "5", "-f", "2", "-n", "2"]
+
+
+@pytest.mark.parametrize("sparse", [True, False])
+def test_create_array(tmp_path, sparse):
+    uri = str(tmp_path / "array")
+    create_array(uri, sparse, 20, 10, 5, 3)
+
+    assert len(tiledb.array_fragments(uri)) == 3
+
+    with tiledb.open(uri) as A:
+        assert A.schema.sparse == sparse
+        data = A.query(attrs=["a", "b"], dims=[])[0:20, 0:10]
+        expected = np.arange(200, dtype=np.float64) * 3
+        assert np.array_equal(np.sort(data["a"].ravel()), expected)
+
+
+@pytest.mark.parametrize(
+    "command,benchmarks",
+    [
+        ("read", ["dump array"]),
+        ("ingest", ["convert-from csv"]),
+        ("consolidate", ["consolidate fragments", "vacuum fragments"]),
+    ],
+)
+def test_bench(runner, command, benchmarks):
+    result = runner.invoke(root, ["bench", command] + SMALL)
+    assert result.exit_code == 0
+
+    report = json.loads(result.stdout)
+    assert report["params"]["rows"] == 20
+    assert report["versions"]["tiledb-py"] == tiledb.version.version
+    assert [(r["benchmark"], r["kind"]) for r in report["results"]] == [
+        (b, kind) for kind in ["dense", "sparse"] for b in benchmarks
+    ]
+
+    for r in report["results"]:
+        assert len(r["times"]) == 2
+        assert r["min"] <= r["median"]
+
+
+def test_bench_all_output(runner, tmp_path):
+    output = tmp_path / "results.json"
+    workdir = tmp_path / "arrays"
+
+    result = runner.invoke(
+        root,
+        ["bench", "all", "-k", "sparse", "--dir", str(workdir), "-o", str(output)]
+        + SMALL,
+    )
+    assert result.exit_code == 0
+    assert result.stdout == ""
+
+    report = json.loads(output.read_text())
+    assert len(report["results"]) == 4
+    assert {r["kind"] for r in report["results"]} == {"sparse"}
+
+    # arrays created in a given directory are kept
+    assert os.path.exists(workdir / "read_sparse")
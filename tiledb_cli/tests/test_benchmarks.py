@@ -0,0 +1,242 @@
+"""
+Performance regression tests.
+
+These run the CLI commands on multi-million-cell and many-fragment arrays and
+fail when a command's wall time or Python heap peak exceeds the baseline of
+this machine by more than its threshold. Wall times only compare on the
+machine they were measured on, so the baseline is recorded locally in
+benchmark_baseline.json, which is not under version control, and the
+benchmarks are skipped until it is. They are skipped by default:
+
+    pytest --benchmark-update              # record the baseline
+    pytest --benchmark                     # compare against the baseline
+    pytest --benchmark --benchmark-threshold 2.0
+"""
+
+import tiledb
+from tiledb_cli.bench import create_array, write_csv
+from tiledb_cli.root import root
+
+import json
+import os
+import platform
+import pytest
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+pytestmark = pytest.mark.benchmark
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+
+# number of timed runs of each command; the fastest one is compared
+REPEAT = 3
+
+# regressions smaller than these are treated as noise whatever the threshold
+SLACK = {"wall_time": 0.05, "memory": 1024 ** 2}
+
+# the machine a baseline was recorded on
+MACHINE = " ".join(
+    [
+        platform.node(),
+        platform.machine(),
+        platform.python_version(),
+        str(os.cpu_count()),
+    ]
+)
+
+LARGE = {"rows": 2000, "cols": 2000, "tile": 500, "fragments": 1}
+MANY_FRAGMENTS = {"rows": 100, "cols": 100, "tile": 50, "fragments": 100}
+
+
+@pytest.fixture(scope="module")
+def baseline(request):
+    """
+    Load the baseline stored for this machine and, with --benchmark-update,
+    save the results measured by this module as the new baseline.
+    """
+    try:
+        with open(BASELINE_PATH) as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = None
+
+    # a baseline measured elsewhere is replaced rather than extended
+    if stored is None or stored.get("machine") != MACHINE:
+        stored = {"machine": MACHINE, "threshold": 1.5, "benchmarks": {}}
+
+    measured = {}
+    yield stored, measured
+
+    if request.config.getoption("--benchmark-update") and measured:
+        stored["benchmarks"].update(measured)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+@pytest.fixture(scope="module")
+def workdir():
+    dir = tempfile.mkdtemp()
+    yield dir
+    shutil.rmtree(dir)
+
+
+@pytest.fixture(scope="module", params=["dense", "sparse"])
+def large_uri(request, workdir):
+    uri = os.path.join(workdir, f"large_{request.param}")
+    create_array(uri, request.param == "sparse", **LARGE)
+    return uri
+
+
+@pytest.fixture(scope="module", params=["dense", "sparse"])
+def fragmented_uri(request, workdir):
+    uri = os.path.join(workdir, f"fragmented_{request.param}")
+    create_array(uri, request.param == "sparse", **MANY_FRAGMENTS)
+    return uri
+
+
+def measure(runner, args, setup=None):
+    """
+    Run a command REPEAT times and return its fastest wall time in seconds,
+    then once more with tracing for the peak of the Python heap (which
+    includes numpy buffers) in bytes; tracing slows allocations down too much
+    to time the same runs.
+
+    Args:
+        runner: The CliRunner used to invoke the command
+        args: The command line arguments
+        setup: Optional callable run untimed before each run
+
+    Returns:
+        A dict with the wall_time and memory of the command
+    """
+    wall_time = float("inf")
+    for _ in range(REPEAT):
+        if setup is not None:
+            setup()
+
+        start = time.perf_counter()
+        result = runner.invoke(root, args)
+        elapsed = time.perf_counter() - start
+
+        assert result.exit_code == 0, result.output
+        wall_time = min(wall_time, elapsed)
+
+    if setup is not None:
+        setup()
+
+    tracemalloc.start()
+    result = runner.invoke(root, args)
+    _, memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert result.exit_code == 0, result.output
+
+    return {"wall_time": wall_time, "memory": memory}
+
+
+def check(request, baseline, name, runner, args, setup=None):
+    """
+    Measure a command, record the result and compare it against the stored
+    baseline. The command is not run if there is no baseline to compare to.
+    """
+    stored, measured = baseline
+    update = request.config.getoption("--benchmark-update")
+
+    expected = stored["benchmarks"].get(name)
+    if expected is None and not update:
+        pytest.skip(
+            f"{name}: no baseline on this machine, record one with "
+            "--benchmark-update"
+        )
+
+    result = measure(runner, args, setup)
+    measured[name] = result
+    if update:
+        return
+
+    threshold = request.config.getoption("--benchmark-threshold")
+    if threshold is None:
+        threshold = stored["threshold"]
+
+    for key, unit in [("wall_time", "s"), ("memory", "bytes")]:
+        limit = max(expected[key] * threshold, expected[key] + SLACK[key])
+        assert result[key] <= limit, (
+            f"{name}: {key} regressed to {result[key]:.3f} {unit}, "
+            f"baseline {expected[key]:.3f} {unit} (threshold {threshold}x)"
+        )
+
+
+def kind(uri):
+    return os.path.basename(uri).split("_")[-1]
+
+
+class TestRead:
+    # all the cells are exported as csv to a file; pretty printing would
+    # leave out all but a few of them
+    def dump(self, workdir, uri, *selection):
+        output = os.path.join(workdir, "dump.csv")
+        return ["dump", "array", uri, *selection, "-f", "csv", "--output", output]
+
+    def test_full(self, request, runner, baseline, workdir, large_uri):
+        args = self.dump(workdir, large_uri, f"0:{LARGE['rows']}", f"0:{LARGE['cols']}")
+        check(request, baseline, f"dump array full {kind(large_uri)}", runner, args)
+
+    def test_slice(self, request, runner, baseline, workdir, large_uri):
+        args = self.dump(workdir, large_uri, "500:600", "0:2000")
+        check(request, baseline, f"dump array slice {kind(large_uri)}", runner, args)
+
+    def test_fragmented(self, request, runner, baseline, workdir, fragmented_uri):
+        args = self.dump(
+            workdir,
+            fragmented_uri,
+            f"0:{MANY_FRAGMENTS['rows']}",
+            f"0:{MANY_FRAGMENTS['cols']}",
+        )
+        name = f"dump array fragmented {kind(fragmented_uri)}"
+        check(request, baseline, name, runner, args)
+
+
+class TestFragmentInfo:
+    @pytest.mark.parametrize("command", ["fragments", "mbrs", "nonempty-domain"])
+    def test(self, request, runner, baseline, fragmented_uri, command):
+        name = f"dump {command} {kind(fragmented_uri)}"
+        check(request, baseline, name, runner, ["dump", command, fragmented_uri])
+
+
+class TestIngest:
+    @pytest.mark.parametrize("sparse", [False, True])
+    def test(self, request, runner, baseline, workdir, sparse):
+        csv_file = os.path.join(workdir, "ingest.csv")
+        if not os.path.exists(csv_file):
+            write_csv(csv_file, 1000, 1000)
+
+        uri = os.path.join(workdir, f"ingest_{sparse}")
+        args = ["convert-from", "csv", csv_file, uri, "--sparse", str(sparse)]
+        if sparse:
+            args += ["--index-dims", "row,col"]
+
+        def setup():
+            if os.path.exists(uri):
+                shutil.rmtree(uri)
+
+        name = f"convert-from csv {'sparse' if sparse else 'dense'}"
+        check(request, baseline, name, runner, args, setup)
+
+
+class TestConsolidate:
+    @pytest.mark.parametrize("sparse", [False, True])
+    @pytest.mark.parametrize("command", ["consolidate", "vacuum"])
+    def test(self, request, runner, baseline, workdir, sparse, command):
+        uri = os.path.join(workdir, f"{command}_{sparse}")
+
+        def setup():
+            if os.path.exists(uri):
+                shutil.rmtree(uri)
+            create_array(uri, sparse, **MANY_FRAGMENTS)
+            if command == "vacuum":
+                tiledb.consolidate(uri)
+
+        name = f"{command} fragments {'sparse' if sparse else 'dense'}"
+        check(request, baseline, name, runner, [command, "fragments", uri], setup)
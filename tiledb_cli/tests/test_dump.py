@@ -3,11 +3,18 @@ from common import test_array_names
 from tiledb_cli.root import root
 
 import ast
+import collections
 from click.testing import CliRunner
+import io
+import json
 import numpy as np
+import pandas as pd
 import os
 import pytest
+import re
+import shutil
 import tempfile
+import time
 
 
 class TestConfig:
@@ -362,6 +369,1982 @@ class TestArray:
         )
         assert result.exit_code == 0
 
+    @pytest.mark.parametrize(
+        "timestamp, expected",
+        [
+            ("2:3", [2, 3]),
+            ("2:", [2, 3]),
+            (":2", [1, 2]),
+            ("2", [1, 2]),
+            ("1970-01-01T00:00:03Z:1970-01-01T00:00:03Z", [3]),
+        ],
+    )
+    def test_timestamp_range(self, runner, temp_rootdir, timestamp, expected):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] -t <start>:<end>
+        """
+        uri = os.path.join(tempfile.mkdtemp(), "test_timestamp_range")
+        dom = tiledb.Domain(tiledb.Dim(name="x", domain=(0, 9), dtype=np.int64))
+        attrs = [tiledb.Attr(name="a", dtype=np.int64)]
+        tiledb.Array.create(
+            uri, tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=True)
+        )
+        # TileDB timestamps are in milliseconds
+        for t in [1, 2, 3]:
+            with tiledb.open(uri, mode="w", timestamp=t * 1000 + 500) as A:
+                A[[t]] = {"a": [10 * t]}
+
+        result = runner.invoke(
+            root, ["dump", "array", uri, ":", "-t", timestamp, "-f", "csv"]
+        )
+        assert result.exit_code == 0, result.output
+
+        df = pd.read_csv(io.StringIO(result.output))
+        assert df["x"].tolist() == expected
+        assert df["a"].tolist() == [10 * t for t in expected]
+
+    def test_timestamp_range_now(self, runner):
+        uri = os.path.join(tempfile.mkdtemp(), "test_timestamp_range_now")
+        dom = tiledb.Domain(tiledb.Dim(name="x", domain=(0, 9), dtype=np.int64))
+        attrs = [tiledb.Attr(name="a", dtype=np.int64)]
+        tiledb.Array.create(
+            uri, tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=True)
+        )
+        now = int(time.time())
+        with tiledb.open(uri, mode="w") as A:
+            A[[1]] = {"a": [10]}
+
+        args = ["dump", "array", uri, ":", "-f", "csv", "-t"]
+        result = runner.invoke(root, args + [f"{now}:"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == ["x,a", "1,10"]
+
+        # a window starting after the write is empty
+        result = runner.invoke(root, args + [f"{now + 2}:"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout == ""
+
+        result = runner.invoke(root, args + [f":{now - 2}"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout == ""
+
+    def test_timestamp_range_invalid(self, runner, temp_rootdir):
+        uri = os.path.abspath(os.path.join(temp_rootdir, "sparse_25x12_mult"))
+
+        result = runner.invoke(root, ["dump", "array", uri, ":", ":", "-t", "3:1"])
+        assert result.exit_code == 2
+        assert "starts after it ends" in result.output
+
+
+class TestArrayStream:
+    @staticmethod
+    def read_tsv(text):
+        import pandas as pd
+
+        df = pd.read_csv(io.StringIO(text), sep="\t")
+        # anonymous attributes have an empty column name
+        df.columns = text.split("\n", 1)[0].split("\t")
+        return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+    @pytest.mark.parametrize("array_name", test_array_names)
+    @pytest.mark.parametrize("buffer_size", ["64", "1KiB", "64MiB"])
+    def test(self, runner, temp_rootdir, array_name, buffer_size):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --stream --buffer-size <bytes>
+        """
+        import pandas as pd
+
+        uri = os.path.abspath(os.path.join(temp_rootdir, array_name))
+
+        with tiledb.open(uri) as array:
+            dims = [dim.name for dim in array.domain]
+            sels = ["2:20", "3:"] + [":"] * (len(dims) - 2)
+            expected = array.query(dims=dims, use_arrow=False)[2:20, 3:]
+
+        result = runner.invoke(
+            root,
+            ["dump", "array", uri, *sels, "--stream", "--buffer-size", buffer_size],
+        )
+        assert result.exit_code == 0
+
+        expected = pd.DataFrame({k: v.ravel() for k, v in expected.items()})
+        actual = self.read_tsv(result.stdout)
+        expected = expected[actual.columns]
+        expected = expected.sort_values(list(expected.columns)).reset_index(drop=True)
+        assert actual.equals(expected.astype(actual.dtypes))
+
+    @pytest.mark.parametrize("array_name", ["dense_25x12_mult", "sparse_25x12_mult"])
+    def test_rows_attributes(self, runner, temp_rootdir, array_name):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --stream -d <dim> -A <attr>
+        """
+        uri = os.path.abspath(os.path.join(temp_rootdir, array_name))
+
+        result = runner.invoke(
+            root, ["dump", "array", uri, "-d", "row", "2:4", "-A", "b", "-s"]
+        )
+        assert result.exit_code == 0
+
+        actual = self.read_tsv(result.stdout)
+        assert list(actual.columns) == ["row", "b"]
+        assert list(actual["row"]) == [2] * 12 + [3] * 12
+        assert list(actual["b"]) == sorted(np.arange(12, 36) * 2.0)
+
+    @pytest.mark.parametrize("array_name", ["dense_25x12_mult", "sparse_25x12_mult"])
+    def test_batches(self, temp_rootdir, array_name):
+        from tiledb_cli.query import batch_config, iter_batches, selection_ranges
+
+        uri = os.path.abspath(os.path.join(temp_rootdir, array_name))
+
+        # four 8 byte fields per cell and 12 cells per row
+        buffer_size = 4 * 8 * 12 * 5
+        ctx = tiledb.Ctx(batch_config(buffer_size, 4))
+
+        with tiledb.open(uri, ctx=ctx) as array:
+            ranges = selection_ranges(array, [slice(None), slice(None)])
+            batches = list(iter_batches(array, ranges, buffer_size=buffer_size))
+
+        assert len(batches) > 1
+        assert sum(len(batch["a"]) for batch in batches) == 300
+        assert max(len(batch["a"]) for batch in batches) <= 60
+
+    def test_datetime(self, runner, temp_rootdir):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] '<date>':'<date>' --stream
+        """
+        uri = os.path.abspath(
+            os.path.join(temp_rootdir, tempfile.mkdtemp(), "test_datetime_stream")
+        )
+
+        dom = tiledb.Domain(
+            tiledb.Dim(
+                name="d",
+                domain=(np.datetime64("2020-01-01"), np.datetime64("2020-12-31")),
+                tile=np.timedelta64(10, "D"),
+                dtype="datetime64[D]",
+            )
+        )
+        att = tiledb.Attr(name="a", dtype=np.int64)
+        schema = tiledb.ArraySchema(domain=dom, attrs=(att,), sparse=True)
+        tiledb.Array.create(uri, schema)
+
+        with tiledb.open(uri, mode="w") as A:
+            A[np.datetime64("2020-01-01") + np.arange(10)] = np.arange(10)
+
+        result = runner.invoke(
+            root, ["dump", "array", uri, "'2020-01-03':'2020-01-06'", "-s"]
+        )
+        assert result.exit_code == 0
+        assert result.stdout.splitlines() == [
+            "d\ta",
+            "2020-01-03\t2",
+            "2020-01-04\t3",
+            "2020-01-05\t4",
+            "2020-01-06\t5",
+        ]
+
+    @pytest.mark.parametrize(
+        "extra",
+        [
+            ["-f", "csv"],
+            ["-f", "csv", "--buffer-size", "64"],
+            ["--stream", "--memory-budget", "1KiB"],
+            ["-f", "csv", "--checkpoint"],
+        ],
+    )
+    def test_dense_datetime(self, runner, datetime_uri, tmp_path, extra):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] '<date>':'<date>' --stream
+
+        on a dense array with a datetime dimension, read in slabs of days.
+        """
+        args = ["dump", "array", datetime_uri, "'2020-01-03':'2020-01-27'"] + extra
+        if extra[-1] == "--checkpoint":
+            output = str(tmp_path / "out.csv")
+            args += [str(tmp_path / "checkpoint.json"), "-o", output]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0, result.output
+
+        if extra[-1] == "--checkpoint":
+            with open(output) as f:
+                text = f.read()
+        else:
+            text = result.stdout
+        sep = "\t" if "--stream" in extra else ","
+        rows = [line.split(sep) for line in text.splitlines()[1:]]
+        assert [int(a) for _, a in rows] == list(range(2, 27))
+        assert (rows[0][0], rows[-1][0]) == ("2020-01-03", "2020-01-27")
+
+    @pytest.mark.parametrize(
+        "dtype, selection, expected",
+        [
+            (np.float64, "1.0:3.0", [0, 1, 2]),
+            (np.float64, "1.0:1.5,3.0:", [0, 2, 3]),
+            ("ascii", "b:c", [1, 2]),
+            ("ascii", "a:a,c:d", [0, 2, 3]),
+            ("ascii", ":b", [0, 1]),
+        ],
+    )
+    def test_inclusive(self, runner, dtype, selection, expected):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] <start>:<stop> --stream
+
+        on floating point and string dimensions, whose stop is included with
+        or without --stream.
+        """
+        uri = os.path.join(tempfile.mkdtemp(), "test_inclusive_stream")
+        if dtype == "ascii":
+            dim = tiledb.Dim(name="d", domain=(None, None), tile=None, dtype=dtype)
+            coords = np.array([b"a", b"b", b"c", b"d"])
+        else:
+            dim = tiledb.Dim(name="d", domain=(0.0, 10.0), tile=2.0, dtype=dtype)
+            coords = np.array([1.0, 2.0, 3.0, 4.0])
+        attrs = [tiledb.Attr(name="a", dtype=np.int64)]
+        schema = tiledb.ArraySchema(domain=tiledb.Domain(dim), attrs=attrs, sparse=True)
+        tiledb.Array.create(uri, schema)
+        with tiledb.open(uri, mode="w") as A:
+            A[coords] = np.arange(4)
+
+        args = ["dump", "array", uri, selection, "-f", "csv", "-A", "a"]
+        for extra in [[], ["--stream"], ["--stream", "--parallel", "2"]]:
+            result = runner.invoke(root, args + extra)
+            assert result.exit_code == 0, result.output
+            assert list(pd.read_csv(io.StringIO(result.stdout))["a"]) == expected
+
+
+class TestArrayFormats:
+    @staticmethod
+    def read(format, data):
+        import pandas as pd
+
+        if format == "csv":
+            return pd.read_csv(io.BytesIO(data))
+        elif format == "ndjson":
+            return pd.read_json(io.BytesIO(data), lines=True)
+        elif format == "parquet":
+            return pd.read_parquet(io.BytesIO(data))
+        elif format == "arrow":
+            import pyarrow as pa
+
+            return pa.ipc.open_stream(data).read_pandas()
+
+    @pytest.mark.parametrize("array_name", ["dense_25x12_mult", "sparse_25x12_mult"])
+    @pytest.mark.parametrize("format", ["csv", "ndjson", "parquet", "arrow"])
+    @pytest.mark.parametrize("to_file", [False, True])
+    def test(self, runner, temp_rootdir, tmp_path, array_name, format, to_file):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --format <format> [--output <path>]
+        """
+        if format in ("parquet", "arrow"):
+            pytest.importorskip("pyarrow")
+
+        uri = os.path.abspath(os.path.join(temp_rootdir, array_name))
+        args = ["dump", "array", uri, "1:26", "1:13", "-f", format]
+        args += ["--buffer-size", "1KiB"]
+
+        output = tmp_path / f"out.{format}"
+        if to_file:
+            args += ["-o", str(output)]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0
+
+        if to_file:
+            assert result.stdout == ""
+            data = output.read_bytes()
+        else:
+            data = result.stdout_bytes
+
+        df = self.read(format, data).sort_values(["row", "col"])
+        assert list(df.columns) == ["row", "col", "a", "b"]
+        assert len(df) == 300
+
+        with tiledb.open(uri, timestamp=2) as A:
+            expected = A[1:26, 1:13]["a"]
+        assert np.array_equal(df["a"].to_numpy(), np.sort(expected.ravel()))
+
+    @pytest.mark.parametrize("sparse", [True, False])
+    def test_arrow_var_length(self, runner, temp_rootdir, sparse):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --format arrow
+
+        on an array with a variable length attribute, which is read straight
+        into Arrow record batches.
+        """
+        pa = pytest.importorskip("pyarrow")
+        from tiledb_cli.query import iter_batches, selection_ranges
+
+        uri = os.path.abspath(
+            os.path.join(temp_rootdir, tempfile.mkdtemp(), "test_arrow_var_length")
+        )
+
+        dom = tiledb.Domain(
+            tiledb.Dim(name="x", domain=(1, 100), tile=10, dtype=np.int64)
+        )
+        attrs = [
+            tiledb.Attr(name="s", dtype=str, var=True),
+            tiledb.Attr(name="v", dtype=np.float64),
+        ]
+        schema = tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=sparse)
+        tiledb.Array.create(uri, schema)
+
+        strings = np.array(["x" * (i % 7) for i in range(100)], dtype=object)
+        with tiledb.open(uri, mode="w") as A:
+            if sparse:
+                A[np.arange(1, 101)] = {"s": strings, "v": np.arange(100.0)}
+            else:
+                A[:] = {"s": strings, "v": np.arange(100.0)}
+
+        result = runner.invoke(
+            root, ["dump", "array", uri, "1:101", "-f", "arrow", "--buffer-size", "512"]
+        )
+        assert result.exit_code == 0
+
+        reader = pa.ipc.open_stream(result.stdout_bytes)
+        assert reader.schema.metadata is None
+        table = reader.read_all()
+        assert table.column_names == ["x", "s", "v"]
+        assert table.num_rows == 100
+        assert table.column("s").to_pylist() == list(strings)
+
+        with tiledb.open(uri) as A:
+            batches = list(iter_batches(A, selection_ranges(A, []), arrow=True))
+        assert all(isinstance(batch, pa.Table) for batch in batches)
+
+    @pytest.mark.parametrize("format", ["tsv", "csv", "ndjson"])
+    def test_text_nulls(self, runner, format):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --format <format>
+
+        on a sparse array with an ASCII dimension and nullable attributes,
+        whose nulls are written as empty values, or as null in JSON.
+        """
+        pa = pytest.importorskip("pyarrow")
+
+        uri = os.path.join(tempfile.mkdtemp(), "test_text_nulls")
+        dom = tiledb.Domain(
+            tiledb.Dim(name="k", domain=(None, None), tile=None, dtype="ascii")
+        )
+        attrs = [
+            tiledb.Attr(name="a", dtype=np.float64, nullable=True),
+            tiledb.Attr(name="n", dtype=np.int32, nullable=True),
+        ]
+        schema = tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=True)
+        tiledb.Array.create(uri, schema)
+        with tiledb.open(uri, mode="w") as A:
+            A[np.array([b"a", b"b", b"c"])] = {
+                "a": pa.array([1.5, None, 3.0]),
+                "n": pa.array([1, None, 3], type=pa.int32()),
+            }
+        with tiledb.open(uri, mode="w") as A:
+            A[np.array([b"c"])] = {"a": np.array([4.0]), "n": np.array([7])}
+
+        result = runner.invoke(root, ["dump", "array", uri, ":", "-f", format])
+        assert result.exit_code == 0, result.output
+
+        if format == "ndjson":
+            assert [json.loads(line) for line in result.stdout.splitlines()] == [
+                {"k": "a", "a": 1.5, "n": 1},
+                {"k": "b", "a": None, "n": None},
+                {"k": "c", "a": 4.0, "n": 7},
+            ]
+        else:
+            sep = "," if format == "csv" else "\t"
+            assert result.stdout.splitlines() == [
+                sep.join(["k", "a", "n"]),
+                sep.join(["a", "1.5", "1"]),
+                sep.join(["b", "", ""]),
+                sep.join(["c", "4.0", "7"]),
+            ]
+
+    def test_pretty_output(self, runner, temp_rootdir, tmp_path):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --output <path>
+        """
+        uri = os.path.abspath(os.path.join(temp_rootdir, "dense_25x12"))
+        output = tmp_path / "out.txt"
+
+        result = runner.invoke(root, ["dump", "array", uri, "1:3", "1:3"])
+        assert result.exit_code == 0
+
+        to_file = runner.invoke(
+            root, ["dump", "array", uri, "1:3", "1:3", "-o", str(output)]
+        )
+        assert to_file.exit_code == 0
+        assert to_file.stdout == ""
+        assert output.read_text() == result.stdout
+
+
+class TestArrayMemoryBudget:
+    @pytest.mark.parametrize("array_name", ["dense_25x12_mult", "sparse_25x12_mult"])
+    def test(self, runner, temp_rootdir, array_name):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --memory-budget <bytes>
+        """
+        uri = os.path.abspath(os.path.join(temp_rootdir, array_name))
+
+        result = runner.invoke(
+            root, ["dump", "array", uri, "1:26", "1:13", "-m", "4KiB", "-f", "csv"]
+        )
+        assert result.exit_code == 0
+        assert len(result.stdout.splitlines()) == 301
+
+        # a batch holds at most half of the budget
+        match = re.search(
+            r"peak batch memory: ([\d.]+) MiB in (\d+) batches", result.stderr
+        )
+        assert float(match.group(1)) <= 2 / 1024
+        assert int(match.group(2)) > 1
+
+    def test_pretty(self, runner, temp_rootdir):
+        uri = os.path.abspath(os.path.join(temp_rootdir, "dense_25x12"))
+
+        result = runner.invoke(
+            root, ["dump", "array", uri, "1:3", "1:3", "-m", "1MiB", "-f", "pretty"]
+        )
+        assert result.exit_code == 2
+
+    def test_config(self):
+        from tiledb_cli.query import batch_config
+
+        assert batch_config(1000, 4) == {"py.init_buffer_bytes": "250"}
+        assert batch_config(1000, 4, 2000) == {
+            "py.init_buffer_bytes": "250",
+            "sm.memory_budget": "1000",
+            "sm.memory_budget_var": "1000",
+        }
+
+    def test_adaptive(self, temp_rootdir):
+        """
+        Dense slabs are resized from the bytes actually read when the cell
+        size estimate is off, as for long variable length strings.
+        """
+        from tiledb_cli.query import batch_nbytes, iter_batches, selection_ranges
+
+        uri = os.path.abspath(
+            os.path.join(temp_rootdir, tempfile.mkdtemp(), "test_adaptive")
+        )
+
+        dom = tiledb.Domain(
+            tiledb.Dim(name="x", domain=(1, 10000), tile=1000, dtype=np.int64)
+        )
+        att = tiledb.Attr(name="s", dtype=str, var=True)
+        schema = tiledb.ArraySchema(domain=dom, attrs=(att,))
+        tiledb.Array.create(uri, schema)
+
+        with tiledb.open(uri, mode="w") as A:
+            A[:] = np.array(["x" * 100] * 10000, dtype=object)
+
+        usage = {}
+        with tiledb.open(uri) as A:
+            ranges = selection_ranges(A, [])
+            batches = list(iter_batches(A, ranges, buffer_size=64 * 1024, usage=usage))
+
+        assert sum(len(batch["s"]) for batch in batches) == 10000
+        assert usage["batches"] == len(batches)
+        assert usage["peak_bytes"] == max(map(batch_nbytes, batches))
+
+        # only the first slab, sized from the estimate, exceeds the budget
+        assert all(batch_nbytes(batch) <= 64 * 1024 for batch in batches[1:])
+        assert len(batches) > 10
+
+    def test_nbytes(self, parallel_uri, monkeypatch):
+        """
+        Variable sized values are measured from a sample of them, and batches
+        are only measured for a budget or to report their size.
+        """
+        import tiledb_cli.query
+        from tiledb_cli.query import batch_nbytes, iter_batches, selection_ranges
+
+        values = np.array(["abc"] * 100000, dtype=object)
+        assert batch_nbytes({"s": values}) == values.nbytes + 3 * len(values)
+
+        def measured(batch):
+            raise AssertionError("the batch was measured")
+
+        monkeypatch.setattr(tiledb_cli.query, "batch_nbytes", measured)
+        with tiledb.open(parallel_uri) as A:
+            batches = list(iter_batches(A, selection_ranges(A, [])))
+        assert sum(len(batch["a"]) for batch in batches) == 300
+
+
+@pytest.fixture(scope="module", params=[True, False], ids=["sparse", "dense"])
+def parallel_uri(request, temp_rootdir):
+    """
+    Create a 25x12 array with a tile extent of 4 along the rows.
+    """
+    sparse = request.param
+    uri = os.path.abspath(
+        os.path.join(temp_rootdir, f"test_parallel_{'sparse' if sparse else 'dense'}")
+    )
+
+    dom = tiledb.Domain(
+        tiledb.Dim(name="row", domain=(1, 25), tile=4, dtype=np.int64),
+        tiledb.Dim(name="col", domain=(1, 12), tile=12, dtype=np.int64),
+    )
+    attrs = [
+        tiledb.Attr(name="a", dtype=np.float64),
+        tiledb.Attr(name="s", dtype=str, var=True),
+    ]
+    schema = tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=sparse)
+    tiledb.Array.create(uri, schema)
+
+    data = {
+        "a": np.arange(300, dtype=np.float64),
+        "s": np.array([str(i) for i in range(300)], dtype=object),
+    }
+    with tiledb.open(uri, mode="w") as A:
+        if sparse:
+            rows, cols = np.indices((25, 12)).reshape(2, -1) + 1
+            A[rows, cols] = data
+        else:
+            A[:] = {k: v.reshape(25, 12) for k, v in data.items()}
+
+    return uri
+
+
+@pytest.fixture(scope="module")
+def datetime_uri(temp_rootdir):
+    """
+    Create a dense array with a datetime dimension and a tile extent of 10
+    days, holding 0 to 29 in January 2020.
+    """
+    uri = os.path.abspath(os.path.join(temp_rootdir, "test_dense_datetime"))
+
+    dom = tiledb.Domain(
+        tiledb.Dim(
+            name="d",
+            domain=(np.datetime64("2020-01-01"), np.datetime64("2020-12-31")),
+            tile=np.timedelta64(10, "D"),
+            dtype="datetime64[D]",
+        )
+    )
+    attrs = [tiledb.Attr(name="a", dtype=np.int64)]
+    schema = tiledb.ArraySchema(domain=dom, attrs=attrs)
+    tiledb.Array.create(uri, schema)
+
+    with tiledb.open(uri, mode="w") as A:
+        A[np.datetime64("2020-01-01") : np.datetime64("2020-01-30")] = np.arange(30)
+
+    return uri
+
+
+class TestArrayParallel:
+    def test_tile_slabs(self, parallel_uri):
+        from tiledb_cli.query import tile_slabs
+
+        with tiledb.open(parallel_uri) as A:
+            assert tile_slabs(A, 3, 13) == [(3, 4), (5, 8), (9, 12), (13, 13)]
+            assert tile_slabs(A, 1, 25, 3) == [(1, 12), (13, 24), (25, 25)]
+            assert tile_slabs(A, 6, 6) == [(6, 6)]
+
+    def test_map_ordered(self):
+        import time
+        from tiledb_cli.query import map_ordered
+
+        def func(i):
+            time.sleep(0.01 * (5 - i))
+            return i
+
+        assert list(map_ordered(func, range(5), 3)) == list(range(5))
+
+    def test_chain_ordered(self):
+        import time
+        from tiledb_cli.query import chain_ordered
+
+        def func(i):
+            for j in range(3):
+                time.sleep(0.01 * (5 - i))
+                yield i, j
+
+        expected = [(i, j) for i in range(5) for j in range(3)]
+        assert list(chain_ordered(func, range(5), 3)) == expected
+
+        # stopping early stops the threads
+        values = chain_ordered(func, range(5), 3)
+        assert next(values) == (0, 0)
+        values.close()
+
+    @pytest.mark.parametrize("format", ["pretty", "csv"])
+    def test_datetime(self, runner, datetime_uri, format):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] '<date>':'<date>' --parallel 2
+
+        on a dense array with a datetime dimension, whose slabs end on the
+        last day of a tile, included.
+        """
+        args = ["dump", "array", datetime_uri, "'2020-01-01':'2020-01-30'"]
+        args += ["-f", format, "--parallel", "2"]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0, result.output
+
+        if format == "csv":
+            values = list(pd.read_csv(io.StringIO(result.stdout))["a"])
+        else:
+            subarray = eval(
+                result.stdout,
+                {"OrderedDict": collections.OrderedDict, "array": np.array},
+            )
+            values = list(subarray["a"])
+        assert values == list(range(30))
+
+    def test_sparse_parts(self, runner):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --parallel <int> --memory-budget <bytes>
+
+        on a sparse array, which is read in one incomplete query per thread
+        rather than one query per tile, in batches that fit the budget.
+        """
+        uri = os.path.join(tempfile.mkdtemp(), "test_sparse_parts")
+        dom = tiledb.Domain(
+            tiledb.Dim(name="x", domain=(1, 10000), tile=10, dtype=np.int64),
+            tiledb.Dim(name="s", domain=(None, None), tile=None, dtype="ascii"),
+        )
+        attrs = [tiledb.Attr(name="a", dtype=np.int64)]
+        schema = tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=True)
+        tiledb.Array.create(uri, schema)
+        with tiledb.open(uri, mode="w") as A:
+            A[np.arange(1, 10001, 10), np.array([b"k"] * 1000)] = np.arange(1000)
+
+        args = ["dump", "array", uri, ":", ":", "-f", "csv", "-A", "a"]
+        result = runner.invoke(root, args + ["-m", "8KiB", "--parallel", "3"])
+        assert result.exit_code == 0, result.output
+        assert list(pd.read_csv(io.StringIO(result.stdout))["a"]) == list(range(1000))
+
+        match = re.search(
+            r"peak batch memory: ([\d.]+) MiB in (\d+) batches", result.stderr
+        )
+        assert float(match.group(1)) <= 4 / 1024
+        assert int(match.group(2)) > 3
+
+    @pytest.mark.parametrize("sels", [["3:20", "2:"], ["3:20", "5"], ["7", ":"]])
+    def test_read_selection(self, parallel_uri, sels):
+        from tiledb_cli.query import parse_selection, read_selection
+
+        with tiledb.open(parallel_uri) as A:
+            sels = parse_selection(A, ["row", "col"], sels)
+            expected = A.query(dims=["row", "col"], use_arrow=False)[tuple(sels)]
+            actual = read_selection(A, sels, None, ["row", "col"], 3)
+
+        assert list(actual) == list(expected)
+        for name in expected:
+            assert actual[name].shape == expected[name].shape
+            assert sorted(actual[name].ravel()) == sorted(expected[name].ravel())
+
+    @pytest.mark.parametrize("format", ["pretty", "csv", "arrow"])
+    def test(self, runner, parallel_uri, format):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --parallel <int>
+        """
+        if format == "arrow":
+            pytest.importorskip("pyarrow")
+
+        args = ["dump", "array", parallel_uri, "2:24", "1:13", "-f", format]
+        args += ["--buffer-size", "512"]
+
+        serial = runner.invoke(root, args)
+        assert serial.exit_code == 0
+
+        parallel = runner.invoke(root, args + ["--parallel", "4"])
+        assert parallel.exit_code == 0
+
+        if format == "arrow":
+            import pyarrow as pa
+
+            tables = [
+                pa.ipc.open_stream(result.stdout_bytes).read_all()
+                for result in (serial, parallel)
+            ]
+            keys = [(name, "ascending") for name in tables[0].column_names]
+            assert tables[0].sort_by(keys).equals(tables[1].sort_by(keys))
+        elif format == "csv" or parallel_uri.endswith("dense"):
+            lines = sorted(parallel.stdout.splitlines())
+            assert lines == sorted(serial.stdout.splitlines())
+        else:
+            assert len(parallel.stdout) == len(serial.stdout)
+
+
+class TestArrayMultiRange:
+    def test_parse_selection(self, parallel_uri):
+        from tiledb_cli.query import parse_selection
+
+        with tiledb.open(parallel_uri) as A:
+            sels = parse_selection(A, ["row", "col"], ["1:3,7, 10:", "5"])
+            assert sels == [[slice(1, 3), 7, slice(10, None)], 5]
+
+    def test_parse_selection_many(self, parallel_uri):
+        from tiledb_cli.query import parse_selection
+
+        with tiledb.open(parallel_uri) as A:
+            sels = parse_selection(A, ["row", "col"], [",".join(["1"] * 20000), ":"])
+            assert sels == [[1] * 20000, slice(None, None)]
+
+    @pytest.mark.parametrize("parallel", [1, 3])
+    def test_read_selection(self, parallel_uri, parallel):
+        from tiledb_cli.query import parse_selection, read_selection
+
+        with tiledb.open(parallel_uri) as A:
+            sels = parse_selection(A, ["row", "col"], ["2:4,9,20:", "1,11:"])
+            expected = A.query(dims=["row", "col"]).multi_index[
+                [slice(2, 3), 9, slice(20, 25)], [1, slice(11, 12)]
+            ]
+            actual = read_selection(A, sels, None, ["row", "col"], parallel)
+
+        assert list(actual) == list(expected)
+        for name in expected:
+            assert actual[name].shape == expected[name].shape
+            assert list(actual[name].ravel()) == list(expected[name].ravel())
+
+    @pytest.mark.parametrize("parallel", ["1", "3"])
+    def test(self, runner, parallel_uri, parallel):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] <range>,<range> <range> --stream
+        """
+        args = ["dump", "array", parallel_uri, "2:4,9,20:", "1,11:", "-A", "a"]
+        args += ["-f", "csv", "--buffer-size", "128", "--parallel", parallel]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0
+
+        rows = [line.split(",") for line in result.stdout.splitlines()[1:]]
+        expected = [
+            (row, col)
+            for row in [2, 3, 9, 20, 21, 22, 23, 24, 25]
+            for col in [1, 11, 12]
+        ]
+        assert sorted((int(r), int(c)) for r, c, _ in rows) == expected
+        assert all(float(a) == (int(r) - 1) * 12 + int(c) - 1 for r, c, a in rows)
+
+    def test_datetime(self, runner, temp_rootdir):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] '<date>':'<date>','<date>'
+        """
+        uri = os.path.abspath(
+            os.path.join(temp_rootdir, tempfile.mkdtemp(), "test_datetime_ranges")
+        )
+
+        dom = tiledb.Domain(
+            tiledb.Dim(
+                name="d",
+                domain=(np.datetime64("2020-01-01"), np.datetime64("2020-12-31")),
+                tile=np.timedelta64(10, "D"),
+                dtype="datetime64[D]",
+            )
+        )
+        att = tiledb.Attr(name="a", dtype=np.int64)
+        schema = tiledb.ArraySchema(domain=dom, attrs=(att,), sparse=True)
+        tiledb.Array.create(uri, schema)
+
+        with tiledb.open(uri, mode="w") as A:
+            A[np.datetime64("2020-01-01") + np.arange(10)] = np.arange(10)
+
+        selection = "'2020-01-02':'2020-01-04','2020-01-08'"
+
+        result = runner.invoke(root, ["dump", "array", uri, selection, "-s"])
+        assert result.exit_code == 0
+        assert result.stdout.splitlines() == [
+            "d\ta",
+            "2020-01-02\t1",
+            "2020-01-03\t2",
+            "2020-01-04\t3",
+            "2020-01-08\t7",
+        ]
+
+        result = runner.invoke(root, ["dump", "array", uri, selection])
+        assert result.exit_code == 0
+        assert "array([1, 2, 3, 7])" in result.stdout
+
+
+class TestArrayWhere:
+    @pytest.mark.parametrize("format", ["pretty", "csv", "parquet"])
+    @pytest.mark.parametrize("parallel", ["1", "3"])
+    def test(self, runner, parallel_uri, format, parallel):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --where <str>
+        """
+        if format == "parquet":
+            pytest.importorskip("pyarrow")
+
+        output = os.path.join(tempfile.mkdtemp(), "out")
+        args = ["dump", "array", parallel_uri, ":", ":", "-f", format, "-o", output]
+        args += ["-w", "a >= 100 and a < 110 or s == '250'", "--parallel", parallel]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0, result.output
+
+        if format == "pretty":
+            with open(output) as f:
+                text = f.read()
+            assert text.count("dtype=object") == 1
+            return
+        elif format == "csv":
+            df = pd.read_csv(output, dtype={"s": str})
+        else:
+            df = pd.read_parquet(output)
+
+        df = df.dropna(subset=["a"])
+        assert sorted(df["a"]) == list(range(100, 110)) + [250]
+        assert list(df["s"].astype(str)) == [str(int(a)) for a in df["a"]]
+
+    @pytest.mark.parametrize("where", ["zz > 1", "a >", "attr('zz') == 1"])
+    def test_invalid(self, runner, parallel_uri, where):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --where <invalid>
+        """
+        result = runner.invoke(
+            root, ["dump", "array", parallel_uri, ":", ":", "-w", where]
+        )
+        assert result.exit_code == 1
+        assert "invalid --where predicate" in result.output
+
+
+class TestArrayAggregate:
+    def test_aggregator(self):
+        from tiledb_cli.aggregates import Aggregator
+
+        aggregator = Aggregator(
+            [
+                ("sum", "a"),
+                ("mean", "a"),
+                ("min", "a"),
+                ("count", "a"),
+                ("count", None),
+            ],
+            group_by="g",
+        )
+        aggregator.update({"g": np.array([2, 1, 2]), "a": np.array([1.0, np.nan, 3.0])})
+        aggregator.update({"g": np.array([3, 1, 3]), "a": np.array([5.0, 4.0, 6.0])})
+        aggregator.update({"g": np.array([], dtype=int), "a": np.array([])})
+
+        result = aggregator.result()
+        assert list(result) == ["g", "sum(a)", "mean(a)", "min(a)", "count(a)", "count"]
+        assert list(result["g"]) == [1, 2, 3]
+        assert list(result["sum(a)"]) == [4.0, 4.0, 11.0]
+        assert list(result["mean(a)"]) == [4.0, 2.0, 5.5]
+        assert list(result["min(a)"]) == [4.0, 1.0, 5.0]
+        assert list(result["count(a)"]) == [1, 2, 2]
+        assert list(result["count"]) == [2, 2, 2]
+
+    @pytest.mark.parametrize("parallel", ["1", "3"])
+    def test(self, runner, parallel_uri, parallel):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --agg <func:field,...>
+        """
+        args = ["dump", "array", parallel_uri, "3:7", ":", "--parallel", parallel]
+        args += ["--agg", "sum:a,mean:a,min:a,max:col,count", "--buffer-size", "256"]
+
+        result = runner.invoke(root, args + ["-f", "csv"])
+        assert result.exit_code == 0, result.output
+
+        a = np.arange(24, 72)
+        assert result.stdout.splitlines() == [
+            "sum(a),mean(a),min(a),max(col),count",
+            f"{a.sum():.1f},{a.mean()},{a.min():.1f},12,48",
+        ]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0
+        assert "('count', array([48]))" in result.stdout
+
+    @pytest.mark.parametrize("parallel", ["1", "3"])
+    def test_group_by(self, runner, parallel_uri, parallel):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --agg <func:field,...> --group-by <dim>
+        """
+        args = ["dump", "array", parallel_uri, ":", ":", "--parallel", parallel]
+        args += ["--agg", "sum:a,count:a", "--group-by", "col", "-f", "csv"]
+        args += ["-w", "a < 100", "--buffer-size", "256"]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0, result.output
+
+        df = pd.read_csv(io.StringIO(result.stdout))
+        a = np.arange(100)
+        assert list(df["col"]) == list(range(1, 13))
+        assert list(df["sum(a)"]) == [a[a % 12 == c].sum() for c in range(12)]
+        assert list(df["count(a)"]) == [len(a[a % 12 == c]) for c in range(12)]
+
+    @pytest.mark.parametrize("sparse", [False, True])
+    def test_nulls(self, runner, sparse):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --agg <func:field,...> with nulls
+        """
+        pytest.importorskip("pyarrow")
+
+        uri = os.path.join(tempfile.mkdtemp(), "test_agg_nulls")
+        dom = tiledb.Domain(tiledb.Dim(name="x", domain=(1, 4), dtype=np.int64))
+        attrs = [tiledb.Attr(name="a", dtype=np.float64, nullable=True)]
+        tiledb.Array.create(
+            uri, tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=sparse)
+        )
+        # NaN values of nullable attributes are written as nulls
+        a = np.array([1.0, 2.0, np.nan, 4.0])
+        with tiledb.open(uri, mode="w") as A:
+            if sparse:
+                A[np.arange(1, 5)] = {"a": a}
+            else:
+                A[:] = {"a": a}
+
+        args = ["dump", "array", uri, ":", "-f", "csv"]
+        args += ["--agg", "count:a,mean:a,min:a,count"]
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == [
+            "count(a),mean(a),min(a),count",
+            f"3,{7 / 3},1.0,4",
+        ]
+
+    @pytest.mark.parametrize(
+        "where, expected",
+        [
+            ("a > 7", "2,8,17"),
+            ("3 < a <= 5 or a == 9", "3,4,18"),
+            ("a < 5 and s in ['1', '3']", "2,1,4"),
+            ("not attr('a') > 1", "2,0,1"),
+            ("s == 'x'", "0,,0"),
+        ],
+    )
+    def test_where_dense(self, runner, where, expected):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --where <predicate> --agg <func:field,...>
+        """
+        uri = os.path.join(tempfile.mkdtemp(), "test_where_dense")
+        dom = tiledb.Domain(tiledb.Dim(name="x", domain=(0, 9), tile=4, dtype=np.int64))
+        attrs = [
+            tiledb.Attr(name="a", dtype=np.int32),
+            tiledb.Attr(name="s", dtype="ascii", var=True),
+        ]
+        tiledb.Array.create(uri, tiledb.ArraySchema(domain=dom, attrs=attrs))
+        with tiledb.open(uri, mode="w") as A:
+            A[:] = {
+                "a": np.arange(10, dtype=np.int32),
+                "s": np.array([str(i) for i in range(10)], dtype=object),
+            }
+
+        # the cells that do not match hold the fill value, which is not
+        # aggregated
+        args = ["dump", "array", uri, ":", "-w", where, "-f", "csv"]
+        args += ["--agg", "count,min:a,sum:a", "--buffer-size", "32"]
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == ["count,min(a),sum(a)", expected]
+
+    @pytest.mark.parametrize(
+        "args",
+        [
+            ["--agg", "avg:a"],
+            ["--agg", "sum"],
+            ["--agg", "sum:zz"],
+            ["--agg", "sum:s"],
+            ["--agg", "count", "--group-by", "zz"],
+            ["--agg", "count", "-A", "a"],
+            ["--group-by", "row"],
+        ],
+    )
+    def test_invalid(self, runner, parallel_uri, args):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --agg <invalid>
+        """
+        result = runner.invoke(root, ["dump", "array", parallel_uri, ":", ":", *args])
+        assert result.exit_code != 0
+        assert "Error" in result.output
+
+
+class TestArrayLimit:
+    def test_head(self):
+        from tiledb_cli.query import head
+
+        def batches():
+            for i in range(0, 100, 10):
+                read.append(i)
+                yield {"a": np.arange(i, i + 10)}
+
+        read = []
+        result = list(head(batches(), 25))
+        assert [len(batch["a"]) for batch in result] == [10, 10, 5]
+        assert read == [0, 10, 20]
+
+        assert list(head(batches(), 0)) == []
+
+    @pytest.mark.parametrize("format", ["pretty", "csv", "arrow"])
+    @pytest.mark.parametrize("parallel", ["1", "3"])
+    def test(self, runner, parallel_uri, format, parallel):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --head <int>
+        """
+        if format == "arrow":
+            pytest.importorskip("pyarrow")
+
+        output = os.path.join(tempfile.mkdtemp(), "out")
+        args = ["dump", "array", parallel_uri, "2:", ":", "-f", format, "-o", output]
+        args += ["--head", "30", "--parallel", parallel, "--buffer-size", "256"]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0, result.output
+
+        if format == "pretty":
+            with open(output) as f:
+                a = ast.literal_eval(
+                    re.search(r"'a',\s*array\((\[[^]]*\])", f.read())[1]
+                )
+        elif format == "csv":
+            a = list(pd.read_csv(output)["a"])
+        else:
+            import pyarrow as pa
+
+            with open(output, "rb") as f:
+                a = pa.ipc.open_stream(f).read_all()["a"].to_pylist()
+
+        assert sorted(a) == list(range(12, 42))
+
+    def test_limit(self, runner, parallel_uri):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --limit <int> --agg <func:field,...>
+        """
+        args = ["dump", "array", parallel_uri, ":", ":", "--agg", "count"]
+        result = runner.invoke(root, args + ["--limit", "7", "-f", "csv"])
+        assert result.exit_code == 0
+        assert result.stdout.splitlines() == ["count", "7"]
+
+        result = runner.invoke(root, args + ["--limit", "1000", "-f", "csv"])
+        assert result.stdout.splitlines() == ["count", "300"]
+
+
+class TestArraySample:
+    @pytest.mark.parametrize("sample", ["50", "0.3"])
+    @pytest.mark.parametrize("format", ["csv", "parquet"])
+    def test(self, runner, parallel_uri, sample, format):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --sample <fraction | int>
+        """
+        if format == "parquet":
+            pytest.importorskip("pyarrow")
+
+        output = os.path.join(tempfile.mkdtemp(), "out")
+        args = ["dump", "array", parallel_uri, "2:", ":", "-f", format, "-o", output]
+        args += ["--sample", sample, "--seed", "7"]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0, result.output
+
+        df = pd.read_csv(output) if format == "csv" else pd.read_parquet(output)
+        assert list(df.columns) == ["row", "col", "a", "s"]
+        if sample == "50":
+            assert len(df) == 50
+        else:
+            assert 0 < len(df) < 300
+        assert not df.duplicated(["row", "col"]).any()
+        assert (df["row"] >= 2).all()
+        assert (df["a"] == (df["row"] - 1) * 12 + df["col"] - 1).all()
+
+        with open(output, "rb") as f:
+            first = f.read()
+        result = runner.invoke(root, args)
+        with open(output, "rb") as f:
+            assert f.read() == first
+
+    @pytest.mark.parametrize("seed", ["1", "2", "3"])
+    def test_spread(self, runner, parallel_uri, seed):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --sample <int>
+        """
+        output = os.path.join(tempfile.mkdtemp(), "out")
+        args = ["dump", "array", parallel_uri, "2:", ":", "-f", "csv", "-o", output]
+        result = runner.invoke(root, args + ["--sample", "12", "--seed", seed])
+        assert result.exit_code == 0, result.output
+
+        # the cells are drawn across the tiles of 4 rows rather than all taken
+        # from the first tile read
+        df = pd.read_csv(output)
+        assert len(df) == 12
+        assert not df.duplicated(["row", "col"]).any()
+        assert ((df["row"] - 1) // 4).nunique() > 1
+
+    def test_units(self, parallel_uri):
+        from tiledb_cli.query import sample_units
+
+        with tiledb.open(parallel_uri) as A:
+            count, unit, sizes = sample_units(A, [[(3, 10)], [(2, 5), (8, 8)]])
+            if A.schema.sparse:
+                assert count == 1
+                assert unit(0) == [[(3, 10)], [(2, 5), (8, 8)]]
+                # the MBR of the single data tile holds all the cells
+                assert sizes.tolist() == [300]
+            else:
+                assert count == 6
+                assert unit(0) == [[(3, 4)], [(2, 5)]]
+                assert unit(5) == [[(9, 10)], [(8, 8)]]
+                assert sizes.tolist() == [8, 2, 16, 4, 8, 2]
+
+    def test_overlapping_fragments(self, runner, temp_rootdir):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --sample <int>
+        """
+        uri = os.path.abspath(
+            os.path.join(temp_rootdir, tempfile.mkdtemp(), "test_sample_overlap")
+        )
+
+        dom = tiledb.Domain(
+            tiledb.Dim(name="x", domain=(0, 99), tile=10, dtype=np.int64)
+        )
+        att = tiledb.Attr(name="a", dtype=np.int64)
+        schema = tiledb.ArraySchema(domain=dom, attrs=(att,), sparse=True, capacity=4)
+        tiledb.Array.create(uri, schema)
+
+        for i in range(2):
+            with tiledb.open(uri, mode="w") as A:
+                A[np.arange(20)] = np.arange(20) + 100 * i
+
+        result = runner.invoke(root, ["dump", "array", uri, ":", "--sample", "1000"])
+        assert result.exit_code == 0
+        x = ast.literal_eval(re.search(r"'x',\s*array\((\[[^]]*\])", result.stdout)[1])
+        assert sorted(x) == list(range(20))
+
+        result = runner.invoke(root, ["dump", "array", uri, ":", "--sample", "6"])
+        assert result.exit_code == 0
+        assert (
+            len(
+                ast.literal_eval(
+                    re.search(r"'a',\s*array\((\[[^]]*\])", result.stdout)[1]
+                )
+            )
+            == 6
+        )
+
+
+class TestArrayCheckpoint:
+    def test_partitions(self, parallel_uri):
+        from tiledb_cli.checkpoint import partitions
+
+        with tiledb.open(parallel_uri) as A:
+            assert partitions(A, [[(3, 13)], [(1, 12)]]) == [
+                [[(3, 4)], [(1, 12)]],
+                [[(5, 8)], [(1, 12)]],
+                [[(9, 12)], [(1, 12)]],
+                [[(13, 13)], [(1, 12)]],
+            ]
+            assert partitions(A, None) == []
+
+    @pytest.mark.parametrize("format", ["tsv", "ndjson"])
+    def test(self, runner, parallel_uri, monkeypatch, format):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] -o <path> --checkpoint <path>
+        """
+        import tiledb_cli.dump
+
+        tmp = tempfile.mkdtemp()
+        output = os.path.join(tmp, "out")
+        checkpoint = os.path.join(tmp, "checkpoint.json")
+        args = ["dump", "array", parallel_uri, "2:", ":", "-f", format]
+
+        result = runner.invoke(root, args + ["-o", os.path.join(tmp, "expected")])
+        assert result.exit_code == 0
+        with open(os.path.join(tmp, "expected")) as f:
+            expected = f.read()
+
+        # fail while reading the third partition
+        iter_batches = tiledb_cli.dump.iter_batches
+        calls = []
+
+        def failing(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 3:
+                raise OSError("transient error")
+            return iter_batches(*args, **kwargs)
+
+        args += ["-o", output, "--checkpoint", checkpoint]
+        monkeypatch.setattr(tiledb_cli.dump, "iter_batches", failing)
+        result = runner.invoke(root, args)
+        assert isinstance(result.exception, OSError)
+
+        with open(checkpoint) as f:
+            assert json.load(f)["done"] == 2
+
+        # the export only resumes into the output it was writing
+        monkeypatch.setattr(tiledb_cli.dump, "iter_batches", iter_batches)
+        other = args[:-4] + ["-o", os.path.join(tmp, "other")] + args[-2:]
+        result = runner.invoke(root, other)
+        assert result.exit_code == 1
+        assert "different arguments" in result.output
+
+        os.rename(output, f"{output}.moved")
+        result = runner.invoke(root, args)
+        assert result.exit_code == 1
+        assert "missing or shorter" in result.output
+        assert not os.path.exists(output)
+        os.rename(f"{output}.moved", output)
+
+        # the rerun appends the remaining partitions after the first two
+        with open(output, "a") as f:
+            f.write("partially written partition")
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0
+        with open(output) as f:
+            assert f.read() == expected
+
+        # a completed export is not written again
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0
+        with open(output) as f:
+            assert f.read() == expected
+
+        result = runner.invoke(root, args + ["-A", "a"])
+        assert result.exit_code == 1
+        assert "different arguments" in result.output
+
+    @pytest.mark.parametrize(
+        "args",
+        [["-f", "csv"], ["-f", "parquet", "-o", "out"], ["-o", "out", "--head", "3"]],
+    )
+    def test_invalid(self, runner, parallel_uri, args):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --checkpoint <path> <invalid>
+        """
+        checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint.json")
+        result = runner.invoke(
+            root,
+            [
+                "dump",
+                "array",
+                parallel_uri,
+                ":",
+                ":",
+                "--checkpoint",
+                checkpoint,
+                *args,
+            ],
+        )
+        assert result.exit_code == 2
+
+
+class TestArrayCache:
+    def test_chunks(self):
+        from tiledb_cli.result_cache import _load_chunk, _save_chunk
+
+        batch = {
+            "d": np.array(["2020-01-01", "2020-01-02"], dtype="datetime64[D]"),
+            "a": np.arange(6, dtype=np.float32).reshape(2, 3),
+            "s": np.array([["x", "", "z\u00e9"], ["", "uv", "w"]], dtype=object),
+            "b": np.array([b"\x00\x01", b""], dtype=object),
+        }
+        path = os.path.join(tempfile.mkdtemp(), "0")
+        _save_chunk(path, batch)
+
+        loaded = _load_chunk(f"{path}.npz")
+        assert list(loaded) == list(batch)
+        for name, values in batch.items():
+            assert loaded[name].dtype == values.dtype
+            assert loaded[name].shape == values.shape
+            assert loaded[name].tolist() == values.tolist()
+
+    def test_evict(self):
+        from tiledb_cli.result_cache import ResultCache
+
+        cache = ResultCache(tempfile.mkdtemp(), 1 << 20)
+        for key in ["a", "b", "c"]:
+            batch = {"x": np.zeros(100, dtype=np.int64)}
+            assert list(cache.store(key, [batch, batch])) == [batch, batch]
+            os.utime(os.path.join(cache.path, key), (0, {"a": 1, "b": 2, "c": 3}[key]))
+
+        # b is used again, so a is the least recently used
+        assert len(list(cache.get("b"))) == 2
+        size = sum(
+            os.path.getsize(os.path.join(cache.path, "a", chunk))
+            for chunk in os.listdir(os.path.join(cache.path, "a"))
+        )
+        cache.max_size = 2 * size
+        cache.evict()
+        assert cache.get("a") is None
+        assert sorted(os.listdir(cache.path)) == ["b", "c"]
+
+    @pytest.mark.parametrize("format", ["pretty", "csv", "arrow"])
+    def test(self, runner, temp_rootdir, monkeypatch, format):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --cache
+        """
+        import tiledb_cli.dump
+
+        if format == "arrow":
+            pytest.importorskip("pyarrow")
+
+        tmp = tempfile.mkdtemp()
+        monkeypatch.setenv("TILEDB_CLI_CACHE_DIR", os.path.join(tmp, "cache"))
+
+        uri = os.path.join(tmp, "test_cache")
+        dom = tiledb.Domain(
+            tiledb.Dim(name="x", domain=(0, 99), tile=10, dtype=np.int64)
+        )
+        attrs = [
+            tiledb.Attr(name="a", dtype=np.int64),
+            tiledb.Attr(name="s", dtype=str, var=True),
+        ]
+        tiledb.Array.create(uri, tiledb.ArraySchema(domain=dom, attrs=attrs))
+        with tiledb.open(uri, mode="w") as A:
+            A[:] = {"a": np.arange(100), "s": np.array([str(i) for i in range(100)])}
+
+        args = ["dump", "array", uri, "5:50", "-f", format, "--cache"]
+        expected = runner.invoke(root, args[:-1])
+        assert expected.exit_code == 0
+
+        read_selection = tiledb_cli.dump.read_selection
+        iter_batches = tiledb_cli.dump.iter_batches
+        reads = []
+
+        def count(func):
+            def wrapper(*args, **kwargs):
+                reads.append(func)
+                return func(*args, **kwargs)
+
+            return wrapper
+
+        monkeypatch.setattr(tiledb_cli.dump, "read_selection", count(read_selection))
+        monkeypatch.setattr(tiledb_cli.dump, "iter_batches", count(iter_batches))
+
+        for i in range(2):
+            result = runner.invoke(root, args)
+            assert result.exit_code == 0
+            assert result.stdout_bytes == expected.stdout_bytes
+        assert len(reads) == 1
+
+        # a new fragment invalidates the cached read
+        with tiledb.open(uri, mode="w") as A:
+            A[10:11] = {"a": np.array([-1]), "s": np.array(["new"])}
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0
+        assert len(reads) == 2
+        assert result.stdout_bytes != expected.stdout_bytes
+        assert "new" in result.stdout_bytes.decode(errors="replace")
+
+    def test_memory_budget(self, runner, parallel_uri, monkeypatch):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --cache --memory-budget <size>
+
+        rerun, when nothing is read to measure.
+        """
+        monkeypatch.setenv("TILEDB_CLI_CACHE_DIR", tempfile.mkdtemp())
+        args = ["dump", "array", parallel_uri, ":", ":", "-f", "csv", "--cache"]
+        args += ["--memory-budget", "64MiB"]
+
+        result = runner.invoke(root, args)
+        assert result.exit_code == 0, result.output
+        assert "peak batch memory" in result.stderr
+
+        cached = runner.invoke(root, args)
+        assert cached.exit_code == 0, cached.output
+        assert "served from the cache" in cached.stderr
+        assert cached.stdout == result.stdout
+
+
+class TestArrayPoints:
+    @pytest.fixture
+    def points(self):
+        rng = np.random.default_rng(0)
+        return np.stack([rng.integers(1, 26, 40), rng.integers(1, 13, 40)], axis=1)
+
+    def test_cell_order(self, parallel_uri):
+        from tiledb_cli.query import _cell_order
+
+        rows = np.array([9, 2, 5, 1, 4, 5])
+        cols = np.array([1, 7, 3, 9, 2, 1])
+        with tiledb.open(parallel_uri) as A:
+            order = _cell_order(A, [rows, cols])
+
+        # rows 1-4 form the first tile, rows 5-8 the second
+        assert list(zip(rows[order], cols[order])) == [
+            (1, 9),
+            (2, 7),
+            (4, 2),
+            (5, 1),
+            (5, 3),
+            (9, 1),
+        ]
+
+    @pytest.mark.parametrize("parallel", [1, 3])
+    @pytest.mark.parametrize("ext", ["csv", "headerless.csv", "npy", "parquet"])
+    def test(self, runner, parallel_uri, points, ext, parallel):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --points [file]
+        """
+        path = os.path.join(tempfile.mkdtemp(), f"points.{ext}")
+        if ext == "npy":
+            np.save(path, points)
+        else:
+            # columns named after the dimensions are taken in any order
+            df = pd.DataFrame({"col": points[:, 1], "row": points[:, 0]})
+            if ext == "parquet":
+                pytest.importorskip("pyarrow")
+                df.to_parquet(path)
+            elif ext == "csv":
+                df.to_csv(path, index=False)
+            else:
+                df[["row", "col"]].to_csv(path, index=False, header=False)
+
+        result = runner.invoke(
+            root,
+            [
+                "dump",
+                "array",
+                parallel_uri,
+                "--points",
+                path,
+                "-f",
+                "csv",
+                "--buffer-size",
+                "256",
+                "--parallel",
+                str(parallel),
+            ],
+        )
+        assert result.exit_code == 0, result.output
+
+        df = pd.read_csv(io.StringIO(result.output), dtype={"s": str})
+        assert list(df.columns) == ["row", "col", "a", "s"]
+        assert (df["row"] == points[:, 0]).all()
+        assert (df["col"] == points[:, 1]).all()
+        expected = (points[:, 0] - 1) * 12 + points[:, 1] - 1
+        assert (df["a"] == expected).all()
+        assert (df["s"] == expected.astype(str)).all()
+
+    def test_missing(self, runner, parallel_uri):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --points [file] -w [predicate]
+        """
+        path = os.path.join(tempfile.mkdtemp(), "points.npy")
+        np.save(path, np.array([[10, 1], [1, 2], [30, 1], [2, 12]]))
+
+        args = ["dump", "array", parallel_uri, "--points", path, "-w", "a < 100"]
+        result = runner.invoke(root, args + ["-f", "csv"])
+        assert result.exit_code == 0, result.output
+
+        # points outside of the domain or not matching hold the fill values
+        df = pd.read_csv(io.StringIO(result.output), dtype={"s": str})
+        assert df["row"].tolist() == [10, 1, 30, 2]
+        assert df["a"].fillna(-1).tolist() == [-1, 1, -1, 23]
+        assert df["s"].fillna("").tolist() == ["", "1", "", "23"]
+
+    def test_selection(self, runner, parallel_uri):
+        path = os.path.join(tempfile.mkdtemp(), "points.npy")
+        np.save(path, np.array([[1, 1]]))
+
+        result = runner.invoke(
+            root, ["dump", "array", parallel_uri, "1:3", ":", "--points", path]
+        )
+        assert result.exit_code == 2
+        assert "--points cannot be used with a selection" in result.output
+
+
+class TestArrayExplain:
+    def test_slab_stop(self, parallel_uri):
+        from tiledb_cli.query import slab_stop
+
+        with tiledb.open(parallel_uri) as A:
+            # slabs of 5 rows are cut at the tile boundaries 5, 9, ...
+            assert slab_stop(A, 3, 25, 5) == 8
+            assert slab_stop(A, 3, 25, 5, align=True) == 5
+            assert slab_stop(A, 5, 25, 5, align=True) == 9
+            # the last slab and slabs of less than a tile are not cut
+            assert slab_stop(A, 22, 25, 6, align=True) == 26
+            assert slab_stop(A, 3, 25, 3, align=True) == 6
+
+    def test(self, runner, parallel_uri):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --explain
+        """
+        result = runner.invoke(
+            root, ["dump", "array", parallel_uri, "2:8", ":", "-A", "a", "--explain"]
+        )
+        if "sparse" in parallel_uri:
+            assert result.exit_code == 2
+            assert "only apply to dense arrays" in result.output
+            return
+
+        assert result.exit_code == 0, result.output
+        plan = dict(ast.literal_eval(result.output.strip()[len("OrderedDict(") : -1]))
+        assert plan["selection"] == ["2:8", "1:13"]
+        # rows 2-7 touch the tiles of rows 1-4 and 5-8
+        assert plan["tiles"] == 2
+        assert plan["cells"] == 72
+        assert plan["bytes"] == 72 * 8
+        assert plan["decompressed_bytes"] == 96 * 8
+        assert plan["used"] == 0.75
+        assert plan["aligned_selection"] == ["1:9", "1:13"]
+
+    def test_stream(self, runner, parallel_uri):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --explain --stream --align
+        """
+        if "sparse" in parallel_uri:
+            pytest.skip("--explain only applies to dense arrays")
+
+        plans = {}
+        for align in [[], ["--align"]]:
+            result = runner.invoke(
+                root,
+                ["dump", "array", parallel_uri, "2:24", ":", "-A", "a", "--stream"]
+                + ["--buffer-size", str(6 * 12 * 24), "--explain"]
+                + align,
+            )
+            assert result.exit_code == 0, result.output
+            plans[bool(align)] = dict(
+                ast.literal_eval(result.output.strip()[len("OrderedDict(") : -1])
+            )
+
+        # slabs of 6 rows: 2-7, 8-13, 14-19, 20-23 or 2-4, 5-8, 9-12, ...
+        assert plans[False]["slabs"] == 4
+        assert plans[False]["tile_reads"] == 9
+        assert plans[True]["slabs"] == 6
+        assert plans[True]["tile_reads"] == 6
+
+    @pytest.mark.parametrize("align", ["split", "expand"])
+    def test_align(self, runner, parallel_uri, align):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --align [split|expand]
+        """
+        args = ["dump", "array", parallel_uri, "2:8", "3:5", "-f", "csv"]
+        args += ["--buffer-size", str(2 * 3 * 40)]
+
+        result = runner.invoke(root, args + ["--align", align])
+        if "sparse" in parallel_uri:
+            assert result.exit_code == 2
+            return
+        assert result.exit_code == 0, result.output
+
+        df = pd.read_csv(io.StringIO(result.output), dtype={"s": str})
+        if align == "split":
+            expected = runner.invoke(root, args)
+            assert result.output == expected.output
+        else:
+            # expanded to the tiles of rows 1-8 and columns 1-12
+            assert df["row"].unique().tolist() == list(range(1, 9))
+            assert df["col"].unique().tolist() == list(range(1, 13))
+            assert (df["a"] == (df["row"] - 1) * 12 + df["col"] - 1).all()
+
+    def test_datetime(self, runner, datetime_uri):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] '<date>':'<date>' --align expand
+
+        on a datetime dimension, whose aligned stop is the last day of a tile,
+        included.
+        """
+        args = ["dump", "array", datetime_uri, "'2020-01-03':'2020-01-07'"]
+
+        result = runner.invoke(root, args + ["--explain"])
+        assert result.exit_code == 0, result.output
+        plan = dict(ast.literal_eval(result.output.strip()[len("OrderedDict(") : -1]))
+        assert plan["selection"] == ["'2020-01-03':'2020-01-07'"]
+        assert plan["aligned_selection"] == ["'2020-01-01':'2020-01-10'"]
+
+        result = runner.invoke(root, args + ["-f", "csv", "--align", "expand"])
+        assert result.exit_code == 0, result.output
+        df = pd.read_csv(io.StringIO(result.output))
+        assert df["a"].tolist() == list(range(10))
+
+
+class TestArrayOutNpy:
+    def test_grow(self):
+        from tiledb_cli.writers import open_writer
+
+        path = tempfile.mkdtemp()
+        # fewer cells than expected are written, then more
+        for expected, batches in [(100, 2), (3, 5)]:
+            with open_writer("npy", path, cells=expected) as writer:
+                for i in range(batches):
+                    writer.write({"x": np.arange(4 * i, 4 * i + 4)})
+
+            x = np.load(os.path.join(path, "x.npy"), mmap_mode="r")
+            assert x.tolist() == list(range(4 * batches))
+
+    @pytest.mark.parametrize("format", ["npy", "parquet"])
+    def test_failure(self, format):
+        from tiledb_cli.writers import open_writer
+
+        if format == "parquet":
+            pytest.importorskip("pyarrow")
+
+        path = os.path.join(tempfile.mkdtemp(), "out")
+        with pytest.raises(OSError):
+            with open_writer(format, path, cells=100) as writer:
+                writer.write({"x": np.arange(4)})
+                raise OSError("transient error")
+
+        # the cells written before the failure remain readable
+        if format == "npy":
+            x = np.load(os.path.join(path, "x.npy"))
+        else:
+            x = pd.read_parquet(path)["x"]
+        assert x.tolist() == list(range(4))
+
+    def test(self, runner, parallel_uri):
+        """
+        Test for command
+
+            tiledb dump array [array_uri] --out-npy [dir]
+        """
+        path = os.path.join(tempfile.mkdtemp(), "out")
+        result = runner.invoke(
+            root,
+            ["dump", "array", parallel_uri, "3:20", "2:6", "-A", "a"]
+            + ["--out-npy", path, "--buffer-size", "256"],
+        )
+        assert result.exit_code == 0, result.output
+        assert sorted(os.listdir(path)) == ["a.npy", "col.npy", "row.npy"]
+
+        row, col, a = (
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ["row", "col", "a"]
+        )
+        assert len(a) == 17 * 4
+        assert a.dtype == np.float64
+        assert sorted(zip(row.tolist(), col.tolist())) == [
+            (r, c) for r in range(3, 20) for c in range(2, 6)
+        ]
+        assert (a == (row - 1) * 12 + col - 1).all()
+
+    def test_var(self, runner, parallel_uri):
+        path = os.path.join(tempfile.mkdtemp(), "out")
+        result = runner.invoke(
+            root, ["dump", "array", parallel_uri, "3:20", ":", "--out-npy", path]
+        )
+        assert result.exit_code == 1
+        assert "cannot write the variable sized field 's'" in result.output
+
+
+class TestDiff:
+    @pytest.fixture
+    def history_uri(self, temp_rootdir, request):
+        """
+        Create an array written at the timestamps 1, 2 and 3: x = 1 thru 10
+        (without 4 if sparse), then x = 3 and 4, then x = 9.
+        """
+        sparse = request.param
+        uri = os.path.join(tempfile.mkdtemp(dir=temp_rootdir), "test_diff")
+        dom = tiledb.Domain(
+            tiledb.Dim(name="x", domain=(1, 20), tile=5, dtype=np.int64)
+        )
+        attrs = [
+            tiledb.Attr(name="a", dtype=np.float64),
+            tiledb.Attr(name="s", dtype=str, var=True),
+        ]
+        tiledb.Array.create(
+            uri, tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=sparse)
+        )
+
+        writes = [
+            (1, np.arange(1, 11), np.arange(1, 11, dtype=np.float64)),
+            (2, np.array([3, 4]), np.array([30.0, 4.0])),
+            (3, np.array([9]), np.array([90.0])),
+        ]
+        for timestamp, x, a in writes:
+            if sparse and timestamp == 1:
+                x, a = x[x != 4], a[x != 4]
+            data = {"a": a, "s": np.array([str(int(v)) for v in x], dtype=object)}
+            # TileDB timestamps are in milliseconds
+            with tiledb.open(uri, mode="w", timestamp=timestamp * 1000 + 500) as A:
+                if sparse:
+                    A[x] = data
+                else:
+                    A[x[0] : x[-1] + 1] = data
+
+        return uri
+
+    @pytest.mark.parametrize("history_uri", [True], indirect=True)
+    def test_sparse(self, runner, history_uri):
+        """
+        Test for command
+
+            tiledb dump diff [array_uri] --from [timestamp] --to [timestamp]
+        """
+        args = ["dump", "diff", history_uri, "-f", "csv"]
+
+        result = runner.invoke(root, args + ["--from", "1", "--to", "2"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == [
+            "diff,x,a,s",
+            "before,3,3.0,3",
+            "after,3,30.0,3",
+            "added,4,4.0,4",
+        ]
+
+        result = runner.invoke(root, args + ["--from", "2", "--to", "1"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == [
+            "diff,x,a,s",
+            "removed,4,4.0,4",
+            "before,3,30.0,3",
+            "after,3,3.0,3",
+        ]
+
+        # the fragments are compared in a single slab
+        result = runner.invoke(root, args + ["--from", "1"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == [
+            "diff,x,a,s",
+            "before,3,3.0,3",
+            "after,3,30.0,3",
+            "before,9,9.0,9",
+            "after,9,90.0,9",
+            "added,4,4.0,4",
+        ]
+
+    @pytest.mark.parametrize("history_uri", [False], indirect=True)
+    def test_dense(self, runner, history_uri):
+        args = ["dump", "diff", history_uri, "-f", "csv", "--buffer-size", "80"]
+
+        # x = 4 is written again with the same value
+        result = runner.invoke(root, args + ["--from", "1", "--to", "2"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == [
+            "diff,x,a,s",
+            "before,3,3.0,3",
+            "after,3,30.0,3",
+        ]
+
+    @pytest.mark.parametrize("sparse", [False, True], ids=["dense", "sparse"])
+    def test_datetime(self, runner, temp_rootdir, sparse):
+        """
+        Test for command
+
+            tiledb dump diff [array_uri] --from [timestamp]
+
+        on an array with a datetime dimension, compared in slabs of days.
+        """
+        uri = os.path.join(tempfile.mkdtemp(dir=temp_rootdir), "test_diff_datetime")
+        dom = tiledb.Domain(
+            tiledb.Dim(
+                name="d",
+                domain=(np.datetime64("2020-01-01"), np.datetime64("2020-12-31")),
+                tile=np.timedelta64(10, "D"),
+                dtype="datetime64[D]",
+            )
+        )
+        attrs = [tiledb.Attr(name="a", dtype=np.int64)]
+        tiledb.Array.create(
+            uri, tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=sparse)
+        )
+
+        days = np.datetime64("2020-01-01") + np.arange(30)
+        for timestamp, d, a in [(1, days, np.arange(30)), (2, days[14:16], [0, 0])]:
+            with tiledb.open(uri, mode="w", timestamp=timestamp * 1000 + 500) as A:
+                if sparse:
+                    A[d] = np.array(a)
+                else:
+                    A[d[0] : d[-1]] = np.array(a)
+
+        args = ["dump", "diff", uri, "--from", "1", "--buffer-size", "64"]
+        result = runner.invoke(root, args + ["--summary"])
+        assert result.exit_code == 0, result.output
+        counts = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        assert (counts["removed"], counts["added"], counts["changed"]) == (0, 0, 2)
+
+        result = runner.invoke(root, args + ["-f", "csv"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == [
+            "diff,d,a",
+            "before,2020-01-15,14",
+            "after,2020-01-15,0",
+            "before,2020-01-16,15",
+            "after,2020-01-16,0",
+        ]
+
+    @pytest.mark.parametrize("history_uri", [True, False], indirect=True)
+    @pytest.mark.parametrize("parallel", ["1", "2"])
+    def test_summary(self, runner, history_uri, parallel):
+        args = ["dump", "diff", history_uri, "--summary", "--buffer-size", "80"]
+        args += ["--parallel", parallel]
+
+        # only the slab of x = 1 thru 5 was written to between 1 and 2
+        result = runner.invoke(root, args + ["--from", "1", "--to", "2"])
+        assert result.exit_code == 0, result.output
+        counts = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        added = 1 if tiledb.ArraySchema.load(history_uri).sparse else 0
+        assert counts == collections.OrderedDict(
+            [("removed", 0), ("added", added), ("changed", 1)]
+            + [("slabs", 1), ("skipped", 1)]
+        )
+
+        result = runner.invoke(root, args + ["--from", "3"])
+        assert result.exit_code == 0, result.output
+        counts = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        assert (counts["slabs"], counts["skipped"]) == (0, 2)
+
+    def test_now(self, runner, temp_rootdir):
+        uri = os.path.join(tempfile.mkdtemp(dir=temp_rootdir), "test_diff_now")
+        dom = tiledb.Domain(tiledb.Dim(name="x", domain=(1, 10), dtype=np.int64))
+        attrs = [tiledb.Attr(name="a", dtype=np.int64)]
+        schema = tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=True)
+        tiledb.Array.create(uri, schema)
+        now = int(time.time())
+        with tiledb.open(uri, mode="w") as A:
+            A[np.array([1, 2])] = {"a": np.array([10, 20])}
+
+        args = ["dump", "diff", uri, "-f", "csv", "--from"]
+        result = runner.invoke(root, args + [str(now - 2)])
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == ["diff,x,a", "added,1,10", "added,2,20"]
+
+        # nothing was written after the write
+        result = runner.invoke(root, args + [str(now + 2)])
+        assert result.exit_code == 0, result.output
+        assert result.stdout == ""
+
+        result = runner.invoke(root, args + [str(now - 2), "--to", str(now - 1)])
+        assert result.exit_code == 0, result.output
+        assert result.stdout == ""
+
+    def test_sparse_slabs(self, runner, temp_rootdir):
+        """
+        Sparse arrays are compared in slabs covering their fragments rather
+        than one slab per tile of the first dimension.
+        """
+        uri = os.path.join(tempfile.mkdtemp(dir=temp_rootdir), "test_diff_slabs")
+        dom = tiledb.Domain(
+            tiledb.Dim(name="x", domain=(1, 100000), tile=10, dtype=np.int64),
+            tiledb.Dim(name="k", domain=(None, None), tile=None, dtype="ascii"),
+        )
+        attrs = [tiledb.Attr(name="a", dtype=np.int64)]
+        schema = tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=True)
+        tiledb.Array.create(uri, schema)
+        for timestamp, x, a in [(1, [1, 99991], [1, 2]), (2, [99991], [3])]:
+            with tiledb.open(uri, mode="w", timestamp=timestamp * 1000 + 500) as A:
+                A[np.array(x), np.array([b"k"] * len(x))] = np.array(a)
+
+        args = ["dump", "diff", uri, "--from", "1", "--to", "2"]
+        result = runner.invoke(root, args + ["--summary"])
+        assert result.exit_code == 0, result.output
+        counts = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        assert counts == collections.OrderedDict(
+            [("removed", 0), ("added", 0), ("changed", 1)]
+            + [("slabs", 1), ("skipped", 0)]
+        )
+
+        # slabs are cut to the buffer budget from the cells of the fragments
+        result = runner.invoke(root, args + ["--summary", "--buffer-size", "64"])
+        assert result.exit_code == 0, result.output
+        counts = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        assert counts["changed"] == 1
+        assert 1 < counts["slabs"] + counts["skipped"] < 10
+
+    def test_arrays(self, runner, parallel_uri, temp_rootdir):
+        """
+        Test for command
+
+            tiledb dump diff [array_uri] [other_array_uri]
+        """
+        other = os.path.join(tempfile.mkdtemp(dir=temp_rootdir), "test_diff")
+        shutil.copytree(parallel_uri, other)
+        with tiledb.open(other, mode="w") as A:
+            data = {"a": np.array([-1.0]), "s": np.array(["0"], dtype=object)}
+            if A.schema.sparse:
+                A[np.array([2]), np.array([3])] = data
+            else:
+                A[2:3, 3:4] = {k: v.reshape(1, 1) for k, v in data.items()}
+
+        result = runner.invoke(
+            root, ["dump", "diff", parallel_uri, other, "-A", "a", "-f", "csv"]
+        )
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines() == [
+            "diff,row,col,a",
+            "before,2,3,14.0",
+            "after,2,3,-1.0",
+        ]
+
+        result = runner.invoke(root, ["dump", "diff", parallel_uri, other, "-A", "s"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout.splitlines()[1:] == ["before\t2\t3\t14", "after\t2\t3\t0"]
+
+    @pytest.mark.parametrize(
+        "args, message",
+        [
+            ([], "--from is required"),
+            (["--from", "1:2"], "expected a single timestamp"),
+            (["--from", "1", "-A", "b"], "'b' is not an attribute"),
+        ],
+    )
+    def test_invalid(self, runner, parallel_uri, args, message):
+        result = runner.invoke(root, ["dump", "diff", parallel_uri] + args)
+        assert result.exit_code != 0
+        assert message in result.output
+
 
 class TestFragments:
     @pytest.mark.parametrize("array_name", ["dense_25x12_mult", "sparse_25x12_mult"])
@@ -441,6 +2424,236 @@ class TestFragments:
         assert output["unconsolidated_metadata_num"] == 2
 
 
+class TestStats:
+    def test_hyperloglog(self):
+        from tiledb_cli.column_stats import HyperLogLog
+
+        hll = HyperLogLog()
+        for i in range(10):
+            hll.update(np.arange(i * 10000, (i + 2) * 10000))
+        assert abs(hll.estimate() - 110000) / 110000 < 0.03
+
+        hll = HyperLogLog()
+        hll.update(np.array(["x", "y", "x", "z"], dtype=object))
+        assert hll.estimate() == 3
+
+    def test_histogram(self):
+        from tiledb_cli.column_stats import Histogram
+
+        values = np.random.default_rng(0).normal(size=1000)
+        histogram = Histogram(5)
+        # the later batches fall outside of the bins of the first one
+        for batch in [values[:10], values[10:500], values[500:] * 3]:
+            histogram.update(batch)
+
+        edges, counts = histogram.result()
+        assert len(counts) <= 6
+        assert sum(counts) == 1000
+        assert edges[0] <= min(values[:500].min(), 3 * values[500:].min())
+        assert edges[-1] >= max(values[:500].max(), 3 * values[500:].max())
+        assert np.allclose(np.diff(edges), edges[1] - edges[0])
+
+    @pytest.mark.parametrize("parallel", ["1", "3"])
+    def test(self, runner, parallel_uri, parallel):
+        """
+        Test for command
+
+            tiledb dump stats [array_uri] [selection]
+        """
+        result = runner.invoke(
+            root,
+            ["dump", "stats", parallel_uri, "3:7", ":", "--bins", "4"]
+            + ["--parallel", parallel, "--buffer-size", "256"],
+        )
+        assert result.exit_code == 0, result.output
+
+        stats = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        assert list(stats) == ["a", "s"]
+        assert stats["a"]["count"] == stats["s"]["count"] == 48
+        assert stats["a"]["nulls"] == 0
+        assert (stats["a"]["min"], stats["a"]["max"]) == (24.0, 71.0)
+        assert stats["a"]["distinct"] == stats["s"]["distinct"] == 48
+        assert sum(stats["a"]["histogram"]["counts"]) == 48
+        assert (stats["s"]["min"], stats["s"]["max"]) == ("24", "71")
+        assert "histogram" not in stats["s"]
+
+    def test_parallel_order(self, runner, parallel_uri):
+        """
+        The partitions are folded in order, so the histograms do not depend on
+        which thread reads first.
+        """
+        args = ["dump", "stats", parallel_uri, "--bins", "4", "--buffer-size", "256"]
+
+        serial = runner.invoke(root, args)
+        assert serial.exit_code == 0, serial.output
+        for _ in range(3):
+            result = runner.invoke(root, args + ["--parallel", "3"])
+            assert result.exit_code == 0, result.output
+            assert result.stdout == serial.stdout
+
+    def test_nulls(self, runner, temp_rootdir):
+        uri = os.path.join(temp_rootdir, "test_stats_nulls")
+        dom = tiledb.Domain(tiledb.Dim(name="x", domain=(1, 10), dtype=np.int64))
+        attrs = [
+            tiledb.Attr(name="a", dtype=np.float64, nullable=True),
+            tiledb.Attr(name="b", dtype=np.float64),
+        ]
+        schema = tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=True)
+        tiledb.Array.create(uri, schema)
+        with tiledb.open(uri, mode="w") as A:
+            A[np.arange(1, 6)] = {
+                # NaN values of nullable attributes are written as nulls
+                "a": np.array([1.0, np.nan, 3.0, 4.0, np.nan]),
+                "b": np.array([1.0, np.nan, 3.0, 4.0, np.nan]),
+            }
+
+        result = runner.invoke(root, ["dump", "stats", uri])
+        assert result.exit_code == 0, result.output
+
+        stats = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        for name in ["a", "b"]:
+            assert (stats[name]["count"], stats[name]["nulls"]) == (3, 2)
+            assert (stats[name]["min"], stats[name]["max"]) == (1.0, 4.0)
+            assert stats[name]["distinct"] == 3
+
+    @pytest.mark.parametrize("parallel", ["1", "3"])
+    def test_where_dense(self, runner, temp_rootdir, parallel):
+        """
+        Test for command
+
+            tiledb dump stats [array_uri] --where <predicate>
+        """
+        uri = os.path.join(tempfile.mkdtemp(dir=temp_rootdir), "test_stats_where")
+        dom = tiledb.Domain(tiledb.Dim(name="x", domain=(0, 9), tile=4, dtype=np.int64))
+        attrs = [
+            tiledb.Attr(name="a", dtype=np.int32),
+            tiledb.Attr(name="b", dtype=np.float64),
+        ]
+        tiledb.Array.create(uri, tiledb.ArraySchema(domain=dom, attrs=attrs))
+        with tiledb.open(uri, mode="w") as A:
+            A[:] = {"a": np.arange(10, dtype=np.int32), "b": np.arange(10.0)}
+
+        # the cells that do not match hold the fill values, INT_MIN and NaN,
+        # which are neither values nor nulls of the selection
+        result = runner.invoke(
+            root,
+            ["dump", "stats", uri, "-w", "a > 7", "--parallel", parallel]
+            + ["--buffer-size", "32"],
+        )
+        assert result.exit_code == 0, result.output
+
+        stats = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        assert (stats["a"]["count"], stats["a"]["nulls"]) == (2, 0)
+        assert (stats["a"]["min"], stats["a"]["max"]) == (8, 9)
+        assert (stats["b"]["count"], stats["b"]["nulls"]) == (2, 0)
+        assert (stats["b"]["min"], stats["b"]["max"]) == (8.0, 9.0)
+
+    def test_datetime(self, runner, temp_rootdir):
+        uri = os.path.join(temp_rootdir, "test_stats_datetime")
+        dom = tiledb.Domain(tiledb.Dim(name="x", domain=(1, 10), dtype=np.int64))
+        attrs = [tiledb.Attr(name="t", dtype="datetime64[D]")]
+        schema = tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=True)
+        tiledb.Array.create(uri, schema)
+        with tiledb.open(uri, mode="w") as A:
+            A[np.arange(1, 6)] = np.array(
+                ["2020-01-01", "NaT", "2020-01-03", "2020-01-02", "2020-01-01"],
+                dtype="datetime64[D]",
+            )
+
+        result = runner.invoke(root, ["dump", "stats", uri, "--bins", "2"])
+        assert result.exit_code == 0, result.output
+
+        stats = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        assert (stats["t"]["count"], stats["t"]["nulls"]) == (4, 1)
+        assert (stats["t"]["min"], stats["t"]["max"]) == ("2020-01-01", "2020-01-03")
+        assert stats["t"]["distinct"] == 3
+        assert stats["t"]["histogram"]["edges"] == [
+            "2020-01-01",
+            "2020-01-02",
+            "2020-01-03",
+        ]
+        assert stats["t"]["histogram"]["counts"] == [2, 2]
+
+    def test_dense_datetime(self, runner, datetime_uri):
+        result = runner.invoke(
+            root, ["dump", "stats", datetime_uri, "'2020-01-01':'2020-01-30'"]
+        )
+        assert result.exit_code == 0, result.output
+
+        stats = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+        assert stats["a"]["count"] == 30
+        assert (stats["a"]["min"], stats["a"]["max"]) == (0, 29)
+
+    def test_timestamp(self, runner, temp_rootdir):
+        uri = os.path.join(tempfile.mkdtemp(dir=temp_rootdir), "test_stats_now")
+        dom = tiledb.Domain(tiledb.Dim(name="x", domain=(1, 10), dtype=np.int64))
+        attrs = [tiledb.Attr(name="a", dtype=np.int64)]
+        schema = tiledb.ArraySchema(domain=dom, attrs=attrs, sparse=True)
+        tiledb.Array.create(uri, schema)
+        now = int(time.time())
+        with tiledb.open(uri, mode="w") as A:
+            A[np.array([1, 2])] = {"a": np.array([10, 20])}
+
+        # the write is only visible from its second on
+        for timestamp, count in [(now, 2), (now - 2, 0), (f"{now + 2}:", 0)]:
+            result = runner.invoke(root, ["dump", "stats", uri, "-t", str(timestamp)])
+            assert result.exit_code == 0, result.output
+            stats = eval(result.stdout, {"OrderedDict": collections.OrderedDict})
+            assert stats["a"]["count"] == count
+
+    def test_save(self, runner, parallel_uri, temp_rootdir):
+        """
+        Test for command
+
+            tiledb dump stats [array_uri] --save
+            tiledb dump stats [array_uri] --saved
+        """
+        # copy the array, which is shared by the tests of the module
+        uri = os.path.join(tempfile.mkdtemp(dir=temp_rootdir), "test_stats")
+        shutil.copytree(parallel_uri, uri)
+
+        result = runner.invoke(root, ["dump", "stats", uri, "--saved"])
+        assert result.exit_code == 1
+        assert "no statistics saved" in result.output
+
+        result = runner.invoke(root, ["dump", "stats", uri, "-A", "a", "--save"])
+        assert result.exit_code == 0, result.output
+        computed = result.stdout
+
+        with tiledb.open(uri) as A:
+            record = json.loads(A.meta["tiledb_cli.stats"])
+        assert record["stats"]["a"]["count"] == 300
+        assert len(record["fragments"]) == 1
+
+        result = runner.invoke(root, ["dump", "stats", uri, "--saved"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout == computed
+        assert "warning" not in result.stderr
+
+        # the statistics are stale once the array is written to
+        with tiledb.open(uri, mode="w") as A:
+            data = {"a": np.array([0.0]), "s": np.array(["0"], dtype=object)}
+            if A.schema.sparse:
+                A[np.array([1]), np.array([1])] = data
+            else:
+                A[1:2, 1:2] = {k: v.reshape(1, 1) for k, v in data.items()}
+
+        result = runner.invoke(root, ["dump", "stats", uri, "--saved"])
+        assert result.exit_code == 0, result.output
+        assert result.stdout == computed
+        assert "the fragments of the array changed" in result.stderr
+
+    def test_invalid(self, runner, parallel_uri):
+        result = runner.invoke(
+            root, ["dump", "stats", parallel_uri, "--saved", "-A", "a"]
+        )
+        assert result.exit_code == 2
+
+        result = runner.invoke(root, ["dump", "stats", parallel_uri, "-A", "b"])
+        assert result.exit_code == 2
+        assert "'b' is not an attribute" in result.output
+
+
 class TestVersions:
     def test_versions(self, runner):
         """
@@ -0,0 +1,210 @@
+import tiledb
+import tiledb_cli
+from tiledb_cli.root import root
+from tiledb_cli.utils import PRESETS
+
+import json
+import numpy as np
+import os
+import pytest
+import subprocess
+import sys
+import textwrap
+
+# modules that must not be imported just to parse arguments or print help
+HEAVY_MODULES = ["tiledb", "numpy", "pandas", "pyarrow"]
+
+
+def run_in_subprocess(args, tmp_path):
+    """
+    Invoke the CLI with args in a fresh interpreter through its entry point,
+    which first tries to forward the command to a daemon, and return the set
+    of loaded modules.
+    """
+    code = textwrap.dedent(
+        f"""
+        import json, sys
+
+        sys.argv = ["tiledb"] + {args!r}
+        from tiledb_cli.root import main
+        try:
+            main()
+        except SystemExit:
+            pass
+
+        sys.stderr.write(json.dumps({{"modules": sorted(sys.modules)}}))
+        """
+    )
+    env = dict(os.environ)
+    env.pop("TILEDB_CLI_NO_DAEMON", None)
+    # no daemon listens there, so the command runs in the subprocess
+    env["TILEDB_CLI_SOCKET"] = str(tmp_path / "tiledb.sock")
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(tiledb_cli.__file__))]
+        + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True
+    )
+    return json.loads(result.stderr)
+
+
+class TestLazyLoading:
+    @pytest.mark.parametrize(
+        "args",
+        [
+            ["--help"],
+            ["dump", "--help"],
+            ["consolidate", "--help"],
+            ["convert-from", "csv", "--help"],
+            ["fragments", "--help"],
+        ],
+    )
+    def test_help_skips_heavy_imports(self, args, tmp_path):
+        output = run_in_subprocess(args, tmp_path)
+
+        loaded = set(output["modules"])
+        assert "tiledb_cli.serve" in loaded
+        for module in HEAVY_MODULES:
+            assert module not in loaded
+
+    def test_dispatch_loads_only_requested_group(self, tmp_path):
+        output = run_in_subprocess(["dump", "--help"], tmp_path)
+
+        loaded = set(output["modules"])
+        assert "tiledb_cli.dump" in loaded
+        assert "tiledb_cli.cloud" not in loaded
+        assert "tiledb_cli.convert_from" not in loaded
+        assert "tiledb_cli.consolidate_and_vacuum" not in loaded
+
+    def test_list_commands(self, runner):
+        result = runner.invoke(root, ["--help"])
+        assert result.exit_code == 0
+
+        for name in [
+            "cloud",
+            "consolidate",
+            "convert-from",
+            "dump",
+            "fragments",
+            "vacuum",
+        ]:
+            assert name in result.stdout
+
+
+class TestConfig:
+    def config_value(self, output, key):
+        """
+        Find the value of key in the table printed by `tiledb dump config`.
+        """
+        for line in output.splitlines():
+            param, _, value = line.partition("|")
+            if param.strip() == key:
+                return value.strip().strip("'")
+
+    def test_config(self, runner):
+        result = runner.invoke(
+            root,
+            ["-c", "sm.io_concurrency_level=3", "--config", "sm.memory_budget=1234"]
+            + ["dump", "config"],
+        )
+        assert result.exit_code == 0
+        assert self.config_value(result.stdout, "sm.io_concurrency_level") == "3"
+        assert self.config_value(result.stdout, "sm.memory_budget") == "1234"
+
+    def test_bad_config(self, runner):
+        result = runner.invoke(root, ["-c", "sm.memory_budget", "dump", "config"])
+        assert result.exit_code == 2
+        assert "KEY=VALUE" in result.stderr
+
+    def test_preset(self, runner):
+        result = runner.invoke(root, ["--preset", "low-memory", "dump", "config"])
+        assert result.exit_code == 0
+        assert self.config_value(result.stdout, "sm.memory_budget") == str(
+            PRESETS["low-memory"]["sm.memory_budget"]
+        )
+
+    def test_precedence(self, runner, tmp_path):
+        config_file = tmp_path / "tiledb.cfg"
+        config_file.write_text(
+            "# comment\nsm.memory_budget 1000\nsm.memory_budget_var 2000\n"
+        )
+
+        result = runner.invoke(
+            root,
+            ["-p", "low-memory", "--config-file", str(config_file)]
+            + ["-c", "sm.memory_budget_var=3000", "dump", "config"],
+        )
+        assert result.exit_code == 0
+        assert self.config_value(result.stdout, "sm.memory_budget") == "1000"
+        assert self.config_value(result.stdout, "sm.memory_budget_var") == "3000"
+        assert self.config_value(result.stdout, "sm.tile_cache_size") == "0"
+
+    def test_consolidate(self, runner, temp_rootdir):
+        uri = os.path.join(temp_rootdir, "test_root_consolidate")
+
+        dom = tiledb.Domain(tiledb.Dim(domain=(1, 10), tile=10, dtype=np.int64))
+        schema = tiledb.ArraySchema(domain=dom, attrs=[tiledb.Attr(dtype=np.int64)])
+        tiledb.Array.create(uri, schema)
+        for ts in range(1, 3):
+            with tiledb.open(uri, mode="w", timestamp=ts) as A:
+                A[:] = np.arange(10)
+
+        result = runner.invoke(
+            root,
+            ["-p", "low-memory", "-c", "sm.io_concurrency_level=1"]
+            + ["consolidate", "fragments", "-v", uri],
+        )
+        assert result.exit_code == 0
+        assert len(tiledb.array_fragments(uri)) == 1
+
+
+@pytest.fixture(scope="module")
+def stats_uri(temp_rootdir):
+    """
+    Create a simple dense test array.
+    """
+    uri = os.path.join(temp_rootdir, "test_root_stats")
+
+    dom = tiledb.Domain(tiledb.Dim(domain=(1, 100), tile=10, dtype=np.int64))
+    schema = tiledb.ArraySchema(domain=dom, attrs=[tiledb.Attr(dtype=np.int64)])
+    tiledb.Array.create(uri, schema)
+    with tiledb.open(uri, mode="w") as A:
+        A[:] = np.arange(100)
+
+    return uri
+
+
+class TestStats:
+    def test_text(self, runner, stats_uri):
+        result = runner.invoke(root, ["--stats", "dump", "array", stats_uri, "1:100"])
+        assert result.exit_code == 0
+        assert "wall time" in result.stderr
+        assert "vfs_read_bytes" in result.stderr
+
+    def test_json(self, runner, stats_uri):
+        result = runner.invoke(
+            root, ["--stats=json", "dump", "array", stats_uri, "1:100"]
+        )
+        assert result.exit_code == 0
+
+        report = json.loads(result.stderr)
+        assert report["command"].startswith("tiledb --stats=json dump array")
+        assert [phase["name"] for phase in report["phases"]] == ["read", "output"]
+        assert report["summary"]["vfs_read_bytes"] > 0
+        assert report["wall_time"] >= sum(p["wall_time"] for p in report["phases"])
+
+    def test_file(self, runner, stats_uri, tmp_path):
+        stats_file = tmp_path / "stats.json"
+
+        for _ in range(2):
+            result = runner.invoke(
+                root,
+                ["--stats", "json", "--stats-file", str(stats_file)]
+                + ["dump", "nonempty-domain", stats_uri],
+            )
+            assert result.exit_code == 0
+            assert result.stderr == ""
+
+        reports = [json.loads(line) for line in stats_file.read_text().splitlines()]
+        assert len(reports) == 2
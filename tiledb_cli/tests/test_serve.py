@@ -0,0 +1,162 @@
+import tiledb
+from tiledb_cli.root import main
+from tiledb_cli.serve import Server, command_name, forward, send
+from tiledb_cli.utils import ArrayCache
+
+import numpy as np
+import os
+import pytest
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="Unix sockets are not available on windows"
+)
+
+
+@pytest.fixture(scope="function")
+def uri(temp_rootdir):
+    """
+    Create a simple sparse test array.
+    """
+    path = os.path.abspath(os.path.join(temp_rootdir, "test_serve_array"))
+
+    dom = tiledb.Domain(tiledb.Dim(name="x", domain=(1, 10), tile=10, dtype=np.int64))
+    att = tiledb.Attr(name="a", dtype=np.int64)
+    schema = tiledb.ArraySchema(domain=dom, attrs=(att,), sparse=True)
+    tiledb.Array.create(path, schema)
+
+    with tiledb.open(path, mode="w") as A:
+        A[np.arange(1, 6)] = np.arange(5)
+
+    yield path
+
+    shutil.rmtree(path)
+
+
+@pytest.fixture(scope="function")
+def socket_path():
+    """
+    Run a daemon on a temporary socket in a background thread.
+    """
+    dir = tempfile.mkdtemp()
+    path = os.path.join(dir, "cli.sock")
+
+    obj = {"ctx": tiledb.Ctx(), "array_cache": ArrayCache(2)}
+    server = Server(path, obj)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    yield path
+
+    server.shutdown()
+    thread.join()
+    server.server_close()
+    shutil.rmtree(dir)
+
+
+def test_not_running(tmp_path):
+    assert send({"ping": True}, str(tmp_path / "missing.sock")) is None
+    assert forward(["dump", "schema", "uri"], str(tmp_path / "missing.sock")) is None
+
+
+def test_command_name():
+    assert command_name(["dump", "schema", "uri"]) == "dump"
+    assert command_name(["-c", "a=b", "--preset", "cloud", "dump", "uri"]) == "dump"
+    assert command_name(["--config=a=b", "vacuum", "fragments", "uri"]) == "vacuum"
+    assert command_name(["--help"]) is None
+
+
+def test_not_forwarded(socket_path):
+    assert forward(["serve"], socket_path) is None
+    assert forward(["fragments", "delete", "uri", "1", "2"], socket_path) is None
+    assert forward(["dump", "--help"], socket_path) is None
+
+
+def test_forward(socket_path, uri, capsys):
+    assert send({"ping": True}, socket_path)["exit_code"] == 0
+
+    assert forward(["dump", "nonempty-domain", uri], socket_path) == 0
+    assert capsys.readouterr().out.split() == ["((1,", "5),)"]
+
+    # arrays stay open and pick up fragments written between commands
+    with tiledb.open(uri, mode="w") as A:
+        A[np.arange(6, 11)] = np.arange(5)
+
+    assert forward(["dump", "nonempty-domain", uri], socket_path) == 0
+    assert capsys.readouterr().out.split() == ["((1,", "10),)"]
+
+
+def test_forward_relative_uri(socket_path, uri, capsys, monkeypatch):
+    monkeypatch.chdir(os.path.dirname(uri))
+
+    assert forward(["dump", "nonempty-domain", os.path.basename(uri)], socket_path) == 0
+    assert capsys.readouterr().out.split() == ["((1,", "5),)"]
+
+
+def test_forward_error(socket_path, uri, capsys):
+    assert forward(["dump", "array", uri, "1:2", "1:2"], socket_path) == 1
+    assert "number of selections" in capsys.readouterr().err
+
+
+def test_forward_binary(socket_path, uri, capsysbinary):
+    pa = pytest.importorskip("pyarrow")
+
+    args = ["dump", "array", uri, ":", "-f", "arrow", "--stream"]
+    assert forward(args, socket_path) == 0
+
+    table = pa.ipc.open_stream(capsysbinary.readouterr().out).read_all()
+    assert table["a"].to_pylist() == list(range(5))
+
+
+def test_forward_env(socket_path, uri, tmp_path):
+    # the command runs with the environmental variables of the client
+    env = dict(os.environ, TILEDB_CLI_CACHE_DIR=str(tmp_path / "cache"))
+    message = {"args": ["dump", "array", uri, ":", "--cache"], "cwd": os.getcwd()}
+    response = send(dict(message, env=env), socket_path)
+    assert response["exit_code"] == 0
+
+    assert os.listdir(tmp_path / "cache")
+    assert "TILEDB_CLI_CACHE_DIR" not in os.environ
+
+
+def test_not_allowed(socket_path, uri, capsys):
+    # the daemon only runs the forwarded commands, whoever sends them
+    message = {"args": ["fragments", "delete", uri, "1", "2"], "cwd": os.getcwd()}
+    assert send(message, socket_path)["exit_code"] == 2
+    assert "cannot run on the daemon" in capsys.readouterr().err
+    with tiledb.open(uri) as A:
+        assert A.nonempty_domain() == ((1, 5),)
+
+
+def test_main_without_unix_sockets(uri, capsys, monkeypatch):
+    # as on windows, which has neither
+    monkeypatch.delattr(socket, "AF_UNIX")
+    monkeypatch.delattr(os, "getuid")
+    monkeypatch.delenv("TILEDB_CLI_SOCKET", raising=False)
+    monkeypatch.setattr(sys, "argv", ["tiledb", "dump", "nonempty-domain", uri])
+
+    assert forward(sys.argv[1:]) is None
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 0
+    assert capsys.readouterr().out.split() == ["((1,", "5),)"]
+
+
+def test_array_cache(uri, temp_rootdir):
+    cache = ArrayCache(1)
+
+    array = cache.get(uri)
+    assert cache.get(uri) is array
+    assert len(cache) == 1
+
+    # opening a second array evicts and closes the first one
+    cache.get(uri, timestamp=1)
+    assert len(cache) == 1
+    assert not array.isopen
+
+    cache.close()
+    assert len(cache) == 0
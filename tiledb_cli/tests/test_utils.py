@@ -1,7 +1,64 @@
-from tiledb_cli.utils import to_unix_time
+from tiledb_cli.utils import (
+    ByteSize,
+    SampleSize,
+    TimestampRange,
+    to_tiledb_timestamp,
+    to_unix_time,
+)
+
+import click
+import pytest
 
 
 def test_to_unix_time():
     assert to_unix_time("1970-01-01T00:00:01Z") == 1
     assert to_unix_time("1970-01-01T00:00:02Z") == 2
     assert to_unix_time("1970-01-01T00:00:03Z") == 3
+
+
+def test_byte_size():
+    size = ByteSize()
+    assert size.convert("1024", None, None) == 1024
+    assert size.convert("64MiB", None, None) == 64 * 1024 ** 2
+    assert size.convert("1.5 GB", None, None) == 1500 * 1000 ** 2
+    assert size.convert("2kib", None, None) == 2048
+
+    for value in ["", "0", "12 bits", "MiB", "-5", "1.2.3x", "5 MiB!"]:
+        with pytest.raises(click.BadParameter):
+            size.convert(value, None, None)
+
+
+def test_sample_size():
+    size = SampleSize()
+    assert size.convert("1000", None, None) == 1000
+    assert size.convert("0.01", None, None) == 0.01
+    assert size.convert("1.0", None, None) == 1.0
+
+    for value in ["", "0", "1.5", "-3", "all"]:
+        with pytest.raises(click.BadParameter):
+            size.convert(value, None, None)
+
+
+def test_timestamp_range():
+    timestamp = TimestampRange()
+    assert timestamp.convert("5", None, None) == 5
+    assert timestamp.convert("1970-01-01T00:00:01Z", None, None) == 1
+    assert timestamp.convert("2:3", None, None) == (2, 3)
+    assert timestamp.convert(":3", None, None) == (None, 3)
+    assert timestamp.convert("2:", None, None) == (2, None)
+    assert timestamp.convert(
+        "1970-01-01T00:00:01Z:1970-01-01T00:01:00Z", None, None
+    ) == (1, 60)
+
+    for value in ["soon", "3:2", "a:b"]:
+        with pytest.raises(click.BadParameter):
+            timestamp.convert(value, None, None)
+
+
+def test_to_tiledb_timestamp():
+    # TileDB timestamps are in milliseconds; ends cover their whole second
+    assert to_tiledb_timestamp(None) is None
+    assert to_tiledb_timestamp(5) == 5999
+    assert to_tiledb_timestamp((2, 3)) == (2000, 3999)
+    assert to_tiledb_timestamp((None, 3)) == (None, 3999)
+    assert to_tiledb_timestamp((2, None)) == (2000, None)
@@ -1,7 +1,14 @@
 import click
+import collections
+import contextlib
+import io
 import iso8601
+import os
+import re
 import sys
+import threading
 import time
+import traceback
 
 
 def to_unix_time(datestr: str) -> int:
@@ -31,3 +38,496 @@ def prompt_poweruser():
 
     if not click.confirm(poweruser_statement, default="no"):
         sys.exit()
+
+
+MiB = 1024 ** 2
+GiB = 1024 ** 3
+
+# named sets of TileDB configuration parameters selectable with --preset
+PRESETS = {
+    "default": {},
+    "throughput": {
+        "sm.compute_concurrency_level": os.cpu_count() or 1,
+        "sm.io_concurrency_level": os.cpu_count() or 1,
+        "sm.tile_cache_size": 1 * GiB,
+        "sm.memory_budget": 8 * GiB,
+        "sm.memory_budget_var": 16 * GiB,
+        "vfs.file.max_parallel_ops": os.cpu_count() or 1,
+        "py.init_buffer_bytes": 1 * GiB,
+    },
+    "low-memory": {
+        "sm.compute_concurrency_level": 2,
+        "sm.io_concurrency_level": 2,
+        "sm.tile_cache_size": 0,
+        "sm.memory_budget": 512 * MiB,
+        "sm.memory_budget_var": 1 * GiB,
+        "py.init_buffer_bytes": 64 * MiB,
+    },
+    "cloud": {
+        "sm.io_concurrency_level": 4 * (os.cpu_count() or 1),
+        "sm.tile_cache_size": 1 * GiB,
+        "vfs.s3.max_parallel_ops": 4 * (os.cpu_count() or 1),
+        "vfs.s3.multipart_part_size": 50 * MiB,
+        "vfs.azure.max_parallel_ops": 4 * (os.cpu_count() or 1),
+        "vfs.gcs.max_parallel_ops": 4 * (os.cpu_count() or 1),
+        "vfs.min_parallel_size": 10 * MiB,
+    },
+}
+
+
+class ByteSize(click.ParamType):
+    """
+    A number of bytes given as an integer with an optional KB, MB, GB or KiB,
+    MiB, GiB suffix, e.g. 512MiB.
+    """
+
+    name = "byte_size"
+
+    UNITS = {
+        "": 1,
+        "b": 1,
+        "kb": 1000,
+        "mb": 1000 ** 2,
+        "gb": 1000 ** 3,
+        "kib": 1024,
+        "mib": 1024 ** 2,
+        "gib": 1024 ** 3,
+    }
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, int):
+            return value
+
+        match = re.fullmatch(r"\s*([\d.]*)\s*(\w*)\s*", str(value))
+        if match is None:
+            self.fail(f"{value} is not a valid size in bytes", param, ctx)
+
+        number, unit = match.groups()
+        try:
+            size = int(float(number) * self.UNITS[unit.lower()])
+        except (KeyError, ValueError):
+            self.fail(f"{value} is not a valid size in bytes", param, ctx)
+
+        if size <= 0:
+            self.fail(f"{value} is not a positive size in bytes", param, ctx)
+
+        return size
+
+
+class SampleSize(click.ParamType):
+    """
+    The size of a sample, given as a fraction between 0 and 1 (a float, e.g.
+    0.01) or as a number of cells (an integer, e.g. 1000).
+    """
+
+    name = "sample_size"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, (int, float)):
+            return value
+
+        try:
+            size = int(value) if value.strip().isdigit() else float(value)
+        except ValueError:
+            self.fail(f"{value} is not a fraction or number of cells", param, ctx)
+
+        if size <= 0 or (isinstance(size, float) and size > 1):
+            self.fail(
+                f"{value} is not a fraction in (0, 1] or a positive number of cells",
+                param,
+                ctx,
+            )
+
+        return size
+
+
+class TimestampRange(click.ParamType):
+    """
+    A timestamp given as UNIX seconds or an ISO 8601 date, or a start:end
+    range of them, both inclusive, parsed into an int or a (start, end)
+    tuple of UNIX seconds, see to_tiledb_timestamp() to open arrays with.
+    Either bound of a range may be omitted. ISO 8601 dates contain
+    colons themselves, so the range is split at the first colon that leaves
+    two valid bounds.
+    """
+
+    name = "timestamp_range"
+
+    def _parse(self, value):
+        return to_unix_time(value) if value else None
+
+    def convert(self, value, param, ctx):
+        if not isinstance(value, str):
+            return value
+
+        try:
+            return self._parse(value)
+        except (iso8601.ParseError, ValueError, OverflowError):
+            pass
+
+        for i, char in enumerate(value):
+            if char != ":":
+                continue
+            try:
+                start, end = self._parse(value[:i]), self._parse(value[i + 1 :])
+            except (iso8601.ParseError, ValueError, OverflowError):
+                continue
+
+            if start is not None and end is not None and start > end:
+                self.fail(f"the range {value} starts after it ends", param, ctx)
+            return start, end
+
+        self.fail(
+            f"{value} is not a UNIX timestamp, ISO 8601 date or start:end range",
+            param,
+            ctx,
+        )
+
+
+def to_tiledb_timestamp(timestamp):
+    """Convert a timestamp or (start, end) range parsed by TimestampRange,
+    in UNIX seconds, to TileDB timestamps, which are in milliseconds. A
+    start covers its whole second from its first millisecond, and an end or
+    single timestamp up to its last.
+
+    Args:
+        timestamp: UNIX seconds, a (start, end) tuple of them with None for
+            an omitted bound, or None
+
+    Returns:
+        The timestamp or range in milliseconds.
+    """
+    if isinstance(timestamp, tuple):
+        start, end = timestamp
+        return (
+            None if start is None else start * 1000,
+            None if end is None else end * 1000 + 999,
+        )
+    return None if timestamp is None else timestamp * 1000 + 999
+
+
+def parse_config_file(path: str) -> dict:
+    """Read TileDB configuration parameters from a file in the format written
+    by tiledb.Config.save(): one "key value" pair per line. Blank lines and
+    lines starting with # are ignored.
+
+    Args:
+        path (str): path to the configuration file
+
+    Returns:
+        dict: configuration parameters and values
+    """
+    config = {}
+
+    with open(path) as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            key, _, value = line.partition(" ")
+            if not value.strip():
+                raise click.BadParameter(
+                    f"line {lineno} of {path} is not a key and value pair",
+                    param_hint="'--config-file'",
+                )
+            config[key] = value.strip()
+
+    return config
+
+
+def parse_config_options(options) -> dict:
+    """Parse the KEY=VALUE strings passed to --config.
+
+    Args:
+        options (list): KEY=VALUE strings
+
+    Returns:
+        dict: configuration parameters and values
+    """
+    config = {}
+
+    for option in options:
+        key, sep, value = option.partition("=")
+        if not sep or not key:
+            raise click.BadParameter(
+                f"{option} is not of the form KEY=VALUE", param_hint="'--config'"
+            )
+        config[key] = value
+
+    return config
+
+
+def get_state(key, default=None):
+    """Look up a value shared through the obj of the current click context.
+
+    The obj is a dict set up by the root command and by long running processes
+    (such as `tiledb serve` and `tiledb batch`) to share state across the
+    commands they execute.
+
+    Args:
+        key (str): name of the shared value
+        default: value returned if there is no click context or key
+
+    Returns:
+        The shared value.
+    """
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or not isinstance(ctx.obj, dict):
+        return default
+    return ctx.obj.get(key, default)
+
+
+def get_ctx():
+    """Return the tiledb.Ctx shared by the running command.
+
+    The context is created on first use from the configuration parameters
+    given to the root command and reused by every later call. If none were
+    given, TileDB's default context is used.
+
+    Returns:
+        tiledb.Ctx: the shared context
+    """
+    import tiledb
+
+    ctx = click.get_current_context(silent=True)
+    if ctx is None or not isinstance(ctx.obj, dict):
+        return tiledb.default_ctx()
+
+    if ctx.obj.get("ctx") is None:
+        config = ctx.obj.get("config")
+        ctx.obj["ctx"] = (
+            tiledb.Ctx(tiledb.Config(config)) if config else tiledb.default_ctx()
+        )
+
+    return ctx.obj["ctx"]
+
+
+def get_config(params=None):
+    """Return a copy of the configuration of the shared tiledb.Ctx updated
+    with the given parameters.
+
+    Args:
+        params (dict): configuration parameters to set on the copy
+
+    Returns:
+        tiledb.Config: the configuration
+    """
+    config = get_ctx().config()
+    config.update(params or {})
+    return config
+
+
+def normalize_uri(uri: str) -> str:
+    """Make local array paths absolute so that they identify the same array
+    regardless of the working directory.
+
+    Args:
+        uri (str): array URI or local path
+
+    Returns:
+        str: the normalized URI
+    """
+    if "://" in uri:
+        return uri
+    return os.path.abspath(uri)
+
+
+@contextlib.contextmanager
+def open_array(uri, timestamp=None, config=None):
+    """Open the TileDB array at uri for reading.
+
+    If an ArrayCache is shared through the click context, the array is taken
+    from the cache and left open on exit. Otherwise the array is opened with
+    the shared context and closed on exit.
+
+    Args:
+        uri (str): array URI
+        timestamp (int): open the array at the given UNIX timestamp
+        config (dict): configuration parameters to override for this array
+            only; the array is then opened with its own context, bypassing
+            the cache
+
+    Yields:
+        tiledb.Array: the opened array
+    """
+    import tiledb
+
+    cache = get_state("array_cache")
+
+    if config:
+        ctx = tiledb.Ctx(get_config(config))
+        with tiledb.open(uri, timestamp=timestamp, ctx=ctx) as array:
+            yield array
+    elif cache is None:
+        with tiledb.open(uri, timestamp=timestamp, ctx=get_ctx()) as array:
+            yield array
+    else:
+        yield cache.get(normalize_uri(uri), timestamp=timestamp, ctx=get_ctx())
+
+
+class ArrayCache:
+    """
+    A bounded least recently used cache of arrays opened for reading.
+
+    Keeping arrays open preserves their loaded schema and fragment metadata
+    between commands. Arrays opened without a timestamp are reopened on every
+    lookup so that fragments written in the meantime are visible.
+    """
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._arrays = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def get(self, uri, timestamp=None, ctx=None):
+        import tiledb
+
+        key = (uri, timestamp)
+
+        with self._lock:
+            array = self._arrays.pop(key, None)
+
+            if array is None:
+                array = tiledb.open(uri, timestamp=timestamp, ctx=ctx)
+            elif timestamp is None:
+                array.reopen()
+
+            self._arrays[key] = array
+
+            while len(self._arrays) > self.maxsize:
+                _, evicted = self._arrays.popitem(last=False)
+                evicted.close()
+
+        return array
+
+    def close(self):
+        with self._lock:
+            while self._arrays:
+                _, array = self._arrays.popitem()
+                array.close()
+
+
+class ThreadLocalStream(io.TextIOBase):
+    """
+    A text stream that forwards writes to a stream chosen per thread, falling
+    back to the wrapped stream for threads that have not chosen one.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    @property
+    def current(self):
+        return getattr(self.local, "stream", None) or self.stream
+
+    def write(self, s):
+        return self.current.write(s)
+
+    def flush(self):
+        return self.current.flush()
+
+    def isatty(self):
+        return self.current.isatty()
+
+    @property
+    def buffer(self):
+        # binary output goes to the underlying byte stream, if there is one
+        return getattr(self.current, "buffer", None)
+
+    # without an encoding, click takes the stream for misconfigured and wraps
+    # the buffer of the thread that first writes to it, for all threads
+    encoding = "utf-8"
+    errors = "strict"
+
+
+_capture_lock = threading.Lock()
+_capture_count = 0
+
+
+@contextlib.contextmanager
+def capture_output(stdout=None, stderr=None):
+    """Capture what the current thread writes to sys.stdout and sys.stderr
+    without affecting other threads.
+
+    Args:
+        stdout: text stream receiving stdout, a new StringIO if None
+        stderr: text stream receiving stderr, a new StringIO if None
+
+    Yields:
+        tuple: the streams receiving stdout and stderr
+    """
+    global _capture_count
+
+    stdout = io.StringIO() if stdout is None else stdout
+    stderr = io.StringIO() if stderr is None else stderr
+
+    # a proxy given as a stream stands for the stream it forwards to
+    if isinstance(stdout, ThreadLocalStream):
+        stdout = stdout.current
+    if isinstance(stderr, ThreadLocalStream):
+        stderr = stderr.current
+
+    with _capture_lock:
+        if _capture_count == 0:
+            sys.stdout = ThreadLocalStream(sys.stdout)
+            sys.stderr = ThreadLocalStream(sys.stderr)
+        _capture_count += 1
+        proxies = sys.stdout, sys.stderr
+
+    previous = [getattr(proxy.local, "stream", None) for proxy in proxies]
+    proxies[0].local.stream, proxies[1].local.stream = stdout, stderr
+
+    try:
+        yield stdout, stderr
+    finally:
+        proxies[0].local.stream, proxies[1].local.stream = previous
+
+        with _capture_lock:
+            _capture_count -= 1
+            if _capture_count == 0:
+                sys.stdout, sys.stderr = proxies[0].stream, proxies[1].stream
+
+
+def invoke(args, obj=None, stdout=None, stderr=None):
+    """Run a tiledb CLI command in this process and capture its output.
+
+    Output is captured per thread so that several commands may be invoked
+    concurrently.
+
+    Args:
+        args (list): command line arguments, excluding the program name
+        obj (dict): state shared with the command through the click context
+        stdout: text stream to write stdout to instead of capturing it
+        stderr: text stream to write stderr to instead of capturing it
+
+    Returns:
+        tuple: exit code, captured stdout and captured stderr; the output
+        written to the given streams is not captured and returned as ""
+    """
+    from .root import root
+
+    with capture_output(stdout, stderr) as (stdout, stderr):
+        try:
+            root.main(args, prog_name="tiledb", obj=obj)
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                stderr.write(f"{e.code}\n")
+                exit_code = 1
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+
+    def captured(stream):
+        return stream.getvalue() if isinstance(stream, io.StringIO) else ""
+
+    return exit_code, captured(stdout), captured(stderr)
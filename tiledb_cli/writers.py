@@ -0,0 +1,361 @@
+import click
+import contextlib
+import os
+import sys
+
+
+def _nullable_dtype(arrow_type):
+    """
+    Return the pandas dtype that keeps the nulls of an Arrow integer or
+    boolean type, which would otherwise be converted to floats and objects.
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    if pa.types.is_boolean(arrow_type):
+        return pd.BooleanDtype()
+    if pa.types.is_integer(arrow_type):
+        name = str(arrow_type)
+        return pd.api.types.pandas_dtype(
+            f"UInt{name[4:]}" if name.startswith("uint") else f"Int{name[3:]}"
+        )
+    return None
+
+
+class TextWriter:
+    """
+    Base class of the writers of text formats. Each batch is converted to a
+    pandas DataFrame and encoded by the subclass with pandas' vectorized
+    writers. Batches of nullable attributes are given as Arrow tables, whose
+    nulls are written as empty values, or as null in JSON, and ASCII strings,
+    read as bytes, are written decoded.
+    """
+
+    binary = False
+    arrow = False
+    directory = False
+    # Arrow tables are written with their nulls
+    nulls = True
+
+    def __init__(self, output=None):
+        self.output = output
+        self.header = True
+
+    def encode(self, df, header):
+        raise NotImplementedError
+
+    def write(self, batch):
+        import pandas as pd
+
+        if isinstance(batch, dict):
+            df = pd.DataFrame(batch)
+        else:
+            df = batch.to_pandas(types_mapper=_nullable_dtype)
+
+        for name in df.columns:
+            column = df[name]
+            if column.dtype == object:
+                first = column.first_valid_index()
+                if first is not None and isinstance(column[first], bytes):
+                    df[name] = column.str.decode("utf-8", errors="replace")
+
+        text = self.encode(df, self.header)
+        self.header = False
+
+        click.echo(text, nl=False, file=self.output)
+
+    def sync(self):
+        """
+        Flush the output file to disk and return its size in bytes.
+        """
+        self.output.flush()
+        os.fsync(self.output.fileno())
+        return self.output.tell()
+
+    def close(self):
+        pass
+
+
+class TsvWriter(TextWriter):
+    """
+    Write batches of cells as tab separated lines with a header line of field
+    names, one line per cell.
+    """
+
+    def encode(self, df, header):
+        return df.to_csv(sep="\t", header=header, index=False)
+
+
+class CsvWriter(TextWriter):
+    """
+    Write batches of cells as CSV with a header line of field names, one line
+    per cell.
+    """
+
+    def encode(self, df, header):
+        return df.to_csv(header=header, index=False)
+
+
+class NdjsonWriter(TextWriter):
+    """
+    Write batches of cells as newline delimited JSON, one object per cell.
+    Datetimes are written as ISO 8601 strings.
+    """
+
+    def encode(self, df, header):
+        if df.empty:
+            return ""
+        text = df.to_json(orient="records", lines=True, date_format="iso")
+        return text if text.endswith("\n") else text + "\n"
+
+
+class ArrowWriter:
+    """
+    Base class of the writers of Apache Arrow based formats. Each batch is an
+    Arrow table read directly from TileDB (or a dict of numpy arrays, which is
+    converted) and is appended without copying to a writer opened with the
+    schema of the first batch.
+    """
+
+    binary = True
+    arrow = True
+    directory = False
+    nulls = True
+
+    def __init__(self, output):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise click.ClickException(
+                f"pyarrow is required to output the {self.name} format"
+            )
+
+        self.output = output
+        self.writer = None
+
+    def open(self, schema):
+        raise NotImplementedError
+
+    def write(self, batch):
+        import pyarrow as pa
+
+        table = batch if isinstance(batch, pa.Table) else pa.table(batch)
+        if self.writer is None:
+            self.writer = self.open(table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class ParquetWriter(ArrowWriter):
+    """
+    Write batches of cells as a Parquet file with one row group per batch.
+    """
+
+    name = "parquet"
+
+    def open(self, schema):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(self.output, schema)
+
+
+class ArrowIpcWriter(ArrowWriter):
+    """
+    Write batches of cells in the Arrow IPC streaming format with one record
+    batch per batch.
+    """
+
+    name = "arrow"
+
+    def open(self, schema):
+        import pyarrow as pa
+
+        return pa.ipc.new_stream(self.output, schema)
+
+
+def _resize_npy(path, length):
+    """
+    Change the length of a one-dimensional .npy file in place: numpy pads the
+    header so that the length can grow without moving the data, so only the
+    header is rewritten and the data extended or truncated.
+    """
+    import numpy as np
+
+    fmt = np.lib.format
+    with open(path, "r+b") as f:
+        version = fmt.read_magic(f)
+        if version == (1, 0):
+            read, write = fmt.read_array_header_1_0, fmt.write_array_header_1_0
+        else:
+            read, write = fmt.read_array_header_2_0, fmt.write_array_header_2_0
+        _, fortran_order, dtype = read(f)
+        offset = f.tell()
+
+        f.seek(0)
+        header = {
+            "descr": fmt.dtype_to_descr(dtype),
+            "fortran_order": fortran_order,
+            "shape": (length,),
+        }
+        write(f, header)
+        if f.tell() != offset:
+            raise click.ClickException(f"cannot resize {path} in place")
+
+        f.truncate(offset + length * dtype.itemsize)
+
+
+class NpyWriter:
+    """
+    Write each field of the batches to its own .npy file, named after the
+    field, in the output directory. The files are preallocated for the
+    expected number of cells and filled batch by batch through memory maps,
+    growing them if more cells arrive, then cut to the cells written, so that
+    they can be memory mapped with np.load(path, mmap_mode="r") without any
+    parsing. Variable sized fields cannot be written.
+    """
+
+    binary = True
+    arrow = False
+    directory = True
+    nulls = False
+
+    def __init__(self, path, cells=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.capacity = cells or 0
+        self.length = 0
+        self.arrays = None
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.npy")
+
+    def _resize(self, capacity):
+        import numpy as np
+
+        for values in self.arrays.values():
+            values.flush()
+        names = list(self.arrays)
+        # the memory maps are closed once they are no longer referenced
+        self.arrays = None
+
+        for name in names:
+            _resize_npy(self._file(name), capacity)
+        if capacity > 0:
+            self.arrays = {
+                name: np.load(self._file(name), mmap_mode="r+") for name in names
+            }
+        self.capacity = capacity
+
+    def write(self, batch):
+        import numpy as np
+
+        ncells = len(next(iter(batch.values()), []))
+        if self.arrays is None:
+            for name, values in batch.items():
+                if values.dtype == object:
+                    raise click.ClickException(
+                        f"cannot write the variable sized field '{name}' to a "
+                        ".npy file; leave it out with --attribute/--dimension"
+                    )
+
+            # memory maps cannot be empty
+            self.capacity = max(self.capacity, ncells, 1)
+            self.arrays = {
+                name: np.lib.format.open_memmap(
+                    self._file(name),
+                    mode="w+",
+                    dtype=values.dtype,
+                    shape=(self.capacity,),
+                )
+                for name, values in batch.items()
+            }
+
+        if self.length + ncells > self.capacity:
+            self._resize(max(2 * self.capacity, self.length + ncells))
+
+        for name, values in batch.items():
+            self.arrays[name][self.length : self.length + ncells] = values
+        self.length += ncells
+
+    def close(self):
+        if self.arrays is not None:
+            self._resize(self.length)
+
+
+WRITERS = {
+    "tsv": TsvWriter,
+    "csv": CsvWriter,
+    "ndjson": NdjsonWriter,
+    "parquet": ParquetWriter,
+    "arrow": ArrowIpcWriter,
+    "npy": NpyWriter,
+}
+
+
+@contextlib.contextmanager
+def open_writer(format, path=None, offset=None, cells=None):
+    """Open a writer for batches of cells in the given format.
+
+    Args:
+        format (str): one of the WRITERS
+        path (str): file to write to, stdout if None; the directory to write
+            to for the npy format
+        offset (int): if given, truncate the existing file to this many
+            bytes and append to it, without repeating the header; only for
+            text formats
+        cells (int): expected number of cells, preallocated by the npy format
+
+    Yields:
+        The writer, with a write(batch) method taking a dict of
+        one-dimensional numpy arrays by field name, or a pyarrow.Table if the
+        writer's arrow attribute is set
+    """
+    cls = WRITERS[format]
+
+    if cls.directory:
+        if path is None:
+            raise click.UsageError(f"an output directory is required for {format}")
+        writer = cls(path, cells)
+        try:
+            yield writer
+        finally:
+            writer.close()
+        return
+
+    with contextlib.ExitStack() as stack:
+        if offset is not None:
+            # only the bytes written before are dropped, never appended
+            if offset and (not os.path.exists(path) or os.path.getsize(path) < offset):
+                raise click.ClickException(
+                    f"{path} is missing or shorter than the {offset} bytes "
+                    "written to it before; remove the checkpoint to start over"
+                )
+            with open(path, "ab") as f:
+                f.truncate(offset)
+            output = stack.enter_context(open(path, "a"))
+        elif path is not None:
+            mode = "wb" if cls.binary else "w"
+            output = stack.enter_context(open(path, mode))
+        elif cls.binary:
+            output = getattr(sys.stdout, "buffer", None)
+            if output is None:
+                raise click.UsageError(
+                    f"--output is required for the {format} format when stdout "
+                    "only takes text, e.g. in tiledb batch with --jobs"
+                )
+            sys.stdout.flush()
+        else:
+            output = None
+
+        writer = cls(output)
+        if offset:
+            writer.header = False
+        # the output written before a failure is kept complete, e.g. for a
+        # checkpoint to resume into
+        try:
+            yield writer
+        finally:
+            writer.close()